@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+性能基准 - 在本地模拟服务器上测量遍历、路径解析与转存流程
+
+每个场景在 mock_server 上准备好对应形状的分享 / 网盘目录树，再在独立的子进程中运行
+（峰值内存互不影响），记录：
+
+    requests    服务器收到的请求数（按接口）
+    wall        总耗时（秒）
+    p50 / p95   单个请求的耗时（秒，客户端测得）
+    rss         子进程峰值内存（MB，子进程自己读取 VmHWM）
+
+故障注入场景（faults-*，见 faults.py）另外记录：
+
+    completion  获取到的文件占分享全部文件的比例（重试后仍失败时遍历中止，比例小于 1）
+    throughput  有效吞吐量（每秒获取的文件数）
+    faults      服务器注入的故障数
+
+启动场景（startup-*）不需要模拟服务器，多次运行命令行入口取最短耗时，记录：
+
+    wall        启动到退出的耗时（秒）
+    overhead    比空解释器（python -c pass）多出的耗时（秒，与机器快慢关系较小）
+    imports     加载了的重模块（HEAVY_MODULES，如 requests）
+
+与保存的基线（benchmark_baseline.json）比较时，请求数增加、完成率下降、
+耗时 / p95 / 内存超出容差、启动时多加载了重模块都视为性能回退，退出码为 1。
+
+使用方式：
+    python benchmark.py                     # 运行全部场景并与基线比较
+    python benchmark.py crawl-wide resolve-path
+    python benchmark.py startup-help startup-validate
+    python benchmark.py --update-baseline   # 以本次结果作为新基线
+    python benchmark.py --list              # 列出场景
+
+模拟服务器的延迟固定（默认每个请求 2 ms），并关闭客户端的速率限制（QUARK_RATE_LIMIT=0），
+测得的是客户端自身的开销和请求次数，而不是线上接口的速度。重试的退避时间缩短为
+RETRY_BACKOFF（QUARK_RETRY_BACKOFF），故障场景不会因为退避等待而过长。
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 添加当前目录到路径（支持作为 skill 被引用）
+current_dir = Path(__file__).parent.resolve()
+sys.path.insert(0, str(current_dir))
+
+from faults import FaultInjector
+from mock_server import MockConfig, MockQuarkServer
+from share_generator import ShareGenerator
+
+
+BASELINE_PATH = current_dir / 'benchmark_baseline.json'
+
+# 模拟服务器每个请求的固定延迟（秒）
+LATENCY = '0.002'
+
+# 子进程中重试的退避时间（秒）
+RETRY_BACKOFF = '0.05'
+
+# 超出基线多少视为回退（相对比例，另加绝对余量避免短场景抖动误报）
+TOLERANCE = {'wall': 0.5, 'p95': 0.5, 'rss': 0.3}
+SLACK = {'wall': 0.2, 'p95': 0.005, 'rss': 5.0}
+
+# 启动场景的运行次数（取最短耗时）、overhead 的容差和绝对余量（秒）
+STARTUP_RUNS = 10
+STARTUP_TOLERANCE = 0.5
+STARTUP_SLACK = 0.01
+
+# 启动时不应加载的模块（用到时才导入）
+HEAVY_MODULES = ('requests', 'quark_client', 'crawl_store', 'sqlite3', 'cProfile', 'readline')
+
+
+def wide_tree(folders: int = 300, files: int = 20) -> List:
+    """宽树：根目录下 folders 个文件夹，每个 files 个文件"""
+    return [{'name': f'第 {i + 1:03d} 集合', 'children': [
+        {'name': f'Episode {j + 1:03d}.mkv', 'size': (j + 1) << 20} for j in range(files)
+    ]} for i in range(folders)]
+
+
+def deep_tree(depth: int = 200, files: int = 2) -> List:
+    """深树：depth 层嵌套的单链文件夹，每层 files 个文件"""
+    root = node = {'children': []}
+    for i in range(depth):
+        child = {'name': f'level {i + 1}', 'children': []}
+        node['children'].extend({'name': f'file {i + 1}-{j + 1}.txt', 'size': 1024}
+                                for j in range(files))
+        node['children'].append(child)
+        node = child
+    return root['children']
+
+
+def huge_folder_tree(files: int = 20000) -> List:
+    """单个超大目录：一个文件夹下 files 个文件"""
+    return [{'name': '全部文件', 'children': [
+        {'name': f'IMG_{i:06d}.jpg', 'size': 2 << 20} for i in range(files)
+    ]}]
+
+
+def fault_share() -> ShareGenerator:
+    """故障场景的分享：418 个文件夹、2128 个文件"""
+    return ShareGenerator(seed=1, depth=2, fanout=20, files=5)
+
+
+def drive_tree(depth: int = 5, fanout: int = 4) -> List:
+    """网盘目录树：depth 层、每层 fanout 个子目录"""
+    def build(level: int) -> List:
+        if level == depth:
+            return []
+        return [{'name': f'd{level}_{i}', 'children': build(level + 1)} for i in range(fanout)]
+    return build(0)
+
+
+# 场景名 -> (说明, 服务器设置, 子进程中运行的函数名)
+SCENARIOS: Dict[str, tuple] = {
+    'crawl-wide': ('get_all_files_table：300 个文件夹 × 20 个文件',
+                   lambda: MockConfig(tree=wide_tree()), 'run_crawl'),
+    'crawl-deep': ('get_all_files_table：200 层嵌套',
+                   lambda: MockConfig(tree=deep_tree()), 'run_crawl'),
+    'crawl-huge-folder': ('get_all_files_table：单个目录 20000 个文件（400 页）',
+                          lambda: MockConfig(tree=huge_folder_tree()), 'run_crawl'),
+    'resolve-path': ('get_dir_by_path：5 层 × 4 个子目录的网盘中解析最深的路径',
+                     lambda: MockConfig(tree=[], drive=drive_tree()), 'run_resolve'),
+    'save-wait': ('save_files + wait_task_complete：任务耗时 0.5 秒',
+                  lambda: MockConfig(tree=wide_tree(10, 10), task_duration='0.5'), 'run_save'),
+    'main-list': ('main.py list --json-only：300 个文件夹 × 20 个文件',
+                  lambda: MockConfig(tree=wide_tree()), 'run_main_list'),
+    'main-save': ('main.py save "*.mkv" --stream：50 个文件夹 × 20 个文件',
+                  lambda: MockConfig(tree=wide_tree(50), task_duration='0.1'), 'run_main_save'),
+    'main-list-synthetic': ('main.py list --json：合成分享（4 层、中文文件名、含超大目录）',
+                            lambda: MockConfig(generator=ShareGenerator(
+                                seed=1, depth=3, fanout=4, files=40,
+                                huge_ratio=0.02, huge_files=5000)), 'run_main_list_synthetic'),
+    'faults-throttle': ('遍历 418 个文件夹，5% 的 detail 请求被限流（Retry-After 0.05 秒）',
+                        lambda: MockConfig(generator=fault_share(), faults=FaultInjector.parse(
+                            'detail:throttle=0.05@0.05,seed=1')), 'run_crawl_faults'),
+    'faults-mixed': ('遍历 418 个文件夹：限流、5xx、连接重置、stoken 过期、延迟尖峰各 1% ~ 2%',
+                     lambda: MockConfig(generator=fault_share(), faults=FaultInjector.parse(
+                         'detail:throttle=0.02@0.05,detail:5xx=0.02,detail:reset=0.01,'
+                         'detail:stoken=0.01,detail:spike=0.02@0.1,seed=1')), 'run_crawl_faults'),
+}
+
+
+# 启动场景名 -> (说明, 命令行参数)
+STARTUP_SCENARIOS: Dict[str, tuple] = {
+    'startup-help': ('main.py --help', ['main.py', '--help']),
+    'startup-validate': ('main.py list（缺少参数，参数校验失败退出）', ['main.py', 'list']),
+    'startup-helper': ('save_helper.py --help', ['save_helper.py', '--help']),
+}
+
+
+# ---------------------------------------------------------------- 子进程中运行
+
+def _client(cookies_path: str):
+    from quark_client import QuarkClient
+    return QuarkClient(cookies_path)
+
+
+def run_crawl(client, share_url: str) -> None:
+    pwd_id = client.parse_share_url(share_url)['pwd_id']
+    stoken = client.get_stoken(pwd_id)
+    files = client.get_all_files_table(pwd_id, stoken)
+    if not len(files):
+        raise Exception("没有获取到文件")
+
+
+def run_crawl_faults(client, share_url: str) -> Dict:
+    """遍历分享，失败时记录已获取的文件数（不让场景失败）"""
+    pwd_id = client.parse_share_url(share_url)['pwd_id']
+    files = 0
+    error = None
+    try:
+        stoken = client.get_stoken(pwd_id)
+        for _ in client.iter_files_recursive(pwd_id, stoken):
+            files += 1
+    except Exception as e:
+        error = str(e)
+    return {'files': files, 'error': error}
+
+
+def run_resolve(client, share_url: str) -> None:
+    path = '/' + '/'.join(f'd{level}_3' for level in range(5))
+    if client.get_dir_by_path(path) is None:
+        raise Exception(f"目录不存在: {path}")
+
+
+def run_save(client, share_url: str) -> None:
+    pwd_id = client.parse_share_url(share_url)['pwd_id']
+    stoken = client.get_stoken(pwd_id)
+    files = client.get_all_files_recursive(pwd_id, stoken)
+    with contextlib.redirect_stdout(io.StringIO()):
+        task_id = client.save_files(pwd_id, stoken, [f['fid'] for f in files],
+                                    [f['share_fid_token'] for f in files], '0')
+        if not client.wait_task_complete(task_id):
+            raise Exception("转存任务未完成")
+
+
+def _run_main(argv: List[str]) -> None:
+    import main
+    sys.argv = ['main.py'] + argv
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            main.main()
+        except SystemExit as e:
+            if e.code:
+                raise Exception(f"main.py {' '.join(argv)} 退出码 {e.code}")
+
+
+def run_main_list(client, share_url: str) -> None:
+    _run_main(['list', share_url, '--json-only'])
+
+
+def run_main_list_synthetic(client, share_url: str) -> None:
+    _run_main(['list', share_url, '--json'])
+
+
+def run_main_save(client, share_url: str) -> None:
+    _run_main(['save', share_url, '*.mkv', '/', '--stream', '--json-only'])
+
+
+def child_main(name: str, share_url: str) -> None:
+    """子进程：运行一个场景，向 stdout 输出 JSON 结果"""
+    import requests
+
+    durations: List[float] = []
+    original = requests.request
+
+    def timed_request(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+
+    # 客户端通过 requests.request 发出所有请求
+    requests.request = timed_request
+
+    run = globals()[SCENARIOS[name][2]]
+    client = _client(os.environ['QUARK_COOKIES_PATH'])
+    start = time.perf_counter()
+    extra = run(client, share_url) or {}
+    wall = time.perf_counter() - start
+
+    durations.sort()
+    print(json.dumps(dict(extra,
+        wall=round(wall, 4),
+        p50=round(_percentile(durations, 0.5), 5),
+        p95=round(_percentile(durations, 0.95), 5),
+        rss=round(_peak_rss_mb(), 1),
+    )))
+
+
+def _peak_rss_mb() -> float:
+    """本进程的峰值内存（MB）
+
+    Linux 上读取 /proc/self/status 的 VmHWM：它在 exec 时重新计数，
+    而 wait4 / getrusage 的 ru_maxrss 会继承 fork 时父进程（运行模拟服务器）的峰值。
+    """
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / (1 << 10)
+    except OSError:
+        pass
+    import resource
+    # 没有 /proc 时退回 ru_maxrss：Linux 单位为 KB，macOS 为字节
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """已排序列表的百分位数（最近秩）"""
+    if not values:
+        return 0.0
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+# ---------------------------------------------------------------- 主进程
+
+def run_scenario(name: str, cookies_path: str) -> Dict:
+    """启动模拟服务器，在子进程中运行场景并收集结果"""
+    config = SCENARIOS[name][1]()
+    config.latency.setdefault('default', LATENCY)
+    with MockQuarkServer(config) as server:
+        env = dict(os.environ,
+                   QUARK_API_BASE_URL=server.base_url,
+                   QUARK_COOKIES_PATH=cookies_path,
+                   QUARK_RATE_LIMIT='0',
+                   QUARK_RETRY_BACKOFF=RETRY_BACKOFF)
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            process = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), '--child', name, server.share_url],
+                env=env, stdout=out, stderr=err
+            )
+            process.wait()
+            out.seek(0)
+            err.seek(0)
+            if process.returncode != 0:
+                message = err.read().decode('utf-8', 'replace').strip().splitlines()
+                raise Exception(f"场景 {name} 失败: {message[-1] if message else process.returncode}")
+            result = json.loads(out.read().decode('utf-8').strip().splitlines()[-1])
+        result['requests'] = server.request_counts()
+    if 'files' in result:
+        expected = _share_files(config)
+        result['completion'] = round(result.pop('files') / expected, 4) if expected else 1.0
+        result['throughput'] = round(expected * result['completion'] / result['wall'], 1)
+        result['faults'] = config.faults.total() if config.faults else 0
+        if not result.get('error'):
+            result.pop('error', None)
+    return result
+
+
+def run_startup(name: str) -> Dict:
+    """多次运行命令行入口，记录最短耗时和加载的重模块"""
+    argv = STARTUP_SCENARIOS[name][1]
+    command = [sys.executable, str(current_dir / argv[0])] + argv[1:]
+    bare = [sys.executable, '-c', 'pass']
+    wall = python = float('inf')
+    # 交替运行，机器负载的波动对两者的影响相近
+    for _ in range(STARTUP_RUNS):
+        python = min(python, _timed_run(bare))
+        wall = min(wall, _timed_run(command))
+
+    # -X importtime 在 stderr 逐行列出导入的模块（最后一列为模块名）
+    traced = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=current_dir)
+    imported = {line.rsplit('|', 1)[-1].strip()
+                for line in traced.stderr.decode('utf-8', 'replace').splitlines()
+                if line.startswith('import time:')}
+    return {'wall': round(wall, 4), 'python': round(python, 4),
+            'overhead': round(max(wall - python, 0.0), 4),
+            'imports': [module for module in HEAVY_MODULES if module in imported]}
+
+
+def _timed_run(command: List[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=current_dir)
+    return time.perf_counter() - start
+
+
+def _share_files(config: MockConfig) -> int:
+    """分享中的文件总数"""
+    if config.generator is not None:
+        return config.generator.count()[1]
+    stack = list(config.tree or ())
+    count = 0
+    while stack:
+        node = stack.pop()
+        if 'children' in node:
+            stack.extend(node['children'])
+        else:
+            count += 1
+    return count
+
+
+def compare(name: str, result: Dict, baseline: Optional[Dict]) -> List[str]:
+    """与基线比较，返回回退说明（空列表表示没有回退）"""
+    if not baseline:
+        return []
+    problems = []
+    if 'overhead' in result:
+        for module in result['imports']:
+            if module not in baseline['imports']:
+                problems.append(f"启动时加载了 {module}")
+        limit = baseline['overhead'] * (1 + STARTUP_TOLERANCE) + STARTUP_SLACK
+        if result['overhead'] > limit:
+            problems.append(f"overhead {baseline['overhead']:.3f} -> {result['overhead']:.3f}"
+                            f"（上限 {limit:.3f}）")
+        return problems
+    for endpoint, count in result['requests'].items():
+        expected = baseline['requests'].get(endpoint, 0)
+        if count > expected:
+            problems.append(f"{endpoint} 请求数 {expected} -> {count}")
+    if result.get('completion', 1.0) < baseline.get('completion', 1.0):
+        problems.append(f"完成率 {baseline['completion']:.1%} -> {result['completion']:.1%}")
+    for key, tolerance in TOLERANCE.items():
+        limit = baseline[key] * (1 + tolerance) + SLACK[key]
+        if result[key] > limit:
+            problems.append(f"{key} {baseline[key]:.3f} -> {result[key]:.3f}（上限 {limit:.3f}）")
+    return problems
+
+
+def format_result(name: str, result: Dict) -> str:
+    if 'overhead' in result:
+        return (f"{name:<18} 启动 {result['wall'] * 1000:6.1f}ms  "
+                f"解释器 {result['python'] * 1000:6.1f}ms  "
+                f"额外 {result['overhead'] * 1000:6.1f}ms  "
+                f"重模块 {', '.join(result['imports']) or '无'}")
+    total = sum(result['requests'].values())
+    line = (f"{name:<18} 请求 {total:>6}  耗时 {result['wall']:7.3f}s  "
+            f"p50 {result['p50'] * 1000:6.1f}ms  p95 {result['p95'] * 1000:6.1f}ms  "
+            f"内存 {result['rss']:6.1f}MB")
+    if 'completion' in result:
+        line += (f"\n{'':<18} 完成率 {result['completion']:.1%}  "
+                 f"吞吐量 {result['throughput']:.0f} 文件/秒  注入故障 {result['faults']}")
+        if result.get('error'):
+            line += f"\n{'':<18} 错误: {result['error']}"
+    return line
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='性能基准（本地模拟服务器）')
+    parser.add_argument('scenarios', nargs='*', help='要运行的场景（默认全部）')
+    parser.add_argument('--list', action='store_true', help='列出场景')
+    parser.add_argument('--update-baseline', action='store_true', help='以本次结果作为新基线')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='基线文件路径')
+    parser.add_argument('--json', action='store_true', help='输出 JSON 格式结果')
+    parser.add_argument('--child', nargs=2, metavar=('SCENARIO', 'SHARE_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(*args.child)
+        return
+
+    if args.list:
+        for name, (description, _, _) in SCENARIOS.items():
+            print(f"{name:<18} {description}")
+        for name, (description, _) in STARTUP_SCENARIOS.items():
+            print(f"{name:<18} {description}")
+        return
+
+    names = args.scenarios or list(SCENARIOS) + list(STARTUP_SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS and name not in STARTUP_SCENARIOS]
+    if unknown:
+        print(f"❌ 未知场景: {', '.join(unknown)}（--list 查看）")
+        sys.exit(2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = {}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as cookie_file:
+        # 模拟服务器不校验 Cookie，内容非空即可
+        json.dump({'__benchmark': '1'}, cookie_file)
+    try:
+        for name in names:
+            if name in STARTUP_SCENARIOS:
+                result = run_startup(name)
+            else:
+                result = run_scenario(name, cookie_file.name)
+            results[name] = result
+            problems = [] if args.update_baseline else compare(name, result, baseline.get(name))
+            if problems:
+                regressions[name] = problems
+            if not args.json:
+                mark = '❌' if problems else ('🆕' if name not in baseline else '✅')
+                print(f"{mark} {format_result(name, result)}")
+                for problem in problems:
+                    print(f"     {problem}")
+    finally:
+        os.unlink(cookie_file.name)
+
+    if args.json:
+        print(json.dumps({'results': results, 'regressions': regressions},
+                         indent=2, ensure_ascii=False))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+        print(f"✅ 基线已更新: {args.baseline}")
+    elif regressions:
+        print(f"\n❌ 性能回退: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+内存受限的分享遍历 - 待遍历目录和遍历结果超出内存预算时写入磁盘（SQLite）
+
+递归遍历会把完整结果和调用栈都放在内存里，且受 Python 递归深度限制。
+crawl_to_store 使用显式的待遍历目录队列，内存中的队列和结果缓冲超出预算时
+分别转存到 SQLite 的 frontier 表和 files 表，可以在小内存机器上遍历任意大、
+任意深的分享。
+
+每条记录带有一个排序键：从根目录到该条目每一层在列表中的位置（每层 4 字节，
+大端序）。按排序键读取即得到与 get_all_files_recursive 完全相同的顺序，
+因此无论目录以什么顺序遍历，序号都保持一致。
+"""
+
+import os
+import struct
+import sqlite3
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional
+
+from name_search import NameIndex
+from path_index import PathIndex
+
+
+# 估算内存占用时每条记录 / 每个待遍历目录的固定开销（字节）
+RECORD_OVERHEAD = 600
+FOLDER_OVERHEAD = 300
+
+# 从磁盘取回待遍历目录时每批的数量
+FRONTIER_BATCH = 256
+
+_FILE_COLUMNS = ('sort_key', 'fid', 'file_name', 'size', 'type', 'pdir_fid', 'obj_category',
+                 'phone_play_url', 'share_fid_token', 'updated_at', 'created_at')
+
+
+def _child_key(prefix: bytes, position: int) -> bytes:
+    """子条目的排序键：父目录排序键 + 4 字节位置"""
+    return prefix + struct.pack('>I', position)
+
+
+class CrawlStore:
+    """
+    遍历结果存储（SQLite）
+
+    files 表保存已遍历到的文件，folders 表保存目录名称（用于还原路径），
+    frontier 表保存转存到磁盘的待遍历目录。
+    支持 len()、迭代和按下标访问，可以直接传给 parse_file_selection、display_files。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 数据库文件路径；为空时使用临时文件，close() 时删除
+        """
+        self._temp = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='quark-crawl-', suffix='.db')
+            os.close(fd)
+        self.path = os.path.expanduser(path)
+        self._count = None
+        self._paths: Optional[PathIndex] = None
+        self._name_index: Optional[NameIndex] = None
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute('DROP TABLE IF EXISTS files')
+        self.conn.execute('DROP TABLE IF EXISTS frontier')
+        self.conn.execute('DROP TABLE IF EXISTS folders')
+        self.conn.execute(
+            'CREATE TABLE files (sort_key BLOB PRIMARY KEY, fid TEXT, file_name TEXT, '
+            'size INTEGER, type TEXT, pdir_fid TEXT, obj_category TEXT, phone_play_url TEXT, '
+            'share_fid_token TEXT, updated_at INTEGER, created_at INTEGER) WITHOUT ROWID'
+        )
+        self.conn.execute(
+            'CREATE TABLE frontier (id INTEGER PRIMARY KEY, fid TEXT, depth INTEGER, sort_key BLOB)'
+        )
+        self.conn.execute(
+            'CREATE TABLE folders (sort_key BLOB PRIMARY KEY, fid TEXT, name TEXT, pdir_fid TEXT) '
+            'WITHOUT ROWID'
+        )
+
+    def add_files(self, rows: List[tuple]) -> None:
+        """写入一批文件（按 _FILE_COLUMNS 顺序的元组）"""
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO files VALUES ({','.join('?' * len(_FILE_COLUMNS))})", rows
+        )
+        self._count = None
+        self._paths = None
+        self._name_index = None
+
+    def add_folders(self, rows: List[tuple]) -> None:
+        """记录一批目录 (排序键, fid, 名称, 父目录 fid)"""
+        self.conn.executemany('INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)', rows)
+        self._paths = None
+
+    def push_folders(self, folders: List[tuple]) -> None:
+        """把待遍历目录 (fid, depth, sort_key) 转存到磁盘"""
+        self.conn.executemany('INSERT INTO frontier (fid, depth, sort_key) VALUES (?, ?, ?)', folders)
+
+    def pop_folders(self, limit: int = FRONTIER_BATCH) -> List[tuple]:
+        """从磁盘取回一批待遍历目录（后进先出，保持深度优先的局部性）"""
+        rows = self.conn.execute(
+            'SELECT id, fid, depth, sort_key FROM frontier ORDER BY id DESC LIMIT ?', (limit,)
+        ).fetchall()
+        if rows:
+            self.conn.execute('DELETE FROM frontier WHERE id >= ?', (rows[-1][0],))
+        return [row[1:] for row in reversed(rows)]
+
+    @staticmethod
+    def _to_dict(row: tuple) -> Dict:
+        """数据库行转换为 get_all_files_recursive 的字典格式"""
+        (_, fid, file_name, size, ftype, pdir_fid, obj_category,
+         phone_play_url, share_fid_token, updated_at, created_at) = row
+        return {
+            'file_name': file_name,
+            'fid': fid,
+            'file_id': fid,
+            'size': size,
+            'type': ftype,
+            'is_file': True,
+            'pdir_fid': pdir_fid,
+            'obj_category': obj_category,
+            'phone_play_url': phone_play_url,
+            'dir': False,
+            'share_fid_token': share_fid_token,
+            'updated_at': updated_at,
+            'created_at': created_at,
+        }
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = self.conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+        return self._count
+
+    def __iter__(self) -> Iterator[Dict]:
+        cursor = self.conn.execute('SELECT * FROM files ORDER BY sort_key')
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for row in rows:
+                yield self._to_dict(row)
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        row = self.conn.execute(
+            'SELECT * FROM files ORDER BY sort_key LIMIT 1 OFFSET ?', (index,)
+        ).fetchone()
+        if row is None:
+            raise IndexError('CrawlStore index out of range')
+        return self._to_dict(row)
+
+    def column(self, name: str) -> List:
+        """按行顺序读取一列（name / size / category / pdir），供选择条件按列求值"""
+        field = {'name': 'file_name', 'size': 'size',
+                 'category': 'obj_category', 'pdir': 'pdir_fid'}[name]
+        return [row[0] for row in self.conn.execute(f'SELECT {field} FROM files ORDER BY sort_key')]
+
+    @property
+    def paths(self) -> PathIndex:
+        """目录路径索引（首次访问时按排序键合并目录和文件构建）"""
+        if self._paths is None:
+            rows = self.conn.execute(
+                'SELECT sort_key, fid, name, pdir_fid, 0, 0 FROM folders '
+                'UNION ALL SELECT sort_key, fid, file_name, pdir_fid, size, 1 FROM files '
+                'ORDER BY sort_key'
+            )
+            self._paths = PathIndex.from_entries(
+                {'fid': fid, 'file_name': name, 'pdir_fid': pdir_fid, 'size': size, 'is_file': is_file}
+                for _, fid, name, pdir_fid, size, is_file in rows
+            )
+        return self._paths
+
+    @property
+    def name_index(self) -> NameIndex:
+        """文件名搜索索引（首次访问时构建）"""
+        if self._name_index is None:
+            self._name_index = NameIndex(self.column('name'))
+        return self._name_index
+
+    def folder_path(self, fid: str) -> str:
+        """目录的路径（如 "/Season 2/4K"）"""
+        return self.paths.folder_path(fid)
+
+    def copy(self) -> List[Dict]:
+        """兼容 list.copy()，返回字典列表"""
+        return list(self)
+
+    def close(self) -> None:
+        """关闭数据库（临时文件会被删除）"""
+        self.conn.close()
+        if self._temp and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def crawl_to_store(client, pwd_id: str, stoken: str, store: CrawlStore,
+                   pdir_fid: str = '0', max_depth: int = -1,
+                   memory_budget: int = 64 * 1024 * 1024,
+                   on_flush: Optional[Callable[[int, int], None]] = None) -> CrawlStore:
+    """
+    在内存预算内遍历分享，结果写入 store
+
+    内存中的结果缓冲超出预算的一半时写入 files 表；待遍历目录超出预算的一半时，
+    把较早入队的一半转存到 frontier 表，内存队列为空时再分批取回。
+
+    Args:
+        client: QuarkClient 实例
+        pwd_id: 分享链接 ID
+        stoken: 访问令牌
+        store: 结果存储
+        pdir_fid: 起始目录 ID
+        max_depth: 最大深度（-1 表示无限，语义与 get_all_files_recursive 相同）
+        memory_budget: 内存预算（字节）
+        on_flush: 结果写入磁盘时的回调，接收 (本次写入条数, 累计条数)
+
+    Returns:
+        CrawlStore: 传入的 store
+    """
+    half_budget = max(memory_budget // 2, 1)
+    buffer: List[tuple] = []
+    buffer_bytes = 0
+    folders: List[tuple] = []
+    flushed = 0
+    frontier: List[tuple] = [(pdir_fid, 0, b'')]
+    frontier_bytes = FOLDER_OVERHEAD
+    spilled = False
+    progress = client.start_progress('crawl', pwd_id=pwd_id, folders_queued=1, files_found=0)
+
+    def flush() -> None:
+        nonlocal buffer, buffer_bytes, folders, flushed
+        if folders:
+            store.add_folders(folders)
+            folders = []
+        buffer_bytes = 0
+        if not buffer:
+            return
+        store.add_files(buffer)
+        flushed += len(buffer)
+        if on_flush:
+            on_flush(len(buffer), flushed)
+        buffer = []
+
+    try:
+        while True:
+            if not frontier:
+                if not spilled:
+                    break
+                frontier = store.pop_folders()
+                if not frontier:
+                    break
+                frontier_bytes = len(frontier) * FOLDER_OVERHEAD
+
+            fid, depth, key = frontier.pop()
+            frontier_bytes -= FOLDER_OVERHEAD
+            sub_folders = []
+            files = 0
+
+            for position, item in enumerate(client.iter_folder_items(pwd_id, stoken, fid)):
+                record = client.convert_share_file(item, fid)
+                item_key = _child_key(key, position)
+                if record['is_file']:
+                    files += 1
+                    buffer.append((item_key, record['fid'], record['file_name'], record['size'],
+                                   record['type'], record['pdir_fid'], record['obj_category'],
+                                   record['phone_play_url'], record['share_fid_token'],
+                                   record['updated_at'], record['created_at']))
+                    buffer_bytes += (RECORD_OVERHEAD + len(record['file_name'] or '')
+                                     + len(record['share_fid_token'] or ''))
+                else:
+                    folders.append((item_key, record['fid'], record['file_name'], fid))
+                    buffer_bytes += FOLDER_OVERHEAD
+                    if max_depth == -1 or depth < max_depth:
+                        sub_folders.append((record['fid'], depth + 1, item_key))
+                # 文件和文件夹条目都计入缓冲（几乎全是文件夹的分享也要按时写盘）
+                if buffer_bytes >= half_budget:
+                    flush()
+
+            progress.add(folders_done=1, folders_queued=len(sub_folders) - 1, files_found=files)
+            # 逆序入栈，使目录按列表顺序深度优先处理
+            frontier.extend(reversed(sub_folders))
+            frontier_bytes += len(sub_folders) * FOLDER_OVERHEAD
+            if frontier_bytes >= half_budget and len(frontier) > 1:
+                # 较早入队的一半（离当前位置最远）转存到磁盘
+                cut = len(frontier) // 2
+                store.push_folders(frontier[:cut])
+                frontier = frontier[cut:]
+                frontier_bytes = len(frontier) * FOLDER_OVERHEAD
+                spilled = True
+
+        flush()
+        store.conn.commit()
+        progress.finish()
+        return store
+
+    except Exception as e:
+        progress.finish(error=str(e))
+        raise Exception(f"递归获取文件失败: {e}")
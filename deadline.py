@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+时间预算 - 给整个命令设置总的截止时间
+
+requests 的超时是针对单个请求的（30 秒），遍历几千个目录的总耗时没有上限。
+Deadline 记录截止时间，在其生效范围内（active）发出的请求：
+
+    - 截止时间已过：不再发出，直接抛出 DeadlineExceeded
+    - 否则超时取 min(30 秒, 剩余时间)，请求不会拖过截止时间
+
+遍历捕获 DeadlineExceeded 后停止展开，返回已获取的部分结果。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """已超过截止时间"""
+
+
+class Deadline:
+    """截止时间（从创建时开始计时）"""
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: 时间预算（秒）
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """剩余秒数（已过期时为 0）"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """是否已过截止时间"""
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        """已过截止时间时抛出 DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(f"已超过时间限制（{self.seconds:g} 秒）")
+
+    def timeout(self, limit: float) -> float:
+        """单个请求的超时：不超过 limit，也不超过剩余时间"""
+        self.check()
+        return min(limit, self.remaining())
+
+    @contextmanager
+    def active(self):
+        """当前线程内发出的请求受该截止时间约束"""
+        previous = getattr(_local, 'deadline', None)
+        _local.deadline = self
+        try:
+            yield self
+        finally:
+            _local.deadline = previous
+
+
+_local = threading.local()
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前线程生效的截止时间（没有时为 None）"""
+    return getattr(_local, 'deadline', None)
+
+
+def request_timeout(limit: float) -> float:
+    """
+    当前线程发出请求时使用的超时
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    deadline = current_deadline()
+    return limit if deadline is None else deadline.timeout(limit)
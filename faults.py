@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+故障注入 - 测量限流、网络错误下的遍历吞吐量与完成率
+
+按接口和概率注入以下故障：
+
+    spike      延迟尖峰（额外等待 ARG 秒，默认 1；超过请求超时则按超时处理）
+    reset      连接被重置（不返回响应）
+    5xx        服务端错误（HTTP 状态码 ARG，默认 503）
+    throttle   限流（HTTP 429，Retry-After 为 ARG 秒，默认 1）
+    stoken     stoken 过期（返回 stoken 无效的错误）
+
+规则格式为 ENDPOINT:KIND=PROB[@ARG]，多条规则用逗号分隔，ENDPOINT 为 token、detail、
+save、task、sort、file 或 *（全部接口），例如：
+
+    detail:throttle=0.05,detail:spike=0.02@0.5,*:reset=0.01,seed=3
+
+同一请求的规则按顺序各自抽样：spike 与其他故障叠加，其余故障只取第一个命中的。
+
+两种用法：
+
+    # 包装客户端的传输层（不需要模拟服务器，也可用于线上接口）
+    export QUARK_FAULTS=detail:throttle=0.05
+    QuarkClient(cookies_path, transport=FaultInjector.parse('...').wrap(requests.request))
+
+    # 由模拟服务器注入（真实的连接重置、HTTP 错误）
+    MockConfig(faults=FaultInjector.parse('detail:5xx=0.05'))
+    python mock_server.py --faults detail:throttle=0.05
+"""
+
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import requests
+
+
+KINDS = ('spike', 'reset', '5xx', 'throttle', 'stoken')
+
+# 接口名 -> 路径后缀（与 mock_server 的接口名相同）
+ENDPOINT_PATHS = {
+    'token': '/share/sharepage/token',
+    'detail': '/share/sharepage/detail',
+    'save': '/share/sharepage/save',
+    'task': '/task',
+    'sort': '/file/sort',
+    'file': '/file',
+}
+
+_DEFAULT_ARGS = {'spike': 1.0, '5xx': 503, 'throttle': 1.0}
+
+# 注入的 stoken 错误（与 mock_server 中 stoken 无效时的响应相同）
+STOKEN_ERROR = {'status': 401, 'code': 401, 'message': 'stoken 已过期'}
+THROTTLE_ERROR = {'status': 429, 'code': 429, 'message': '请求过于频繁，请稍后再试'}
+
+
+class FaultRule(NamedTuple):
+    """一条注入规则"""
+    endpoint: str
+    kind: str
+    probability: float
+    arg: Optional[float] = None
+
+    @property
+    def value(self) -> float:
+        """故障参数（未指定时取默认值）"""
+        return self.arg if self.arg is not None else _DEFAULT_ARGS.get(self.kind, 0)
+
+
+class Fault(NamedTuple):
+    """一次请求抽中的故障"""
+    delay: float = 0.0
+    rule: Optional[FaultRule] = None
+
+    @property
+    def kind(self) -> Optional[str]:
+        return self.rule.kind if self.rule else None
+
+
+def endpoint_name(url: str) -> str:
+    """由 URL 得到接口名（未知接口返回路径本身）"""
+    path = urlparse(url).path.rstrip('/')
+    for name, suffix in sorted(ENDPOINT_PATHS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(suffix):
+            return name
+    return path
+
+
+class FaultInjector:
+    """按规则抽样故障（线程安全，相同 seed 的抽样序列相同）"""
+
+    def __init__(self, rules: Iterable[FaultRule], seed: int = 0):
+        """
+        Args:
+            rules: 注入规则
+            seed: 随机种子
+        """
+        self.rules = list(rules)
+        for rule in self.rules:
+            if rule.kind not in KINDS:
+                raise ValueError(f"未知的故障类型: {rule.kind}（可选 {', '.join(KINDS)}）")
+            if not 0 <= rule.probability <= 1:
+                raise ValueError(f"故障概率应在 0 ~ 1 之间: {rule.probability}")
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # 接口名 -> 故障类型 -> 注入次数
+        self.injected: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def parse(cls, text: str, seed: int = 0) -> 'FaultInjector':
+        """
+        解析规则文本（见模块说明），其中 seed=N 设置随机种子
+
+        Raises:
+            ValueError: 格式错误
+        """
+        rules = []
+        for part in filter(None, (p.strip() for p in text.split(','))):
+            target, sep, value = part.partition('=')
+            if target == 'seed' and sep:
+                seed = int(value)
+                continue
+            endpoint, colon, kind = target.partition(':')
+            probability, _, arg = value.partition('@')
+            if not (sep and colon and endpoint and kind):
+                raise ValueError(f"无效的故障规则: {part}（格式 ENDPOINT:KIND=PROB[@ARG]）")
+            try:
+                rules.append(FaultRule(endpoint, kind, float(probability),
+                                       float(arg) if arg else None))
+            except ValueError:
+                raise ValueError(f"无效的故障规则: {part}（格式 ENDPOINT:KIND=PROB[@ARG]）")
+        return cls(rules, seed)
+
+    def choose(self, endpoint: str) -> Fault:
+        """为一次请求抽样故障（没有命中时返回空的 Fault）"""
+        delay = 0.0
+        chosen = None
+        with self._lock:
+            for rule in self.rules:
+                if rule.endpoint not in ('*', endpoint) or self._rng.random() >= rule.probability:
+                    continue
+                if rule.kind == 'spike':
+                    delay += rule.value
+                elif chosen is None:
+                    chosen = rule
+                else:
+                    continue
+                counts = self.injected.setdefault(endpoint, {})
+                counts[rule.kind] = counts.get(rule.kind, 0) + 1
+        return Fault(delay, chosen)
+
+    def total(self) -> int:
+        """已注入的故障数"""
+        with self._lock:
+            return sum(sum(counts.values()) for counts in self.injected.values())
+
+    def wrap(self, transport: Callable = None) -> Callable:
+        """
+        包装传输函数（签名与 requests.request 相同），在客户端一侧注入故障
+
+        reset 抛出 requests.ConnectionError，5xx / throttle / stoken 返回构造的响应，
+        spike 在发出请求前等待（超过 timeout 时抛出 requests.Timeout）。
+        """
+        def request(method, url, **kwargs):
+            fault = self.choose(endpoint_name(url))
+            if fault.delay:
+                timeout = kwargs.get('timeout')
+                if timeout is not None and fault.delay >= timeout:
+                    time.sleep(timeout)
+                    raise requests.exceptions.ReadTimeout(f"注入的延迟尖峰超过超时（{timeout:g} 秒）")
+                time.sleep(fault.delay)
+            if fault.kind == 'reset':
+                raise requests.exceptions.ConnectionError("Connection reset by peer（注入）")
+            if fault.kind is not None:
+                status, headers, body = fault_response(fault.rule)
+                return make_response(url, status, headers, body)
+            return (transport or requests.request)(method, url, **kwargs)
+
+        return request
+
+
+def fault_response(rule: FaultRule):
+    """故障对应的 (HTTP 状态码, 响应头, 响应体)；reset 与 spike 没有响应"""
+    if rule.kind == '5xx':
+        status = int(rule.value)
+        return status, {'Content-Type': 'text/html'}, \
+            f'<html><body><h1>{status} {_reason(status)}</h1></body></html>'.encode('utf-8')
+    if rule.kind == 'throttle':
+        return 429, {'Content-Type': 'application/json; charset=utf-8',
+                     'Retry-After': f'{rule.value:g}'}, \
+            json.dumps(THROTTLE_ERROR, ensure_ascii=False).encode('utf-8')
+    if rule.kind == 'stoken':
+        return 200, {'Content-Type': 'application/json; charset=utf-8'}, \
+            json.dumps(STOKEN_ERROR, ensure_ascii=False).encode('utf-8')
+    raise ValueError(f"故障 {rule.kind} 没有响应")
+
+
+def _reason(status: int) -> str:
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+def make_response(url: str, status: int, headers: Dict, body: bytes) -> requests.Response:
+    """构造 requests.Response（不经过网络）"""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = _reason(status)
+    response.headers.update(headers)
+    response._content = body
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
+
+
+def describe(injector: FaultInjector) -> List[str]:
+    """规则的可读说明"""
+    return [f"{rule.endpoint}:{rule.kind} {rule.probability:.1%}"
+            + (f" @{rule.arg:g}" if rule.arg is not None else '')
+            for rule in injector.rules]
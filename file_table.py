@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+紧凑的文件列表存储 - 列式保存遍历结果
+
+get_all_files_recursive 为每个文件生成一个 13 个键的字典，几十万个文件时
+仅字典本身就要占用数 GB 内存。FileTable 按列保存同样的信息：
+
+- fid、文件名、share_fid_token 按 UTF-8 连续保存在一块缓冲区中，
+  没有每个字符串的对象开销；fid/file_id 只保存一份
+- 大小、时间戳保存在 array 中（每项 8 字节）
+- 父目录 ID、obj_category、type 等重复值只保存一份，行内只存序号
+
+按下标或迭代访问时才临时生成与 get_all_files_recursive 相同结构的字典，
+因此可以直接传给 parse_file_selection、display_files 等函数。
+
+写入的文件夹条目不占行，只记入路径索引（paths，见 path_index.PathIndex），
+用于按目录选择文件和统计目录大小。
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from name_search import NameIndex
+from path_index import PathIndex
+
+
+# 时间戳为空时的占位值
+_MISSING = -1
+
+
+class _Interned:
+    """重复值池：相同的值只保存一份，行内保存序号"""
+
+    __slots__ = ('values', 'index')
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.index: Dict[Any, int] = {}
+
+    def add(self, value: Any) -> int:
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.values.append(value)
+            self.index[value] = idx
+        return idx
+
+
+class StringColumn:
+    """字符串列：UTF-8 编码后连续保存，按偏移量取值"""
+
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def append(self, value: str) -> None:
+        self.data += value.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets
+        for row in range(len(self)):
+            yield data[offsets[row]:offsets[row + 1]].decode('utf-8')
+
+
+class FileTable:
+    """
+    列式文件列表
+
+    行顺序与写入顺序一致（即 iter_files_recursive 的产出顺序），
+    下标从 0 开始，与 get_all_files_recursive 返回列表的下标一致。
+    """
+
+    __slots__ = ('fids', 'names', 'sizes', 'tokens', 'updated_at', 'created_at',
+                 'is_file', '_pdir', '_category', '_type', '_pdirs', '_categories',
+                 '_types', '_play_urls', '_extra_times', 'paths', '_name_index')
+
+    def __init__(self, records: Optional[Iterable[Dict]] = None, index_names: bool = False):
+        """
+        Args:
+            records: 初始文件记录（可选，可以是生成器）
+            index_names: 是否在写入时同时构建文件名搜索索引（否则首次搜索时再构建）
+        """
+        self.fids = StringColumn()
+        self.names = StringColumn()
+        self.sizes = array('q')
+        self.tokens = StringColumn()
+        self.updated_at = array('q')
+        self.created_at = array('q')
+        self.is_file = bytearray()
+        self._pdir = array('i')
+        self._category = array('i')
+        self._type = array('i')
+        self._pdirs = _Interned()
+        self._categories = _Interned()
+        self._types = _Interned()
+        # 稀疏字段：大多数文件没有播放地址
+        self._play_urls: Dict[int, str] = {}
+        # 非整数时间戳（极少见）按 (行, 字段) 单独保存
+        self._extra_times: Dict[tuple, Any] = {}
+        # 目录路径索引（按写入顺序构建）
+        self.paths = PathIndex()
+        # 文件名搜索索引（见 name_index）；遍历时构建可以把开销分摊到网络等待中
+        self._name_index: Optional[NameIndex] = NameIndex() if index_names else None
+
+        if records is not None:
+            self.extend(records)
+
+    def append(self, record: Dict) -> None:
+        """追加一条文件记录（get_all_files_recursive 的字典格式；文件夹只记录路径信息）"""
+        if not record.get('is_file', True):
+            self.paths.add_folder(record.get('fid') or record.get('file_id'),
+                                  record.get('file_name') or record.get('name') or '',
+                                  record.get('pdir_fid'))
+            return
+
+        row = self.paths.add_file(record.get('pdir_fid'), record.get('size') or 0)
+        self.fids.append(record.get('fid') or record.get('file_id'))
+        self.names.append(record.get('file_name') or record.get('name') or '')
+        self.sizes.append(record.get('size') or 0)
+        self.tokens.append(record.get('share_fid_token') or '')
+        self.is_file.append(1 if record.get('is_file', True) else 0)
+        self._pdir.append(self._pdirs.add(record.get('pdir_fid')))
+        self._category.append(self._categories.add(record.get('obj_category')))
+        self._type.append(self._types.add(record.get('type')))
+
+        for column, key in ((self.updated_at, 'updated_at'), (self.created_at, 'created_at')):
+            value = record.get(key)
+            if isinstance(value, int):
+                column.append(value)
+            else:
+                column.append(_MISSING)
+                if value is not None:
+                    self._extra_times[(row, key)] = value
+
+        play_url = record.get('phone_play_url')
+        if play_url:
+            self._play_urls[row] = play_url
+
+        if self._name_index is not None:
+            self._name_index.add(record.get('file_name') or record.get('name') or '')
+
+    def extend(self, records: Iterable[Dict]) -> None:
+        """追加多条文件记录"""
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self.fids)
+
+    def _time(self, column: array, row: int, key: str) -> Any:
+        value = column[row]
+        if value == _MISSING:
+            return self._extra_times.get((row, key))
+        return value
+
+    def row(self, row: int) -> Dict:
+        """生成第 row 行的字典视图（与 get_all_files_recursive 的结构相同）"""
+        fid = self.fids[row]
+        is_file = bool(self.is_file[row])
+        return {
+            'file_name': self.names[row],
+            'fid': fid,
+            'file_id': fid,
+            'size': self.sizes[row],
+            'type': self._types.values[self._type[row]],
+            'is_file': is_file,
+            'pdir_fid': self._pdirs.values[self._pdir[row]],
+            'obj_category': self._categories.values[self._category[row]],
+            'phone_play_url': self._play_urls.get(row),
+            'dir': not is_file,
+            'share_fid_token': self.tokens[row],
+            'updated_at': self._time(self.updated_at, row, 'updated_at'),
+            'created_at': self._time(self.created_at, row, 'created_at'),
+        }
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('FileTable index out of range')
+        return self.row(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self.row(row)
+
+    def pdir_fid(self, row: int) -> str:
+        """第 row 行的父目录 ID（不生成字典）"""
+        return self._pdirs.values[self._pdir[row]]
+
+    def obj_category(self, row: int) -> Optional[str]:
+        """第 row 行的 obj_category（不生成字典）"""
+        return self._categories.values[self._category[row]]
+
+    def column(self, name: str) -> Sequence:
+        """按行顺序读取一列（name / size / category / pdir），供选择条件按列求值"""
+        if name == 'name':
+            return list(self.names)
+        if name == 'size':
+            return self.sizes
+        if name == 'category':
+            return list(map(self._categories.values.__getitem__, self._category))
+        if name == 'pdir':
+            return list(map(self._pdirs.values.__getitem__, self._pdir))
+        raise KeyError(name)
+
+    @property
+    def name_index(self) -> NameIndex:
+        """文件名搜索索引（首次访问时构建，之后随 append 更新）"""
+        if self._name_index is None:
+            self._name_index = NameIndex(self.names)
+        return self._name_index
+
+    def folder_path(self, fid: str) -> str:
+        """目录的路径（如 "/Season 2/4K"），需要写入过文件夹条目"""
+        return self.paths.folder_path(fid)
+
+    def to_dicts(self) -> List[Dict]:
+        """生成全部行的字典列表（仅在输出时使用）"""
+        return list(self)
+
+    def copy(self) -> List[Dict]:
+        """兼容 list.copy()，返回字典列表"""
+        return self.to_dicts()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+按需展开的分享目录树 - 交互浏览时只请求用户进入的目录
+
+get_all_files_recursive 需要遍历整个分享才能显示任何内容。LazyShareTree 只在
+第一次访问某个目录时请求它的子条目，结果缓存在内存中，再次进入同一目录不会重复请求。
+
+后台预取（prefetch.Prefetcher）与前台共用同一棵树：同一目录正在被一方请求时，
+另一方等待其结果而不是再请求一次。
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from selection_query import compile_selection
+
+
+class LazyShareTree:
+    """按需展开的分享目录树（根目录 fid 为 '0'）"""
+
+    def __init__(self, client, pwd_id: str, stoken: str):
+        """
+        Args:
+            client: QuarkClient 实例
+            pwd_id: 分享链接 ID
+            stoken: 访问令牌
+        """
+        self.client = client
+        self.pwd_id = pwd_id
+        self.stoken = stoken
+        # 已展开的目录：fid -> 子条目（get_all_files_recursive 的字典格式）
+        self.expanded: Dict[str, List[Dict]] = {}
+        # 已知的文件夹条目：fid -> 条目
+        self.folders: Dict[str, Dict] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        # 正在请求的目录：fid -> 请求完成事件
+        self._pending: Dict[str, threading.Event] = {}
+
+    def children(self, fid: str = '0') -> List[Dict]:
+        """
+        获取目录的子条目（首次访问时请求，之后使用缓存）
+
+        Args:
+            fid: 目录 ID
+
+        Returns:
+            List[Dict]: 子条目（文件夹和文件）
+        """
+        while True:
+            with self._lock:
+                items = self.expanded.get(fid)
+                if items is not None:
+                    return items
+                pending = self._pending.get(fid)
+                if pending is None:
+                    pending = self._pending[fid] = threading.Event()
+                    break
+            # 另一线程正在请求该目录：等待完成后重新读取缓存（请求失败时由本线程重试）
+            pending.wait()
+
+        try:
+            items = [self.client.convert_share_file(item, fid)
+                     for item in self.client.iter_folder_items(self.pwd_id, self.stoken, fid)]
+            with self._lock:
+                self.requests += 1
+                for item in items:
+                    if not item['is_file']:
+                        self.folders[item['fid']] = item
+                self.expanded[fid] = items
+        finally:
+            with self._lock:
+                del self._pending[fid]
+            pending.set()
+        return items
+
+    def is_expanded(self, fid: str) -> bool:
+        """目录是否已经请求过"""
+        return fid in self.expanded
+
+    def parent(self, fid: str) -> Optional[str]:
+        """父目录 ID（根目录返回 None）"""
+        if fid == '0':
+            return None
+        folder = self.folders.get(fid)
+        return folder['pdir_fid'] if folder else '0'
+
+    def path(self, fid: str) -> str:
+        """目录路径（如 "/Season 2/4K"）"""
+        names = []
+        while fid != '0' and fid in self.folders:
+            names.append(self.folders[fid]['file_name'])
+            fid = self.folders[fid]['pdir_fid']
+        return '/' + '/'.join(reversed(names))
+
+    def find_child(self, fid: str, name: str) -> Optional[Dict]:
+        """在目录中按名称查找子文件夹（大小写不敏感）"""
+        folders = [item for item in self.children(fid) if not item['is_file']]
+        for item in folders:
+            if item['file_name'] == name:
+                return item
+        lower = name.lower()
+        for item in folders:
+            if item['file_name'].lower() == lower:
+                return item
+        return None
+
+    def resolve(self, fid: str, path: str) -> Optional[str]:
+        """
+        从目录 fid 出发解析路径（支持 ".."、"/" 开头的绝对路径）
+
+        Returns:
+            str: 目标目录 ID；不存在时返回 None
+        """
+        if path.startswith('/'):
+            fid = '0'
+        for part in (p for p in path.split('/') if p and p != '.'):
+            if part == '..':
+                fid = self.parent(fid) or '0'
+                continue
+            child = self.find_child(fid, part)
+            if child is None:
+                return None
+            fid = child['fid']
+        return fid
+
+    def walk_files(self, fid: str = '0') -> List[Dict]:
+        """
+        列出目录下的所有文件（含子目录，按 get_all_files_recursive 的顺序）
+
+        只请求尚未展开的目录。
+        """
+        files = []
+        stack = [iter(self.children(fid))]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+            elif item['is_file']:
+                files.append(item)
+            else:
+                stack.append(iter(self.children(item['fid'])))
+        return files
+
+    def find(self, fid: str, selection: str) -> List[Dict]:
+        """在目录下（含子目录）按规则选择文件"""
+        files = self.walk_files(fid)
+        return compile_selection(selection).filter(
+            files, folder_path=lambda pdir_fid: self.path(pdir_fid)
+        )
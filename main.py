@@ -14,8 +14,11 @@
     python main.py <command> [arguments]
     
 命令：
-    list    <share_url> [--password <pwd>] [--depth <n>]  查看分享文件列表
-    save    <share_url> <fid_list> <to_dir>               转存文件
+    list    <share_url> [--password <pwd>] [--depth <n>] [--cache] [--search <text>] [--deadline <秒>]  查看分享文件列表
+    save    <share_url> <fid_list> <to_dir> [--stream] [--deadline <秒>]  转存文件
+    watch   <share_url> <to_dir> [--select <规则>]        追更：定期检查并转存新增文件
+    snapshot <share_url> <output>                         保存分享快照
+    diff    <old_snapshot> <new_snapshot|share_url>       比较分享快照
     dirs                                                  查看我的目录
     create_dir <dir_name> [--parent_fid <fid>]           创建目录
     login                                                 登录（手动输入 Cookie）
@@ -24,24 +27,55 @@
     python main.py list https://pan.quark.cn/s/xxxxx
     python main.py list https://pan.quark.cn/s/xxxxx --password 1234
     python main.py list https://pan.quark.cn/s/xxxxx --depth 1
+    python main.py list https://pan.quark.cn/s/xxxxx --search "权力的游戏 S02"
+    python main.py list https://pan.quark.cn/s/xxxxx --summary --summary-depth 3
+    python main.py list https://pan.quark.cn/s/xxxxx --deadline 60 --json-only
+    python main.py list https://pan.quark.cn/s/xxxxx --stats
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --trace save.trace.json
+    python main.py list https://pan.quark.cn/s/xxxxx --profile list.prof
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --stream --progress
     python main.py save https://pan.quark.cn/s/xxxxx "1,2,3" "/我的视频"
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --stream
+    python main.py watch https://pan.quark.cn/s/xxxxx "/我的视频/追剧" --select video
+    python main.py snapshot https://pan.quark.cn/s/xxxxx old.json
+    python main.py diff old.json https://pan.quark.cn/s/xxxxx
     python main.py dirs
     python main.py create_dir "测试目录" --parent_fid "a373fb0d522f455ea2af639e9d061747"
     python main.py login
 """
 
 import os
+import re
 import sys
 import json
+import time
+import atexit
 import argparse
-import readline
 from pathlib import Path
 
 # 添加当前目录到路径（支持作为 skill 被引用）
 current_dir = Path(__file__).parent.resolve()
 sys.path.insert(0, str(current_dir))
 
-from quark_client import QuarkClient, display_files, display_file_tree_view, format_size, parse_file_selection, display_file_tree
+# quark_client（requests）、crawl_store（sqlite3）、profiling（cProfile）和 readline 较重，
+# 在用到的命令中再导入：--help 和参数错误不需要加载它们
+import tracing
+from deadline import Deadline
+from metrics import RequestMetrics
+from progress import ndjson_writer
+
+from file_table import FileTable
+from renderer import LineWriter, terminal_page_size
+from share_snapshot import FolderCache, default_cache_path, default_snapshot_path, load_snapshot, save_snapshot, crawl_snapshot, diff_snapshots, snapshot_files
+
+# 夸克文件 ID 格式（32 位十六进制）
+FID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# 本次运行所有客户端共用的请求统计（--stats）
+request_metrics = RequestMetrics()
+
+# --progress 时的进度事件回调（NDJSON 输出到 stderr）
+progress_events = None
 
 
 def get_cookies_path() -> str:
@@ -54,10 +88,12 @@ def get_cookies_path() -> str:
     return "~/.config/quark/cookies.txt"
 
 
-def create_client() -> QuarkClient:
+def create_client() -> 'QuarkClient':
     """创建 QuarkClient 实例并验证 Cookie"""
+    from quark_client import QuarkClient
+    
     cookies_path = get_cookies_path()
-    client = QuarkClient(cookies_path)
+    client = QuarkClient(cookies_path, metrics=request_metrics, on_progress=progress_events)
     
     if not client.login():
         print("❌ Cookie 失效或未登录")
@@ -67,9 +103,128 @@ def create_client() -> QuarkClient:
     return client
 
 
+def resolve_target_dir(client: 'QuarkClient', to_dir: str) -> str:
+    """解析目标目录：以 / 开头视为路径，否则视为目录 ID"""
+    if not to_dir.startswith('/'):
+        return to_dir
+    
+    to_pdir_fid = client.get_dir_by_path(to_dir)
+    if to_pdir_fid is None:
+        print(f"❌ 目标目录不存在: {to_dir}")
+        print(f"提示: 请先运行 'python main.py dirs' 查看可用目录")
+        sys.exit(1)
+    return to_pdir_fid
+
+
+def open_crawl_cache(args, pwd_id: str):
+    """--cache 时加载上次的遍历缓存，否则返回 None（内存受限遍历不使用缓存）"""
+    if not getattr(args, 'cache', False) or getattr(args, 'memory_budget', None):
+        return None
+    return FolderCache(load_snapshot(default_cache_path(pwd_id)))
+
+
+def close_crawl_cache(cache, pwd_id: str) -> None:
+    """保存本次遍历的缓存，供下次增量遍历使用"""
+    if cache is not None:
+        save_snapshot(cache.snapshot(pwd_id), default_cache_path(pwd_id))
+
+
+def open_deadline(args):
+    """--deadline 时返回从现在开始计时的 Deadline，否则返回 None"""
+    if not getattr(args, 'deadline', None):
+        return None
+    if getattr(args, 'memory_budget', None):
+        raise Exception("--deadline 不能与 --memory-budget 同时使用")
+    return Deadline(args.deadline)
+
+
+def crawl_entries(client: 'QuarkClient', pwd_id: str, stoken: str, depth: int = -1,
+                  cache=None, deadline=None, unlisted=None):
+    """
+    遍历分享，产出文件和文件夹条目（文件夹先于其内容）
+    
+    指定 deadline 时按层遍历，时间到后返回已获取的部分，未展开的文件夹追加到 unlisted。
+    """
+    if deadline is None:
+        return client.iter_files_recursive(pwd_id, stoken, max_depth=depth,
+                                           include_folders=True, cache=cache)
+    entries, missing = client.crawl_breadth_first(pwd_id, stoken, deadline,
+                                                  max_depth=depth, cache=cache)
+    if unlisted is not None:
+        unlisted.extend(missing)
+    return iter(entries)
+
+
+def partial_info(all_files, unlisted: list) -> dict:
+    """--deadline 时附加到 JSON 结果中的完整性标记"""
+    return {
+        'partial': bool(unlisted),
+        'unlisted_folders': [all_files.folder_path(entry['fid']) for entry in unlisted],
+    }
+
+
+@tracing.traced('crawl_all_files')
+def crawl_all_files(client: 'QuarkClient', args, pwd_id: str, stoken: str,
+                    depth: int = -1, cache=None, deadline=None, unlisted=None):
+    """
+    获取完整文件列表
+    
+    指定 --memory-budget 时使用内存受限的遍历，结果保存在临时 SQLite 文件中
+    （进程退出时删除）；否则保存在内存中的 FileTable。
+    指定 deadline 时按层遍历，超时返回部分结果（见 crawl_entries）。
+    """
+    if deadline is not None:
+        return FileTable(crawl_entries(client, pwd_id, stoken, depth, cache, deadline, unlisted),
+                         index_names=bool(getattr(args, 'search', None)))
+    
+    if not getattr(args, 'memory_budget', None):
+        return client.get_all_files_table(pwd_id, stoken, max_depth=depth, cache=cache,
+                                          index_names=bool(getattr(args, 'search', None)))
+    
+    from crawl_store import CrawlStore, crawl_to_store
+    from quark_client import parse_size
+    
+    store = CrawlStore()
+    atexit.register(store.close)
+    return crawl_to_store(client, pwd_id, stoken, store, max_depth=depth,
+                          memory_budget=parse_size(args.memory_budget))
+
+
+class JsonStream(list):
+    """
+    包装 FileTable / CrawlStore 供 json.dump 逐项输出
+    
+    json.dump（带缩进时）按 list 处理并逐项迭代，避免先生成完整的字典列表。
+    """
+    
+    def __init__(self, items):
+        super().__init__()
+        self.items = items
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __len__(self):
+        return len(self.items)
+
+
+def collect_files(entries, table: FileTable):
+    """透传遍历结果，同时把其中的文件（及用于还原路径的文件夹）写入 table"""
+    for entry in entries:
+        table.append(entry)
+        yield entry
+
+
 def cmd_list(args):
     """list 命令：查看分享文件列表"""
+    from quark_client import (build_file_tree, display_file_tree, display_files,
+                              iter_entry_lines, iter_summary_lines)
+    
     try:
+        # 时间预算从命令开始计时
+        deadline = open_deadline(args)
+        unlisted = []
+        
         client = create_client()
         
         # 解析分享链接
@@ -83,17 +238,14 @@ def cmd_list(args):
         # 获取文件列表
         depth = args.depth if args.depth and args.depth > 0 else -1
         
-        # 获取文件夹树结构
-        tree = client.get_folder_tree(pwd_id, stoken, max_depth=depth)
+        # 增量遍历：复用上次缓存中 updated_at 未变化的目录
+        cache = open_crawl_cache(args, pwd_id)
         
-        # 获取完整文件列表
-        if depth == -1 or depth > 0:
-            all_files = client.get_all_files_recursive(pwd_id, stoken, max_depth=depth if depth > 0 else -1)
-        else:
-            all_files = client.get_file_list(pwd_id, stoken, '0')
-        
-        # 显示树形结构（默认，除非 --json-only）
-        if not args.json_only:
+        # 分页：每满一屏暂停（输出不是终端时不分页）
+        writer = LineWriter(page_size=terminal_page_size() if args.page else 0)
+        progressive = args.progressive and not (args.json_only or args.memory_budget or args.search
+                                                 or args.summary or deadline)
+        if not args.json_only and not args.search:
             print(f"📁 分享 ID: {pwd_id}")
             if password:
                 print(f"🔑 提取码: {password}")
@@ -101,59 +253,91 @@ def cmd_list(args):
             # 获取 stoken
             print("\n🔐 获取访问令牌...")
             print("✅ 成功")
+        
+        # 一次遍历同时得到文件夹树和完整文件列表（文件列表按列紧凑保存）
+        tree = None
+        if args.json_only or args.memory_budget or args.search or args.summary:
+            all_files = crawl_all_files(client, args, pwd_id, stoken, depth, cache,
+                                        deadline, unlisted)
+        else:
+            all_files = FileTable()
+            entries = collect_files(crawl_entries(client, pwd_id, stoken, depth, cache,
+                                                  deadline, unlisted), all_files)
+            if progressive:
+                # 边遍历边显示：每个条目遍历到即输出
+                print("\n📂 文件列表（边遍历边显示）:")
+                print("=" * 80)
+                lines = iter_entry_lines(entries)
+                if not writer.write_lines(lines):
+                    # 停止显示后继续完成遍历
+                    for _ in lines:
+                        pass
+                writer.flush()
+                print("=" * 80)
+            else:
+                tree = build_file_tree(entries)
+        close_crawl_cache(cache, pwd_id)
+        
+        if unlisted and not args.json_only:
+            print(f"⏱️  已到时间限制（{args.deadline:g} 秒）：{len(unlisted)} 个目录未展开，以下为部分结果")
+        
+        # 模糊搜索：只显示匹配的文件（序号为完整列表中的序号，可直接用于 save）
+        if args.search:
+            list_search_results(args, pwd_id, stoken, all_files,
+                                partial_info(all_files, unlisted) if deadline else None)
+            return
+        
+        # 显示树形结构（默认，除非 --json-only）
+        if not args.json_only:
+            if cache is not None:
+                print(f"♻️  增量遍历: 请求 {cache.stats['listed_folders']} 个目录，"
+                      f"复用 {cache.stats['reused_folders']} 个未变化目录")
             
-            # 显示文件树（树形格式）
-            print("\n📂 文件列表:")
-            print("=" * 80)
+            if args.summary:
+                # 汇总树：目录统计来自遍历时构建的路径索引，超出范围的内容折叠
+                print("\n📂 文件汇总:")
+                print("=" * 80)
+                writer.write_lines(iter_summary_lines(all_files.paths, all_files,
+                                                      args.max_children, args.summary_depth))
+                writer.flush()
+                print("=" * 80)
+                print(f"共 {len(all_files)} 个文件（完整列表见 --json，或用 --search 查找）\n")
             
-            if tree and tree.get('children'):
-                display_file_tree(tree)
-            else:
-                # 获取根目录文件
-                files = client.get_file_list(pwd_id, stoken, '0')
+            # 显示文件树（树形格式）
+            elif not progressive:
+                print("\n📂 文件列表:")
+                print("=" * 80)
                 
-                # 递归显示
-                def display_recursive(files, prefix='', depth=0, max_depth=10, index_counter=[1]):
-                    for i, f in enumerate(files):
-                        name = f.get('file_name', '未知')
-                        fid = f.get('fid', '')
-                        size = f.get('size', 0)
-                        is_dir = f.get('dir', False) or not f.get('is_file', True)
-                        size_str = format_size(size) if size > 0 else '-'
-                        
-                        # 树形符号
-                        is_last = (i == len(files) - 1)
-                        branch = '└─ ' if is_last else '├─ '
-                        indent = '│  ' if not is_last else '   '
-                        
-                        if is_dir:
-                            print(f"{prefix}{branch}📁 {name}/")
-                            if max_depth == -1 or depth < max_depth:
-                                # 获取子文件夹内容
-                                sub_files = client.get_file_list(pwd_id, stoken, fid)
-                                display_recursive(sub_files, prefix + indent, depth + 1, max_depth, index_counter)
-                        else:
-                            idx = index_counter[0]
-                            index_counter[0] += 1
-                            print(f"{prefix}{branch}📄 {name} ({size_str}) [{idx}]")
+                if tree is None:
+                    print("（内存受限模式不显示树形结构）")
+                elif tree.get('children'):
+                    display_file_tree(tree, paths=all_files.paths, writer=writer)
+                    writer.flush()
+                else:
+                    print("📂 空目录")
                 
-                display_recursive(files, '', 0, depth if depth > 0 else 10)
-            
-            print("=" * 80)
+                print("=" * 80)
             
             # 显示索引
-            index_map = display_files(all_files)
+            if args.summary:
+                index_map = [str(i) for i in range(1, len(all_files) + 1)]
+            else:
+                index_map = display_files(all_files, writer=writer)
+        else:
+            index_map = [str(i) for i in range(1, len(all_files) + 1)]
         
         # 输出完整信息供程序使用
         result = {
             'success': True,
             'pwd_id': pwd_id,
             'stoken': stoken,
-            'files': all_files,
+            'files': JsonStream(all_files),
             'count': len(all_files),
             'depth': depth if depth > 0 else 'all',
             'index_map': index_map
         }
+        if deadline is not None:
+            result.update(partial_info(all_files, unlisted))
         
     except Exception as e:
         print(f"\n❌ 错误: {e}")
@@ -169,12 +353,155 @@ def cmd_list(args):
     if args.json or args.json_only:
         if not args.json_only:
             print("\n")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        # 逐项写出，不在内存中拼出完整的 JSON 字符串
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+
+def list_search_results(args, pwd_id: str, stoken: str, all_files,
+                        partial: dict = None) -> None:
+    """显示 list --search 的结果（按相似度排序），partial 为 --deadline 时的完整性标记"""
+    from quark_client import format_size
+    
+    matches = all_files.name_index.search(args.search, limit=args.limit)
+    
+    if not args.json_only:
+        print(f"🔍 搜索 \"{args.search}\"：{len(matches)} 个匹配（共 {len(all_files)} 个文件）")
+        print("=" * 80)
+        for row, _ in matches:
+            file = all_files[row]
+            path = all_files.folder_path(file['pdir_fid'])
+            print(f"[{row + 1}] {file['file_name']} ({format_size(file['size'])})  {path}")
+        print("=" * 80)
+    
+    if args.json or args.json_only:
+        files = []
+        for row, score in matches:
+            file = all_files[row]
+            file['index'] = row + 1
+            file['score'] = round(score, 3)
+            files.append(file)
+        result = {
+            'success': True,
+            'pwd_id': pwd_id,
+            'stoken': stoken,
+            'query': args.search,
+            'files': files,
+            'count': len(files),
+        }
+        if partial is not None:
+            result.update(partial)
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+
+def save_selected(client: 'QuarkClient', args, pwd_id: str, stoken: str,
+                  selection: str, to_pdir_fid: str, deadline=None) -> dict:
+    """先获取完整文件列表，再一次性转存选中的文件"""
+    from quark_client import is_index_selection, parse_file_selection
+    
+    # 获取文件列表以获取序号映射
+    cache = open_crawl_cache(args, pwd_id)
+    unlisted = []
+    all_files = crawl_all_files(client, args, pwd_id, stoken, -1, cache, deadline, unlisted)
+    close_crawl_cache(cache, pwd_id)
+    
+    if unlisted:
+        # 部分列表中的序号与完整列表不一致
+        if is_index_selection(selection):
+            raise Exception(f"已到时间限制，{len(unlisted)} 个目录未展开，不能按序号选择；"
+                            f"请加大 --deadline 或改用规则选择")
+        print(f"⏱️  已到时间限制（{args.deadline:g} 秒）：{len(unlisted)} 个目录未展开，"
+              f"只转存已获取部分中选中的文件")
+    
+    parts = [f.strip() for f in selection.split(',') if f.strip()]
+    if parts and all(FID_PATTERN.match(p) for p in parts):
+        # 直接是 fid 列表
+        fid_list = parts
+        wanted = set(parts)
+        fid_to_token = {f['fid']: f.get('share_fid_token', '') for f in all_files if f['fid'] in wanted}
+        share_fid_tokens = [fid_to_token.get(fid, '') for fid in fid_list]
+    else:
+        # 序号选择（如 "1,2,3" 或 "1-10"）或按规则选择（如 "all"、"*.mkv"、"video"）
+        selected_files = parse_file_selection(selection, all_files)
+        fid_list = [f.get('fid') or f.get('file_id') for f in selected_files]
+        share_fid_tokens = [f.get('share_fid_token', '') for f in selected_files]
+    
+    if not fid_list:
+        print("❌ 没有选择任何文件")
+        sys.exit(1)
+    
+    # 执行转存
+    print(f"\n🚀 开始转存 {len(fid_list)} 个文件到目录 {to_pdir_fid}...")
+    task_id = client.save_files(
+        pwd_id, stoken, fid_list, share_fid_tokens, to_pdir_fid
+    )
+    
+    if not task_id:
+        raise Exception("创建转存任务失败")
+    
+    print(f"✅ 转存任务已创建: {task_id}")
+    
+    # 等待任务完成
+    success = client.wait_task_complete(task_id)
+    
+    result = {
+        'action': 'save',
+        'status': 'success' if success else 'error',
+        'task_id': task_id,
+        'file_count': len(fid_list),
+        'target_dir': args.to_dir
+    }
+    if deadline is not None:
+        result.update(partial_info(all_files, unlisted))
+    return result
+
+
+def save_streaming(client: 'QuarkClient', args, pwd_id: str, stoken: str,
+                   selection: str, to_pdir_fid: str, deadline=None) -> dict:
+    """边遍历边转存：匹配规则的文件凑满一批即提交"""
+    from quark_client import build_selection_filter
+    
+    file_filter = build_selection_filter(selection)
+    if file_filter is None:
+        raise Exception("流式转存只支持按规则选择（如 all、*.mkv、video），不支持序号")
+    
+    print(f"\n🚀 边遍历边转存到目录 {to_pdir_fid}（每批 {args.batch_size} 个文件）...")
+    
+    def on_batch(batch_no, count, task_id):
+        print(f"✅ 第 {batch_no} 批已提交: {count} 个文件，任务 {task_id}")
+    
+    summary = client.save_files_streaming(
+        pwd_id, stoken, file_filter, to_pdir_fid,
+        batch_size=args.batch_size, on_batch=on_batch, deadline=deadline
+    )
+    
+    if summary['partial']:
+        print(f"⏱️  已到时间限制（{args.deadline:g} 秒）：遍历未完成，只转存了已遍历部分中选中的文件")
+    
+    if not summary['file_count']:
+        print("❌ 没有选择任何文件")
+        sys.exit(1)
+    
+    result = {
+        'action': 'save',
+        'status': 'error' if summary['failed_tasks'] else 'success',
+        'task_ids': summary['task_ids'],
+        'failed_tasks': summary['failed_tasks'],
+        'file_count': summary['file_count'],
+        'target_dir': args.to_dir
+    }
+    if deadline is not None:
+        result['partial'] = summary['partial']
+    return result
 
 
 def cmd_save(args):
     """save 命令：转存文件"""
     try:
+        # 时间预算从命令开始计时（只限制遍历，转存任务照常等待完成）
+        deadline = open_deadline(args)
+        
         client = create_client()
         
         # 解析分享链接
@@ -187,68 +514,191 @@ def cmd_save(args):
         stoken = client.get_stoken(pwd_id, password)
         print("✅ 成功")
         
-        # 获取文件列表以获取序号映射
-        all_files = client.get_all_files_recursive(pwd_id, stoken)
+        # 获取目标目录 ID
+        to_pdir_fid = resolve_target_dir(client, args.to_dir)
         
-        # 解析要转存的文件 ID（序号或 fid）
         selection = args.fid_list.strip()
         
-        # 如果是数字或数字列表，说明是序号
-        if selection.replace(',', '').replace('-', '').isdigit():
-            # 解析序号选择
-            from quark_client import parse_file_selection
-            selected_files = parse_file_selection(selection, all_files)
-            fid_list = [f.get('fid') or f.get('file_id') for f in selected_files]
+        if args.stream:
+            result = save_streaming(client, args, pwd_id, stoken, selection, to_pdir_fid, deadline)
         else:
-            # 直接是 fid 列表
-            fid_list = [f.strip() for f in selection.split(',') if f.strip()]
-            selected_files = [f for f in all_files if (f.get('fid') or f.get('file_id')) in fid_list]
+            result = save_selected(client, args, pwd_id, stoken, selection, to_pdir_fid, deadline)
         
-        if not fid_list:
-            print("❌ 没有选择任何文件")
-            sys.exit(1)
+        # 默认只显示人类可读格式
+        if not args.json_only:
+            print(f"\n✅ 转存完成: {result['file_count']} 个文件转存到 {args.to_dir}")
         
-        # 获取文件的 share_fid_token
-        fid_to_token = {f.get('fid') or f.get('file_id'): f.get('share_fid_token', '') for f in all_files}
-        share_fid_tokens = [fid_to_token.get(fid, '') for fid in fid_list]
+        # 显示 JSON（如果指定）
+        if args.json or args.json_only:
+            if not args.json_only:
+                print("\n")
+            print(json.dumps(result, indent=2, ensure_ascii=False))
         
-        # 获取目标目录 ID
-        if args.to_dir.startswith('/'):
-            to_pdir_fid = client.get_dir_by_path(args.to_dir)
-            if to_pdir_fid is None:
-                print(f"❌ 目标目录不存在: {args.to_dir}")
-                print(f"提示: 请先运行 'python main.py dirs' 查看可用目录")
-                sys.exit(1)
-        else:
-            to_pdir_fid = args.to_dir
+    except Exception as e:
+        print(f"\n❌ 错误: {e}")
+        error_result = {
+            'action': 'save',
+            'status': 'error',
+            'message': str(e)
+        }
+        print(json.dumps(error_result, indent=2, ensure_ascii=False))
+        sys.exit(1)
+
+
+def watch_once(client: 'QuarkClient', args, pwd_id: str, password: str,
+               to_pdir_fid: str, snapshot_path: str) -> dict:
+    """执行一轮追更检查：增量遍历、比较快照、转存新增文件"""
+    from quark_client import parse_file_selection
+    
+    previous = load_snapshot(snapshot_path)
+    stoken = client.get_stoken(pwd_id, password)
+    
+    snapshot = crawl_snapshot(client, pwd_id, stoken, previous)
+    stats = snapshot.pop('stats')
+    
+    result = {
+        'action': 'watch',
+        'status': 'success',
+        'checked_at': snapshot['created_at'],
+        'listed_folders': stats['listed_folders'],
+        'reused_folders': stats['reused_folders'],
+        'new_files': [],
+        'task_ids': []
+    }
+    
+    if previous is None and not args.initial:
+        # 首次运行只记录基线，不转存已有文件
+        save_snapshot(snapshot, snapshot_path)
+        result['baseline'] = True
+        if not args.json_only:
+            print(f"📸 已记录基线快照（{len(snapshot['folders'])} 个目录）: {snapshot_path}")
+        return result
+    
+    diff = diff_snapshots(previous, snapshot)
+    selected = parse_file_selection(args.select, diff['added'])
+    
+    # 上一轮中途失败时未转存的文件（已记入快照，不会再出现在新增文件中）
+    pending = set((previous or {}).get('pending', ())) - {f['fid'] for f in selected}
+    if pending:
+        selected = [f for f in snapshot_files(snapshot) if f['fid'] in pending] + selected
+    result['new_files'] = [{'fid': f['fid'], 'file_name': f['file_name'], 'size': f['size']}
+                           for f in selected]
+    
+    if not args.json_only:
+        print(f"🔍 检查完成：请求 {stats['listed_folders']} 个目录，"
+              f"沿用 {stats['reused_folders']} 个未变化目录，"
+              f"新增 {len(diff['added'])} 个文件，匹配 {len(selected)} 个")
+    
+    for start in range(0, len(selected), args.batch_size):
+        batch = selected[start:start + args.batch_size]
+        try:
+            task_id = client.save_files(
+                pwd_id, stoken,
+                [f['fid'] for f in batch],
+                [f.get('share_fid_token', '') for f in batch],
+                to_pdir_fid
+            )
+            if not task_id:
+                raise Exception("创建转存任务失败")
+            result['task_ids'].append(task_id)
+            success = client.wait_task_complete(task_id)
+        except Exception:
+            save_pending(snapshot, selected[start:], snapshot_path)
+            raise
+        if not success:
+            # 已成功的批次记入快照，下一轮只重试剩下的文件，避免重复转存
+            save_pending(snapshot, selected[start:], snapshot_path)
+            result['status'] = 'error'
+            return result
+    
+    save_snapshot(snapshot, snapshot_path)
+    return result
+
+
+def save_pending(snapshot: dict, pending: list, snapshot_path: str) -> None:
+    """保存快照，并记下尚未转存成功的文件（下一轮追更时重试）"""
+    snapshot['pending'] = [f['fid'] for f in pending]
+    save_snapshot(snapshot, snapshot_path)
+
+
+def cmd_watch(args):
+    """watch 命令：定期检查分享，只转存新增的文件"""
+    try:
+        client = create_client()
+        
+        # 解析分享链接
+        parsed = client.parse_share_url(args.share_url)
+        pwd_id = parsed['pwd_id']
+        password = parsed['password'] if not args.password else args.password
         
-        # 执行转存
-        print(f"\n🚀 开始转存 {len(fid_list)} 个文件到目录 {to_pdir_fid}...")
-        task_id = client.save_files(
-            pwd_id, stoken, fid_list, share_fid_tokens, to_pdir_fid
-        )
+        to_pdir_fid = resolve_target_dir(client, args.to_dir)
+        snapshot_path = args.snapshot or default_snapshot_path(pwd_id)
         
-        if not task_id:
-            raise Exception("创建转存任务失败")
+        if not args.json_only:
+            print(f"👀 追更分享 {pwd_id} → {args.to_dir}（规则: {args.select}）")
+        
+        while True:
+            result = watch_once(client, args, pwd_id, password, to_pdir_fid, snapshot_path)
+            
+            if not args.json_only and result['new_files']:
+                print(f"✅ 已转存 {len(result['new_files'])} 个新文件")
+            
+            if args.json or args.json_only:
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+            
+            if args.once:
+                break
+            time.sleep(args.interval)
         
-        print(f"✅ 转存任务已创建: {task_id}")
+    except KeyboardInterrupt:
+        print("\n👋 已停止追更")
+    except Exception as e:
+        print(f"\n❌ 错误: {e}")
+        error_result = {
+            'action': 'watch',
+            'status': 'error',
+            'message': str(e)
+        }
+        print(json.dumps(error_result, indent=2, ensure_ascii=False))
+        sys.exit(1)
+
+
+def crawl_share_snapshot(client: 'QuarkClient', share_url: str, password: str,
+                         previous: dict = None) -> dict:
+    """解析分享链接并生成快照（以 previous 为基础增量遍历）"""
+    parsed = client.parse_share_url(share_url)
+    pwd_id = parsed['pwd_id']
+    stoken = client.get_stoken(pwd_id, password or parsed['password'])
+    snapshot = crawl_snapshot(client, pwd_id, stoken, previous)
+    snapshot.pop('stats')
+    return snapshot
+
+
+def cmd_snapshot(args):
+    """snapshot 命令：保存分享快照（目录结构 + 每个目录的 hash）"""
+    try:
+        client = create_client()
         
-        # 等待任务完成
-        success = client.wait_task_complete(task_id)
+        # 已有同名快照时以它为基础增量遍历
+        previous = load_snapshot(args.output)
+        snapshot = crawl_share_snapshot(client, args.share_url, args.password, previous)
+        save_snapshot(snapshot, args.output)
         
         result = {
-            'action': 'save',
-            'status': 'success' if success else 'error',
-            'task_id': task_id,
-            'file_count': len(fid_list),
-            'target_dir': args.to_dir
+            'action': 'snapshot',
+            'status': 'success',
+            'pwd_id': snapshot['pwd_id'],
+            'path': args.output,
+            'folder_count': len(snapshot['folders']),
+            'file_count': len(snapshot_files(snapshot)),
+            'root_hash': snapshot['folders']['0']['hash']
         }
         
-        # 默认只显示人类可读格式
         if not args.json_only:
-            print(f"\n✅ 转存完成: {len(fid_list)} 个文件转存到 {args.to_dir}")
+            print(f"\n📸 快照已保存: {args.output}")
+            print(f"   目录数: {result['folder_count']}，文件数: {result['file_count']}")
+            print(f"   根目录 hash: {result['root_hash']}")
         
-        # 显示 JSON（如果指定）
         if args.json or args.json_only:
             if not args.json_only:
                 print("\n")
@@ -257,7 +707,66 @@ def cmd_save(args):
     except Exception as e:
         print(f"\n❌ 错误: {e}")
         error_result = {
-            'action': 'save',
+            'action': 'snapshot',
+            'status': 'error',
+            'message': str(e)
+        }
+        print(json.dumps(error_result, indent=2, ensure_ascii=False))
+        sys.exit(1)
+
+
+def cmd_diff(args):
+    """diff 命令：比较两个快照（或快照与分享的当前状态）"""
+    from quark_client import format_size
+    
+    try:
+        old = load_snapshot(args.old)
+        if old is None:
+            raise Exception(f"快照不存在: {args.old}")
+        
+        if args.new.startswith('http'):
+            # 与分享的当前状态比较：以旧快照为基础增量遍历
+            client = create_client()
+            new = crawl_share_snapshot(client, args.new, args.password, old)
+            if args.output:
+                save_snapshot(new, args.output)
+        else:
+            new = load_snapshot(args.new)
+            if new is None:
+                raise Exception(f"快照不存在: {args.new}")
+        
+        diff = diff_snapshots(old, new)
+        
+        if not args.json_only:
+            print(f"\n🔍 比较了 {diff['compared_folders']} 个有变化的目录")
+            print("-" * 60)
+            for f in diff['added']:
+                print(f"  ➕ {f['file_name']} ({format_size(f['size'])})")
+            for f in diff['removed']:
+                print(f"  ➖ {f['file_name']} ({format_size(f['size'])})")
+            for f in diff['changed']:
+                print(f"  ✏️  {f['file_name']} ({format_size(f['old_size'])} → {format_size(f['new_size'])})")
+            print("-" * 60)
+            print(f"新增 {len(diff['added'])}，删除 {len(diff['removed'])}，变化 {len(diff['changed'])}\n")
+        
+        result = {
+            'action': 'diff',
+            'status': 'success',
+            'added': diff['added'],
+            'removed': diff['removed'],
+            'changed': diff['changed'],
+            'compared_folders': diff['compared_folders']
+        }
+        
+        if args.json or args.json_only:
+            if not args.json_only:
+                print("\n")
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+        
+    except Exception as e:
+        print(f"\n❌ 错误: {e}")
+        error_result = {
+            'action': 'diff',
             'status': 'error',
             'message': str(e)
         }
@@ -326,9 +835,13 @@ def cmd_dirs(args):
 
 def cmd_login(args):
     """login 命令：手动登录"""
+    # 输入 Cookie 时支持行编辑
+    import readline
+    from quark_client import QuarkClient
+    
     try:
         cookies_path = get_cookies_path()
-        client = QuarkClient(cookies_path)
+        client = QuarkClient(cookies_path, metrics=request_metrics)
         
         print("\n" + "="*60)
         print("🔒 夸克网盘登录")
@@ -404,10 +917,36 @@ def main():
     
   指定递归深度（1 表示只显示第一层）:
     python main.py list https://pan.quark.cn/s/xxxxx --depth 1
+    python main.py list https://pan.quark.cn/s/xxxxx --search "权力的游戏 S02"
+    python main.py list https://pan.quark.cn/s/xxxxx --summary --summary-depth 3
+    python main.py list https://pan.quark.cn/s/xxxxx --deadline 60 --json-only
+    
+  查看各接口的请求次数和耗时（任意命令均可加 --stats，输出到 stderr）:
+    python main.py list https://pan.quark.cn/s/xxxxx --stats
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --stats json
+    
+  记录各步骤与请求的时间线（用 chrome://tracing 或 ui.perfetto.dev 打开）:
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --trace save.trace.json
+    
+  CPU profile 与网络 / JSON 解码 / 渲染的耗时分布（也可设置环境变量 QUARK_PROFILE）:
+    python main.py list https://pan.quark.cn/s/xxxxx --profile list.prof
+    
+  在 stderr 逐行输出 JSON 进度事件（目录数、文件数、请求速率、预计剩余时间）:
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --stream --progress
     
   转存指定文件:
     python main.py save https://pan.quark.cn/s/xxxxx "1,2,3" "/我的视频"
     
+  边遍历边转存（适合超大分享）:
+    python main.py save https://pan.quark.cn/s/xxxxx "*.mkv" "/我的视频" --stream
+    
+  追更（每 10 分钟检查一次，只转存新增的视频）:
+    python main.py watch https://pan.quark.cn/s/xxxxx "/我的视频/追剧" --select video
+    
+  保存快照并与分享当前状态比较:
+    python main.py snapshot https://pan.quark.cn/s/xxxxx old.json
+    python main.py diff old.json https://pan.quark.cn/s/xxxxx
+    
   查看我的目录:
     python main.py dirs
     
@@ -427,6 +966,26 @@ def main():
     list_parser.add_argument('--password', '-p', help='提取码')
     list_parser.add_argument('--depth', '-d', type=int, default=-1,
                             help='递归深度（-1 表示无限，1 表示只显示第一层）')
+    list_parser.add_argument('--cache', action='store_true',
+                            help='增量遍历：复用上次缓存中未变化的目录（缓存在 ~/.config/quark/cache）')
+    list_parser.add_argument('--memory-budget', metavar='SIZE',
+                            help='内存受限遍历（如 64M）：超出预算时待遍历目录和结果写入临时 SQLite 文件')
+    list_parser.add_argument('--progressive', action='store_true',
+                            help='边遍历边显示树形结构（不等待遍历完成）')
+    list_parser.add_argument('--summary', action='store_true',
+                            help='汇总显示：每个目录显示文件数和总大小，超出范围的内容折叠为一行')
+    list_parser.add_argument('--max-children', type=int, default=20,
+                            help='--summary 时每个目录最多显示的子目录 / 文件数（默认 20）')
+    list_parser.add_argument('--summary-depth', type=int, default=2,
+                            help='--summary 时最多展开的目录层数（默认 2）')
+    list_parser.add_argument('--page', action='store_true',
+                            help='分页显示，每满一屏暂停（回车继续，q 停止显示）')
+    list_parser.add_argument('--search', '-s', metavar='TEXT',
+                            help='模糊搜索文件名，只显示匹配的文件（按相似度排序）')
+    list_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                            help='总时间限制（秒）：按层遍历，到时返回已获取的部分并标记 partial')
+    list_parser.add_argument('--limit', type=int, default=50,
+                            help='--search 最多显示的结果数（默认 50，0 表示不限）')
     list_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
     list_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
     
@@ -436,9 +995,53 @@ def main():
     save_parser.add_argument('fid_list', help='文件 ID 列表（逗号分隔）')
     save_parser.add_argument('to_dir', help='目标目录路径')
     save_parser.add_argument('--password', '-p', help='提取码')
+    save_parser.add_argument('--stream', action='store_true',
+                            help='边遍历边转存（仅支持按规则选择，如 all、*.mkv、video）')
+    save_parser.add_argument('--batch-size', type=int, default=100,
+                            help='流式转存时每批文件数（默认 100）')
+    save_parser.add_argument('--cache', action='store_true',
+                            help='增量遍历：复用上次缓存中未变化的目录（缓存在 ~/.config/quark/cache）')
+    save_parser.add_argument('--memory-budget', metavar='SIZE',
+                            help='内存受限遍历（如 64M）：超出预算时待遍历目录和结果写入临时 SQLite 文件')
+    save_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                            help='遍历的总时间限制（秒），到时只转存已获取部分中选中的文件')
     save_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
     save_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
     
+    # watch 命令
+    watch_parser = subparsers.add_parser('watch', help='追更：定期检查分享并转存新增文件')
+    watch_parser.add_argument('share_url', help='夸克分享链接')
+    watch_parser.add_argument('to_dir', help='目标目录路径')
+    watch_parser.add_argument('--password', '-p', help='提取码')
+    watch_parser.add_argument('--select', '-s', default='all',
+                             help='新增文件的选择规则（如 all、*.mkv、video，默认 all）')
+    watch_parser.add_argument('--interval', type=int, default=600,
+                             help='检查间隔（秒，默认 600）')
+    watch_parser.add_argument('--once', action='store_true', help='只检查一次')
+    watch_parser.add_argument('--initial', action='store_true',
+                             help='首次运行时转存已有的匹配文件（默认只记录基线）')
+    watch_parser.add_argument('--snapshot', help='快照文件路径（默认 ~/.config/quark/snapshots/<分享ID>.json）')
+    watch_parser.add_argument('--batch-size', type=int, default=100, help='每批转存的文件数（默认 100）')
+    watch_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
+    watch_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
+    
+    # snapshot 命令
+    snapshot_parser = subparsers.add_parser('snapshot', help='保存分享快照')
+    snapshot_parser.add_argument('share_url', help='夸克分享链接')
+    snapshot_parser.add_argument('output', help='快照文件路径（已存在时增量更新）')
+    snapshot_parser.add_argument('--password', '-p', help='提取码')
+    snapshot_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
+    snapshot_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
+    
+    # diff 命令
+    diff_parser = subparsers.add_parser('diff', help='比较分享快照')
+    diff_parser.add_argument('old', help='旧快照文件路径')
+    diff_parser.add_argument('new', help='新快照文件路径，或分享链接（与当前状态比较）')
+    diff_parser.add_argument('--password', '-p', help='提取码（new 为分享链接时）')
+    diff_parser.add_argument('--output', '-o', help='new 为分享链接时，将当前状态保存为快照')
+    diff_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
+    diff_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
+    
     # dirs 命令
     dirs_parser = subparsers.add_parser('dirs', help='查看我的目录')
     dirs_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
@@ -454,6 +1057,23 @@ def main():
     create_dir_parser.add_argument('--json', action='store_true', help='输出 JSON 格式（默认只显示人类可读格式）')
     create_dir_parser.add_argument('--json-only', action='store_true', help='只输出 JSON（不显示树形结构）')
     
+    # 所有命令都支持 --stats、--trace、--profile、--progress
+    for command_parser in subparsers.choices.values():
+        command_parser.add_argument('--stats', nargs='?', const='auto', choices=['auto', 'text', 'json'],
+                                    help='结束时在 stderr 输出各接口的请求统计（text / json，'
+                                         '默认随 --json / --json-only）')
+        command_parser.add_argument('--trace', metavar='FILE',
+                                    help='把各步骤和请求的时间线写入 Chrome trace 文件'
+                                         '（chrome://tracing 或 ui.perfetto.dev 打开）')
+        command_parser.add_argument('--profile', metavar='FILE',
+                                    default=os.environ.get('QUARK_PROFILE') or None,
+                                    help='把 CPU profile 写入 FILE、耗时分布写入 FILE.txt'
+                                         '（默认取环境变量 QUARK_PROFILE）')
+        command_parser.add_argument('--progress', action='store_true',
+                                    default=bool(os.environ.get('QUARK_PROGRESS')),
+                                    help='在 stderr 逐行输出 JSON 进度事件：遍历、路径解析、转存'
+                                         '（也可设置环境变量 QUARK_PROGRESS=1）')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -464,12 +1084,56 @@ def main():
     commands = {
         'list': cmd_list,
         'save': cmd_save,
+        'watch': cmd_watch,
+        'snapshot': cmd_snapshot,
+        'diff': cmd_diff,
         'dirs': cmd_dirs,
         'login': cmd_login,
         'create_dir': cmd_create_dir
     }
     
-    commands[args.command](args)
+    global progress_events
+    if args.progress:
+        progress_events = ndjson_writer()
+    profiler = None
+    if args.profile:
+        from profiling import Profiler
+        profiler = Profiler().start()
+    if args.trace:
+        tracing.start()
+    try:
+        with tracing.span(f'main.py {args.command}'):
+            commands[args.command](args)
+    finally:
+        # 命令失败退出时同样输出
+        if profiler is not None:
+            write_profile(profiler, args.profile)
+        if args.stats:
+            print_stats(args)
+        if args.trace:
+            tracing.stop()
+            count = tracing.export(args.trace)
+            print(f"🧭 已写入追踪文件: {args.trace}（{count} 个 span）", file=sys.stderr)
+
+
+def write_profile(profiler: 'Profiler', path: str) -> None:
+    """停止剖析，写出 profile 和报告，在 stderr 输出耗时分布"""
+    profiler.stop()
+    report_path = profiler.write(path)
+    print('\n'.join(profiler.format_lines()), file=sys.stderr)
+    print(f"🔬 已写入性能剖析: {path}（报告 {report_path}）", file=sys.stderr)
+
+
+def print_stats(args) -> None:
+    """在 stderr 输出请求统计（不影响 stdout 上的 JSON）"""
+    mode = args.stats
+    if mode == 'auto':
+        mode = 'json' if getattr(args, 'json', False) or getattr(args, 'json_only', False) else 'text'
+    if mode == 'json':
+        print(json.dumps({'stats': request_metrics.snapshot()}, ensure_ascii=False, indent=2),
+              file=sys.stderr)
+    else:
+        print('\n'.join(request_metrics.format_lines()), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+请求统计 - 按接口记录调用次数、耗时分布、接收字节数、重试和错误
+
+QuarkClient 的每次 HTTP 请求（包括重试）都记入 RequestMetrics：
+
+    calls       发出的请求数（每次重试都算一次）
+    errors      失败的请求数（连接错误、超时、HTTP 4xx / 5xx）
+    retries     重试次数
+    bytes       接收的响应体字节数
+    耗时直方图  按 BUCKETS 分桶计数，p50 / p95 / p99 在所在桶内线性插值
+
+耗时只计网络请求本身，不含在调度器中排队的时间。
+
+    metrics = RequestMetrics()
+    client = QuarkClient(cookies_path, metrics=metrics)
+    ...
+    print('\\n'.join(metrics.format_lines()))
+"""
+
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List
+
+# 耗时直方图的桶上界（秒），最后一个桶为 +inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class EndpointStats:
+    """单个接口的统计"""
+
+    __slots__ = ('calls', 'errors', 'retries', 'bytes', 'seconds', 'min', 'max', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def percentile(self, q: float) -> float:
+        """耗时的百分位数（在所在桶内线性插值，不超过最大值）"""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            if count and seen + count >= rank:
+                lower = max(BUCKETS[bucket - 1] if bucket else 0.0, self.min)
+                upper = min(BUCKETS[bucket], self.max) if bucket < len(BUCKETS) else self.max
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 4),
+            'mean': round(self.seconds / self.calls, 4) if self.calls else 0.0,
+            'p50': round(self.percentile(0.5), 4),
+            'p95': round(self.percentile(0.95), 4),
+            'p99': round(self.percentile(0.99), 4),
+            'max': round(self.max, 4),
+            'histogram': {('+inf' if i == len(BUCKETS) else f'{BUCKETS[i]:g}'): count
+                          for i, count in enumerate(self.histogram) if count},
+        }
+
+
+class RequestMetrics:
+    """按接口汇总的请求统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointStats] = {}
+        self.started = time.monotonic()
+
+    def _get(self, endpoint: str) -> EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def record(self, endpoint: str, seconds: float, received: int = 0,
+               error: bool = False) -> None:
+        """
+        记录一次请求
+
+        Args:
+            endpoint: 接口（如 /share/sharepage/detail）
+            seconds: 耗时
+            received: 接收的字节数
+            error: 是否失败
+        """
+        with self._lock:
+            stats = self._get(endpoint)
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.bytes += received
+            stats.seconds += seconds
+            stats.min = min(stats.min, seconds)
+            stats.max = max(stats.max, seconds)
+            stats.histogram[bisect_left(BUCKETS, seconds)] += 1
+
+    def record_retry(self, endpoint: str) -> None:
+        """记录一次重试"""
+        with self._lock:
+            self._get(endpoint).retries += 1
+
+    def total_calls(self) -> int:
+        """累计请求数"""
+        with self._lock:
+            return sum(stats.calls for stats in self._endpoints.values())
+
+    def snapshot(self) -> Dict:
+        """
+        当前统计（JSON 可序列化）
+
+        Returns:
+            {'elapsed': 秒, 'total': {...}, 'endpoints': {接口: {...}}}，接口按总耗时降序
+        """
+        with self._lock:
+            endpoints = sorted(self._endpoints.items(), key=lambda item: -item[1].seconds)
+            total = {key: sum(getattr(stats, key) for _, stats in endpoints)
+                     for key in ('calls', 'errors', 'retries', 'bytes')}
+            total['seconds'] = round(sum(stats.seconds for _, stats in endpoints), 4)
+            return {
+                'elapsed': round(time.monotonic() - self.started, 4),
+                'total': total,
+                'endpoints': {endpoint: stats.to_dict() for endpoint, stats in endpoints},
+            }
+
+    def format_lines(self) -> List[str]:
+        """人类可读的统计表"""
+        data = self.snapshot()
+        total = data['total']
+        lines = [f"📊 请求统计：{total['calls']} 个请求，{_format_bytes(total['bytes'])}，"
+                 f"请求耗时合计 {total['seconds']:.2f}s，总耗时 {data['elapsed']:.2f}s"]
+        if not data['endpoints']:
+            return lines
+        width = max(len(endpoint) for endpoint in data['endpoints'])
+        columns = [('接口', width, False), ('次数', 7, True), ('错误', 5, True), ('重试', 5, True),
+                   ('合计', 9, True), ('p50', 8, True), ('p95', 8, True), ('最大', 8, True),
+                   ('接收', 10, True)]
+        lines.append('   ' + '  '.join(pad(title, w, right) for title, w, right in columns))
+        for endpoint, stats in data['endpoints'].items():
+            values = [endpoint, stats['calls'], stats['errors'], stats['retries'],
+                      f"{stats['seconds']:.2f}s", f"{stats['p50'] * 1000:.0f}ms",
+                      f"{stats['p95'] * 1000:.0f}ms", f"{stats['max'] * 1000:.0f}ms",
+                      _format_bytes(stats['bytes'])]
+            lines.append('   ' + '  '.join(pad(str(value), w, right)
+                                           for value, (_, w, right) in zip(values, columns)))
+        return lines
+
+
+def pad(text: str, width: int, right: bool) -> str:
+    """按显示宽度补齐（中文占两列）"""
+    fill = ' ' * max(width - sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text), 0)
+    return fill + text if right else text + fill
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+本地模拟夸克 API - 离线测试与性能测量
+
+实现客户端用到的接口（路径与 drive-pc.quark.cn/1/clouddrive 相同）：
+
+    POST /share/sharepage/token    获取 stoken（校验提取码）
+    GET  /share/sharepage/detail   分享目录列表（_page / _size 分页，校验 stoken）
+    POST /share/sharepage/save     转存，返回 task_id
+    GET  /task                     任务状态（按设定的耗时从处理中变为完成）
+    GET  /file/sort                用户网盘目录列表
+    POST /file                     创建目录
+
+另有 GET /__stats 返回各接口的请求次数（及注入的故障数），POST /__reset 清零。
+
+分享内容可以是 JSON 文件中的目录树，也可以按参数随机生成（相同 seed 结果相同），
+或由 share_generator.ShareGenerator 按需生成（几百万个条目也不占内存）；
+每个接口的延迟和转存任务耗时可以按分布设置：
+
+    0.05                    固定 50 ms
+    uniform:0.02:0.1        20 ~ 100 ms 均匀分布
+    normal:0.08:0.02        均值 80 ms、标准差 20 ms（小于 0 按 0）
+    lognormal:0.08:0.5      中位数 80 ms 的对数正态分布（长尾）
+
+使用方式：
+    python mock_server.py [--port 8765] [--folders 200] [--files-per-folder 10]
+                          [--latency detail=lognormal:0.08:0.5] [--task-duration 2]
+                          [--tree share.json] [--config mock.json]
+                          [--generate depth=4,fanout=10,files=100,seed=1] [--generate-drive depth=3]
+                          [--faults detail:throttle=0.05,*:reset=0.01]
+
+    export QUARK_API_BASE_URL=http://127.0.0.1:8765/1/clouddrive
+    python main.py list https://pan.quark.cn/s/mock
+
+在测试代码中：
+
+    with MockQuarkServer(MockConfig(folders=50)) as server:
+        client = QuarkClient(cookies_path, base_url=server.base_url)
+"""
+
+import json
+import math
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from faults import FaultInjector, describe, fault_response
+from share_generator import DriveGenerator, ShareGenerator, parse_options
+
+
+# 与线上相同的路径前缀
+BASE_PATH = '/1/clouddrive'
+
+# 接口名 -> 路径
+ENDPOINTS = {
+    'token': '/share/sharepage/token',
+    'detail': '/share/sharepage/detail',
+    'save': '/share/sharepage/save',
+    'task': '/task',
+    'sort': '/file/sort',
+    'file': '/file',
+}
+
+_EXTENSIONS = ['.mkv', '.mp4', '.srt', '.jpg', '.pdf', '.zip', '.txt']
+
+
+class Latency:
+    """延迟分布（秒）"""
+
+    def __init__(self, spec='0'):
+        """
+        Args:
+            spec: 固定秒数，或 "uniform:最小:最大"、"normal:均值:标准差"、"lognormal:中位数:sigma"
+        """
+        self.spec = str(spec)
+        kind, _, args = self.spec.partition(':')
+        try:
+            if not args:
+                self.kind, self.args = 'fixed', (float(kind),)
+            else:
+                self.kind, self.args = kind, tuple(float(a) for a in args.split(':'))
+        except ValueError:
+            raise ValueError(f"无效的延迟设置: {spec}")
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal') or \
+                len(self.args) != (1 if self.kind == 'fixed' else 2):
+            raise ValueError(f"无效的延迟设置: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """取一个样本"""
+        if self.kind == 'fixed':
+            return self.args[0]
+        a, b = self.args
+        if self.kind == 'uniform':
+            return rng.uniform(a, b)
+        if self.kind == 'normal':
+            return max(rng.gauss(a, b), 0.0)
+        return a * math.exp(rng.gauss(0, b)) if a > 0 else 0.0
+
+
+class MockConfig:
+    """模拟服务器设置"""
+
+    def __init__(self, pwd_id: str = 'mock', passcode: str = '', tree: Optional[List] = None,
+                 folders: int = 50, files_per_folder: int = 10, max_children: int = 8,
+                 seed: int = 0, latency: Optional[Dict[str, str]] = None,
+                 task_duration='1', drive: Optional[List] = None,
+                 generator: Optional[ShareGenerator] = None,
+                 faults: Optional[FaultInjector] = None):
+        """
+        Args:
+            pwd_id: 分享 ID（分享链接为 https://pan.quark.cn/s/<pwd_id>）
+            passcode: 提取码
+            tree: 分享目录树（见 load_tree）；为 None 时按下面的参数随机生成
+            folders: 随机生成的文件夹数
+            files_per_folder: 每个文件夹的平均文件数
+            max_children: 每个文件夹最多的子文件夹数
+            seed: 随机种子（同时用于延迟采样）
+            latency: 接口名（token/detail/save/task/sort/file，或 default）-> 延迟设置
+            task_duration: 转存任务耗时（延迟设置格式）
+            drive: 用户网盘中已有的目录树（格式同 tree，只取文件夹）
+            generator: 按需生成分享内容（优先于 tree 和随机生成的参数）
+            faults: 故障注入（见 faults.py）
+        """
+        self.pwd_id = pwd_id
+        self.passcode = passcode
+        self.tree = tree
+        self.folders = folders
+        self.files_per_folder = files_per_folder
+        self.max_children = max_children
+        self.seed = seed
+        self.latency = dict(latency or {})
+        self.task_duration = task_duration
+        self.drive = drive
+        self.generator = generator
+        self.faults = faults
+
+    @classmethod
+    def from_file(cls, path: str) -> 'MockConfig':
+        """
+        从 JSON 文件读取设置
+
+        格式：{"pwd_id": ..., "passcode": ..., "tree": [...], "latency": {...}, ...}，
+        键与构造参数相同，tree 也可以是另一个 JSON 文件的路径，
+        generator 为 ShareGenerator 的参数（如 {"depth": 4, "files": 100}），
+        faults 为故障规则文本（如 "detail:throttle=0.05"）
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for key in ('tree', 'drive'):
+            if isinstance(data.get(key), str):
+                data[key] = load_tree(data[key])
+        if data.get('generator') is not None:
+            data['generator'] = ShareGenerator(**data['generator'])
+        if data.get('faults') is not None:
+            data['faults'] = FaultInjector.parse(data['faults'])
+        return cls(**data)
+
+
+def load_tree(path: str) -> List:
+    """
+    读取目录树文件
+
+    格式为条目列表：文件夹 {"name": "Season 1", "children": [...]}，
+    文件 {"name": "E01.mkv", "size": 1073741824}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def random_tree(folders: int, files_per_folder: int, max_children: int = 8,
+                seed: int = 0) -> List:
+    """按参数随机生成目录树（相同参数结果相同）"""
+    rng = random.Random(seed)
+    root = {'children': []}
+    nodes = [root]
+    open_nodes = [root]
+    for i in range(folders):
+        parent = rng.choice(open_nodes)
+        node = {'name': f'Folder {i + 1:04d}', 'children': []}
+        parent['children'].append(node)
+        nodes.append(node)
+        open_nodes.append(node)
+        if sum(1 for c in parent['children'] if 'children' in c) >= max_children:
+            open_nodes.remove(parent)
+    for n, node in enumerate(nodes):
+        for j in range(rng.randint(0, files_per_folder * 2)):
+            ext = rng.choice(_EXTENSIONS)
+            node['children'].insert(rng.randint(0, len(node['children'])), {
+                'name': f'File {n:04d}-{j:03d}{ext}',
+                'size': rng.randint(1, 4 << 30) if ext in ('.mkv', '.mp4') else rng.randint(1, 50 << 20),
+            })
+    return root['children']
+
+
+class MockState:
+    """分享、用户网盘与转存任务的状态（各请求线程共享）"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+        self.latency = {name: Latency(spec) for name, spec in config.latency.items()}
+        self.task_duration = Latency(config.task_duration)
+        self.counts: Dict[str, int] = {}
+
+        # 分享：目录 fid -> API 格式的条目列表（使用 generator 时为空，按需生成）
+        self.share: Dict[str, List[Dict]] = {}
+        self._next_id = 0
+        if config.generator is None:
+            tree = config.tree if config.tree is not None else random_tree(
+                config.folders, config.files_per_folder, config.max_children, config.seed)
+            self._add_share_items('0', tree)
+
+        self.stokens = set()
+        # 用户网盘：目录 fid -> 条目列表
+        self.drive: Dict[str, List[Dict]] = {'0': []}
+        stack = [('0', iter(config.drive or ()))]
+        while stack:
+            parent, children = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+            elif 'children' in node:
+                fid = self.new_id()
+                self.drive[parent].append({'fid': fid, 'file_name': node['name'], 'dir': True,
+                                           'file_type': 0, 'size': 0,
+                                           'updated_at': 1700000000000})
+                self.drive[fid] = []
+                stack.append((fid, iter(node['children'])))
+        # task_id -> {'created', 'duration', 'count'}
+        self.tasks: Dict[str, Dict] = {}
+
+    def new_id(self) -> str:
+        self._next_id += 1
+        return f'{self._next_id:032x}'
+
+    def _add_share_items(self, pdir_fid: str, nodes: List) -> None:
+        # 显式栈，深层目录树不受递归深度限制
+        stack = [(pdir_fid, iter(nodes))]
+        self.share.setdefault(pdir_fid, [])
+        while stack:
+            parent, children = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                continue
+            fid = self.new_id()
+            is_dir = 'children' in node
+            self.share[parent].append({
+                'fid': fid,
+                'file_name': node['name'],
+                'dir': is_dir,
+                'file_type': 0 if is_dir else 1,
+                'size': 0 if is_dir else node.get('size', 0),
+                'obj_category': '' if is_dir else node.get('category', ''),
+                'updated_at': node.get('updated_at', 1700000000000),
+                'created_at': node.get('created_at', 1700000000000),
+                'share_fid_token': f'token-{fid[-8:]}',
+            })
+            if is_dir:
+                self.share[fid] = []
+                stack.append((fid, iter(node['children'])))
+
+    def delay(self, endpoint: str) -> float:
+        """请求计数并返回本次的延迟"""
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            latency = self.latency.get(endpoint) or self.latency.get('default')
+            return latency.sample(self.rng) if latency else 0.0
+
+
+def _ok(data) -> Dict:
+    return {'status': 200, 'code': 0, 'message': 'ok', 'data': data}
+
+
+def _error(status: int, message: str) -> Dict:
+    return {'status': status, 'code': status, 'message': message}
+
+
+def _page(items: List, query: Dict) -> Dict:
+    page = max(int(query.get('_page', 1)), 1)
+    size = max(int(query.get('_size', 50)), 1)
+    return {'list': items[(page - 1) * size:page * size],
+            'metadata': {'_total': len(items), '_page': page, '_size': size}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """请求处理（state 由 MockQuarkServer 设置）"""
+
+    state: MockState = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = {}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._send(400, _error(400, '请求体不是 JSON'))
+
+        path = url.path
+        if path == '/__stats':
+            faults = self.state.config.faults
+            with self.state.lock:
+                return self._send(200, {'requests': dict(self.state.counts),
+                                        'faults': dict(faults.injected) if faults else {}})
+        if path == '/__reset' and method == 'POST':
+            with self.state.lock:
+                self.state.counts.clear()
+            return self._send(200, {'requests': {}})
+
+        if not path.startswith(BASE_PATH):
+            return self._send(404, _error(404, f'未知接口: {path}'))
+        path = path[len(BASE_PATH):]
+        for name, endpoint in ENDPOINTS.items():
+            if path == endpoint:
+                handler = getattr(self, f'_{method.lower()}_{name}', None)
+                if handler is None:
+                    return self._send(405, _error(405, f'{method} {path} 不支持'))
+                time.sleep(self.state.delay(name))
+                if self.state.config.faults is not None and self._inject(name, query, body):
+                    return
+                return self._send(200, handler(query, body))
+        return self._send(404, _error(404, f'未知接口: {path}'))
+
+    def _inject(self, endpoint: str, query: Dict, body: Dict) -> bool:
+        """注入故障；已代替正常响应时返回 True"""
+        fault = self.state.config.faults.choose(endpoint)
+        time.sleep(fault.delay)
+        if fault.kind is None:
+            return False
+        if fault.kind == 'reset':
+            # SO_LINGER 为 0 时关闭连接发送 RST，客户端收到 Connection reset
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return True
+        if fault.kind == 'stoken':
+            # 让请求中的 stoken 真正失效，客户端需要重新获取
+            with self.state.lock:
+                self.state.stokens.discard(query.get('stoken') or body.get('stoken'))
+        status, headers, data = fault_response(fault.rule)
+        self._send_raw(status, headers, data)
+        return True
+
+    def _send(self, code: int, payload: Dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self._send_raw(code, {'Content-Type': 'application/json; charset=utf-8'}, data)
+
+    def _send_raw(self, code: int, headers: Dict[str, str], data: bytes) -> None:
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _post_token(self, query, body):
+        state = self.state
+        if body.get('pwd_id') != state.config.pwd_id:
+            return _error(404, '分享不存在')
+        if (body.get('passcode') or '') != state.config.passcode:
+            return _error(400, '提取码错误（passcode）')
+        with state.lock:
+            stoken = f'stoken-{state.new_id()}'
+            state.stokens.add(stoken)
+        return _ok({'stoken': stoken, 'title': 'mock share'})
+
+    def _get_detail(self, query, body):
+        state = self.state
+        if query.get('pwd_id') != state.config.pwd_id:
+            return _error(404, '分享不存在')
+        if query.get('stoken') not in state.stokens:
+            return _error(401, 'stoken 无效')
+        pdir_fid = query.get('pdir_fid', '0')
+        generator = state.config.generator
+        if generator is not None:
+            if not generator.is_folder(pdir_fid):
+                return _error(404, '目录不存在')
+            page = max(int(query.get('_page', 1)), 1)
+            size = max(int(query.get('_size', 50)), 1)
+            return _ok({'list': generator.list_page(pdir_fid, page, size),
+                        'metadata': {'_total': sum(generator.child_counts(pdir_fid)),
+                                     '_page': page, '_size': size}})
+        items = state.share.get(pdir_fid)
+        if items is None:
+            return _error(404, '目录不存在')
+        return _ok(_page(items, query))
+
+    def _post_save(self, query, body):
+        state = self.state
+        if body.get('stoken') not in state.stokens:
+            return _error(401, 'stoken 无效')
+        fid_list = body.get('fid_list') or []
+        to_pdir_fid = body.get('to_pdir_fid', '0')
+        with state.lock:
+            if to_pdir_fid not in state.drive:
+                return _error(404, '目标目录不存在')
+            task_id = f'task-{state.new_id()}'
+            state.tasks[task_id] = {'created': time.monotonic(),
+                                    'duration': state.task_duration.sample(state.rng),
+                                    'count': len(fid_list)}
+        return _ok({'task_id': task_id})
+
+    def _get_task(self, query, body):
+        task = self.state.tasks.get(query.get('task_id'))
+        if task is None:
+            return _error(404, '任务不存在')
+        elapsed = time.monotonic() - task['created']
+        if elapsed >= task['duration']:
+            return _ok({'status': 2, 'progress': 100, 'message': f"已转存 {task['count']} 个文件"})
+        progress = int(elapsed / task['duration'] * 100) if task['duration'] else 100
+        return _ok({'status': 1, 'progress': progress, 'message': '转存中'})
+
+    def _get_sort(self, query, body):
+        items = self.state.drive.get(query.get('pdir_fid', '0'))
+        if items is None:
+            return _error(404, '目录不存在')
+        return _ok(_page(items, query))
+
+    def _post_file(self, query, body):
+        state = self.state
+        name = body.get('file_name') or ''
+        pdir_fid = body.get('pdir_fid', '0')
+        with state.lock:
+            siblings = state.drive.get(pdir_fid)
+            if siblings is None:
+                return _error(404, '父目录不存在')
+            if not name:
+                return _error(400, '目录名不能为空')
+            if any(item['file_name'] == name for item in siblings):
+                return _error(400, '同名目录已存在')
+            fid = state.new_id()
+            siblings.append({'fid': fid, 'file_name': name, 'dir': True, 'file_type': 0,
+                             'size': 0, 'updated_at': int(time.time() * 1000)})
+            state.drive[fid] = []
+        return _ok({'fid': fid})
+
+
+class MockQuarkServer:
+    """在后台线程中运行的模拟服务器"""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = '127.0.0.1',
+                 port: int = 0, verbose: bool = False):
+        """
+        Args:
+            config: 服务器设置（默认 MockConfig()）
+            host: 监听地址
+            port: 端口（0 表示自动选择）
+            verbose: 是否打印每个请求
+        """
+        self.state = MockState(config or MockConfig())
+        handler = type('Handler', (_Handler,), {'state': self.state, 'verbose': verbose})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """供 QuarkClient(base_url=...) 使用的 API 地址"""
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{BASE_PATH}'
+
+    @property
+    def share_url(self) -> str:
+        """模拟分享的链接"""
+        return f'https://pan.quark.cn/s/{self.state.config.pwd_id}'
+
+    def request_counts(self) -> Dict[str, int]:
+        """各接口的请求次数"""
+        with self.state.lock:
+            return dict(self.state.counts)
+
+    def start(self) -> 'MockQuarkServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='quark-mock',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """命令行入口：在前台运行模拟服务器"""
+    parser = argparse.ArgumentParser(description='本地模拟夸克 API（离线测试与性能测量）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8765, help='端口（默认 8765）')
+    parser.add_argument('--config', help='JSON 设置文件（其余参数覆盖其中的值）')
+    parser.add_argument('--tree', help='分享目录树 JSON 文件（不指定时随机生成）')
+    parser.add_argument('--pwd-id', help='分享 ID（默认 mock）')
+    parser.add_argument('--passcode', help='提取码（默认无）')
+    parser.add_argument('--folders', type=int, help='随机生成的文件夹数（默认 50）')
+    parser.add_argument('--files-per-folder', type=int, help='每个文件夹的平均文件数（默认 10）')
+    parser.add_argument('--seed', type=int, help='随机种子（默认 0）')
+    parser.add_argument('--generate', metavar='OPTIONS',
+                        help='按需生成分享内容，如 depth=4,fanout=10,files=100,seed=1（见 share_generator）')
+    parser.add_argument('--generate-drive', metavar='OPTIONS',
+                        help='生成用户网盘目录，如 depth=3,fanout=5,seed=1')
+    parser.add_argument('--latency', action='append', default=[], metavar='ENDPOINT=SPEC',
+                        help='接口延迟，如 detail=lognormal:0.08:0.5、default=0.02（可多次指定）')
+    parser.add_argument('--task-duration', help='转存任务耗时（秒或分布，默认 1）')
+    parser.add_argument('--faults', metavar='RULES',
+                        help='故障注入，如 detail:throttle=0.05,*:reset=0.01（见 faults.py）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    config = MockConfig.from_file(args.config) if args.config else MockConfig()
+    if args.tree:
+        config.tree = load_tree(args.tree)
+    for name in ('pwd_id', 'passcode', 'folders', 'files_per_folder', 'seed', 'task_duration'):
+        if getattr(args, name) is not None:
+            setattr(config, name, getattr(args, name))
+    for item in args.latency:
+        name, sep, spec = item.partition('=')
+        if not sep:
+            name, spec = 'default', item
+        config.latency[name] = spec
+
+    try:
+        if args.generate is not None:
+            config.generator = ShareGenerator(**parse_options(args.generate))
+        if args.faults is not None:
+            config.faults = FaultInjector.parse(args.faults)
+        if args.generate_drive is not None:
+            config.drive = DriveGenerator(**parse_options(args.generate_drive,
+                                                          ('seed', 'depth', 'fanout'))).as_tree()
+        server = MockQuarkServer(config, args.host, args.port, args.verbose)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if config.generator is not None:
+        folders, files = config.generator.count()
+    else:
+        folders = sum(1 for items in server.state.share.values() for item in items if item['dir'])
+        files = sum(1 for items in server.state.share.values() for item in items if not item['dir'])
+    print(f"🧪 模拟夸克 API: {server.base_url}")
+    print(f"   分享链接: {server.share_url}" + (f"  提取码: {config.passcode}" if config.passcode else ''))
+    print(f"   {folders} 个文件夹, {files} 个文件")
+    if config.faults is not None:
+        print(f"   故障注入: {', '.join(describe(config.faults))}")
+    print(f"   export QUARK_API_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+文件名模糊搜索 - 基于三元组（trigram）的倒排索引
+
+文件名统一转为小写，并把空格、点、下划线、括号等分隔符合并为一个空格，
+首尾各补一个空格（使词首匹配得分更高），再切成连续三个字符的片段：
+
+    "Movie.2023.mkv" -> " movie 2023 mkv " -> " mo", "mov", "ovi", ...
+
+每个片段记录包含它的行号。搜索时把搜索词同样切片，统计每个文件命中的片段数，
+按命中比例排序；搜索词完整出现在文件名中的文件排在最前。拼写略有出入
+（漏字、错字、词序不同）也能找到，且只访问与搜索词有共同片段的文件。
+"""
+
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+
+# 命中比例低于该值的结果不返回
+MIN_SCORE = 0.5
+
+_SEPARATORS = re.compile(r'[\s._\-\[\]()【】（）]+')
+
+
+def normalize(text: str) -> str:
+    """统一大小写和分隔符，首尾补空格"""
+    return ' ' + _SEPARATORS.sub(' ', text.lower()).strip() + ' '
+
+
+def trigrams(text: str) -> set:
+    """已规范化文本的三元组集合"""
+    return set(map(''.join, zip(text, text[1:], text[2:])))
+
+
+def match_score(query: str, name: str) -> float:
+    """
+    单个文件名的得分（与 NameIndex.search 的计分相同，用于逐条筛选）
+
+    Returns:
+        float: 得分；低于 MIN_SCORE 的返回 0
+    """
+    text, core = normalize(name), normalize(query).strip()
+    if not core:
+        return 0.0
+    if len(core) < 3:
+        return 1.0 + len(core) / len(text) if core in text else 0.0
+    grams = trigrams(' ' + core + ' ')
+    score = len(grams & trigrams(text)) / len(grams)
+    if score < MIN_SCORE:
+        return 0.0
+    return score + 1.0 if core in text else score
+
+
+class NameIndex:
+    """文件名三元组索引，行号与文件列表的下标一致"""
+
+    def __init__(self, names: Iterable[str] = ()):
+        """
+        Args:
+            names: 按行顺序的文件名
+        """
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.names: List[str] = []
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> int:
+        """追加一个文件名，返回其行号"""
+        row = len(self.names)
+        text = normalize(name)
+        self.names.append(text)
+        postings = self.postings
+        for gram in trigrams(text):
+            postings[gram].append(row)
+        return row
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 0) -> List[Tuple[int, float]]:
+        """
+        模糊搜索
+
+        Args:
+            query: 搜索词
+            limit: 最多返回的结果数（0 表示不限）
+
+        Returns:
+            List[Tuple[int, float]]: (行号, 得分)，按得分从高到低排列；
+                得分为命中三元组比例，搜索词完整出现时加 1
+        """
+        text = normalize(query)
+        core = text.strip()
+        if not core:
+            return []
+
+        grams = trigrams(text)
+        if len(core) < 3:
+            # 太短无法切片：直接查找包含搜索词的文件名
+            scores = {row: 1.0 + len(core) / len(name)
+                      for row, name in enumerate(self.names) if core in name}
+        else:
+            counts = Counter()
+            for gram in grams:
+                rows = self.postings.get(gram)
+                if rows is not None:
+                    counts.update(rows)
+            threshold = MIN_SCORE * len(grams)
+            scores = {}
+            for row, hits in counts.items():
+                if hits < threshold:
+                    continue
+                score = hits / len(grams)
+                if core in self.names[row]:
+                    score += 1.0
+                scores[row] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
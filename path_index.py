@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+目录路径索引 - 遍历时构建的路径前缀树
+
+iter_files_recursive 按深度优先产出条目（文件夹先于其内容），因此任意目录下的
+全部文件（含子目录）在文件列表中是连续的一段。PathIndex 在遍历过程中为每个目录
+记录这一段的起止下标以及文件总大小：
+
+    /                   行 [0, 1200)    1200 个文件
+    ├─ Season 1         行 [0, 600)
+    └─ Season 2         行 [600, 1200)
+       └─ 4K            行 [900, 1200)
+
+按路径查找目录只需逐级查子节点（O(深度)），得到的下标区间即为该目录下的所有文件，
+不必扫描整个列表；目录的文件数、总大小也可以直接读取。
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PathNode:
+    """目录节点"""
+
+    __slots__ = ('name', 'fid', 'parent', 'children', 'start', 'end', 'total_size')
+
+    def __init__(self, name: str, fid: Optional[str], parent: Optional['PathNode'], start: int):
+        self.name = name
+        self.fid = fid
+        self.parent = parent
+        # 名称 -> 节点列表（同一目录下可能有同名文件夹）
+        self.children: Dict[str, List['PathNode']] = {}
+        self.start = start
+        # 遍历尚未离开该目录时为 None
+        self.end: Optional[int] = None
+        self.total_size = 0
+
+    @property
+    def path(self) -> str:
+        """目录路径（如 "/Season 2/4K"），起始目录为 "/" """
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        return '/' + '/'.join(reversed(names))
+
+
+class PathIndex:
+    """
+    路径前缀树
+
+    按遍历顺序调用 add_folder / add_file 构建；文件行号按 add_file 的调用顺序从 0 开始，
+    与 get_all_files_recursive 返回列表的下标一致。
+    """
+
+    def __init__(self):
+        self.root = PathNode('', None, None, 0)
+        self.rows = 0
+        self._nodes: Dict[str, PathNode] = {}
+        # 当前所在的目录链（根目录在栈底）
+        self._stack: List[PathNode] = [self.root]
+
+    def _enter(self, pdir_fid: Optional[str]) -> PathNode:
+        """回到 pdir_fid 对应的目录，离开的目录记录结束行号"""
+        stack = self._stack
+        if stack[-1].fid == pdir_fid:
+            return stack[-1]
+        if pdir_fid in self._nodes:
+            while len(stack) > 1 and stack[-1].fid != pdir_fid:
+                stack.pop().end = self.rows
+        else:
+            # 起始目录（或未知目录）的条目归入根目录
+            while len(stack) > 1:
+                stack.pop().end = self.rows
+        return stack[-1]
+
+    def add_folder(self, fid: str, name: str, pdir_fid: Optional[str]) -> PathNode:
+        """记录一个文件夹（必须先于其内容调用）"""
+        parent = self._enter(pdir_fid)
+        node = PathNode(name, fid, parent, self.rows)
+        parent.children.setdefault(name, []).append(node)
+        self._nodes[fid] = node
+        self._stack.append(node)
+        return node
+
+    def add_file(self, pdir_fid: Optional[str], size: int) -> int:
+        """记录一个文件，返回其行号"""
+        self._enter(pdir_fid)
+        for node in self._stack:
+            node.total_size += size
+        self.rows += 1
+        return self.rows - 1
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict]) -> 'PathIndex':
+        """由 iter_files_recursive(include_folders=True) 顺序的条目构建"""
+        index = cls()
+        for entry in entries:
+            if entry.get('is_file', True):
+                index.add_file(entry.get('pdir_fid'), entry.get('size') or 0)
+            else:
+                index.add_folder(entry.get('fid') or entry.get('file_id'),
+                                 entry.get('file_name') or entry.get('name') or '',
+                                 entry.get('pdir_fid'))
+        return index
+
+    def node(self, fid: str) -> Optional[PathNode]:
+        """按 fid 查找目录"""
+        return self._nodes.get(fid)
+
+    def lookup(self, path: str) -> List[PathNode]:
+        """
+        按路径查找目录（逐级匹配，名称大小写不敏感）
+
+        Args:
+            path: 目录路径，如 "/Season 2/4K"；"/" 为起始目录
+
+        Returns:
+            List[PathNode]: 匹配的目录（有同名文件夹时可能多于一个）
+        """
+        nodes = [self.root]
+        for part in (p for p in path.strip('/').split('/') if p):
+            matched = []
+            for node in nodes:
+                exact = node.children.get(part)
+                if exact:
+                    matched.extend(exact)
+                    continue
+                lower = part.lower()
+                for name, children in node.children.items():
+                    if name.lower() == lower:
+                        matched.extend(children)
+            nodes = matched
+            if not nodes:
+                break
+        return nodes
+
+    def child_nodes(self, node: PathNode) -> List[PathNode]:
+        """子目录（按遍历顺序）"""
+        children = [child for group in node.children.values() for child in group]
+        children.sort(key=lambda child: child.start)
+        return children
+
+    def direct_rows(self, node: PathNode) -> List[Tuple[int, int]]:
+        """直接位于该目录（不含子目录）的文件行号区间"""
+        ranges = []
+        position, end = self.row_range(node)
+        for child in self.child_nodes(node):
+            child_start, child_end = self.row_range(child)
+            if child_start > position:
+                ranges.append((position, child_start))
+            position = max(position, child_end)
+        if end > position:
+            ranges.append((position, end))
+        return ranges
+
+    def row_range(self, node: PathNode) -> Tuple[int, int]:
+        """目录下所有文件（含子目录）的行号区间 [start, end)"""
+        return node.start, self.rows if node.end is None else node.end
+
+    def file_count(self, node: PathNode) -> int:
+        """目录下的文件数（含子目录）"""
+        start, end = self.row_range(node)
+        return end - start
+
+    def folder_path(self, fid: str) -> str:
+        """目录的路径，未知目录按起始目录处理"""
+        node = self._nodes.get(fid)
+        return node.path if node is not None else '/'
+
+    def subtree_rows(self, path: str) -> List[Tuple[int, int]]:
+        """路径下所有文件的行号区间（按起始行号排序）"""
+        return sorted(self.row_range(node) for node in self.lookup(path))
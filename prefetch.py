@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+后台预取 - 利用等待用户输入的空闲时间预先请求下一步可能用到的数据
+
+save_helper 等待用户输入选择或目标路径时，客户端什么也不做。Prefetcher 在后台线程中
+利用这段时间依次：
+
+    1. 展开当前目录下尚未请求的子文件夹（用户接下来最可能 cd 进去）
+    2. 逐级获取用户网盘的目录列表（选择目标目录时直接使用）
+    3. 按广度优先展开分享中其余的文件夹（find 时不必再请求）
+
+并在距上次获取超过 STOKEN_REFRESH_INTERVAL 时刷新 stoken。
+
+后台线程只在前台处于 idle()（等待用户输入）期间发起请求，且每个请求前都重新检查；
+用户一回车，后台在当前请求完成后即暂停；后台请求按 BACKGROUND 优先级排队（见
+scheduler.py），不与前台争抢。目录由 LazyShareTree 统一缓存，前后台请求同一目录时只会请求一次。
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import tracing
+from lazy_tree import LazyShareTree
+from scheduler import BACKGROUND, priority
+
+
+# 后台最多展开的分享文件夹数
+PREFETCH_FOLDER_LIMIT = 500
+
+# 距上次获取 stoken 超过该时间（秒）后在空闲时刷新
+STOKEN_REFRESH_INTERVAL = 600
+
+# 没有可做的任务时，多久（秒）检查一次当前目录是否变化
+_POLL_INTERVAL = 0.2
+
+
+class Prefetcher:
+    """后台预取线程（低优先级：只在前台空闲时请求）"""
+
+    def __init__(self, client, tree: LazyShareTree, password: str = '',
+                 folder_limit: int = PREFETCH_FOLDER_LIMIT,
+                 stoken_interval: float = STOKEN_REFRESH_INTERVAL):
+        """
+        Args:
+            client: QuarkClient 实例
+            tree: 前台浏览使用的分享目录树
+            password: 提取码（刷新 stoken 用）
+            folder_limit: 后台最多展开的分享文件夹数
+            stoken_interval: stoken 刷新间隔（秒），0 表示不刷新
+        """
+        self.client = client
+        self.tree = tree
+        self.password = password
+        self.folder_limit = folder_limit
+        self.stoken_interval = stoken_interval
+        # 用户当前所在的分享目录，优先展开其子文件夹
+        self.focus = '0'
+        # 后台完成的请求数
+        self.stats = {'folders': 0, 'user_dirs': 0, 'stoken': 0, 'errors': 0}
+
+        self._idle = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stoken_at = time.monotonic()
+        self._failed_folders = set()
+
+        # 用户目录：逐级获取，全部完成后按 get_user_dirs 的顺序展开为列表
+        self._dir_queue = deque([('0', '')])
+        self._dir_children: Dict[str, List[Dict]] = {}
+        self._user_dirs: Optional[List[Dict]] = None
+        self._user_dirs_failed = False
+
+    def start(self) -> 'Prefetcher':
+        """启动后台线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=tracing.bind(self._run), name='quark-prefetch',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """
+        停止后台线程
+
+        正在进行的请求不会被中断；最多等待 timeout 秒，之后线程在请求完成后自行退出。
+        """
+        self._stop.set()
+        self._idle.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @contextmanager
+    def idle(self):
+        """前台等待用户输入期间允许后台请求"""
+        self._idle.set()
+        try:
+            yield
+        finally:
+            self._idle.clear()
+
+    def set_focus(self, fid: str) -> None:
+        """用户进入了目录 fid"""
+        self.focus = fid
+
+    def user_dirs(self) -> Optional[List[Dict]]:
+        """预取的用户目录列表（格式同 get_user_dirs），尚未完成时返回 None"""
+        return self._user_dirs
+
+    def _run(self) -> None:
+        with priority(BACKGROUND):
+            self._loop()
+
+    def _loop(self) -> None:
+        while self._wait_idle():
+            task = self._next_task()
+            if task is None:
+                self._stop.wait(_POLL_INTERVAL)
+                continue
+            try:
+                task()
+            except Exception:
+                # 后台请求失败不影响前台，前台需要时会自己再请求
+                self.stats['errors'] += 1
+
+    def _wait_idle(self) -> bool:
+        """等到前台空闲；停止时返回 False"""
+        while not self._stop.is_set():
+            if self._idle.wait(_POLL_INTERVAL):
+                return not self._stop.is_set()
+        return False
+
+    def _next_task(self) -> Optional[Callable[[], None]]:
+        if self.stoken_interval and time.monotonic() - self._stoken_at >= self.stoken_interval:
+            return self._refresh_stoken
+
+        under_limit = self.stats['folders'] < self.folder_limit
+        if under_limit:
+            fid = self._next_folder(self.focus, max_depth=1)
+            if fid is not None:
+                return lambda: self._expand(fid)
+
+        if self._user_dirs is None and not self._user_dirs_failed:
+            return self._fetch_user_dirs_level
+
+        if under_limit:
+            fid = self._next_folder('0')
+            if fid is not None:
+                return lambda: self._expand(fid)
+        return None
+
+    def _next_folder(self, start: str, max_depth: int = 0) -> Optional[str]:
+        """
+        从 start 起按广度优先找到第一个尚未展开的文件夹
+
+        Args:
+            start: 起始目录
+            max_depth: 最多向下找几层（0 表示不限）
+        """
+        tree = self.tree
+        if not tree.is_expanded(start):
+            return None if start in self._failed_folders else start
+        queue = deque([(start, 0)])
+        while queue:
+            fid, depth = queue.popleft()
+            if max_depth and depth >= max_depth:
+                continue
+            for item in tree.children(fid):
+                if item['is_file'] or item['fid'] in self._failed_folders:
+                    continue
+                if not tree.is_expanded(item['fid']):
+                    return item['fid']
+                queue.append((item['fid'], depth + 1))
+        return None
+
+    def _expand(self, fid: str) -> None:
+        try:
+            self.tree.children(fid)
+        except Exception:
+            self._failed_folders.add(fid)
+            raise
+        self.stats['folders'] += 1
+
+    def _fetch_user_dirs_level(self) -> None:
+        """获取一个用户目录的子目录，全部获取完后生成目录列表"""
+        fid, prefix = self._dir_queue[0]
+        try:
+            folders = self.client.list_user_folders(fid, prefix)
+        except Exception:
+            self._user_dirs_failed = True
+            raise
+        self._dir_queue.popleft()
+        self.stats['user_dirs'] += 1
+        self._dir_children[fid] = folders
+        self._dir_queue.extend((folder['fid'], folder['path']) for folder in folders)
+
+        if not self._dir_queue:
+            dirs = []
+            stack = [iter(self._dir_children['0'])]
+            while stack:
+                folder = next(stack[-1], None)
+                if folder is None:
+                    stack.pop()
+                    continue
+                dirs.append(folder)
+                stack.append(iter(self._dir_children.get(folder['fid'], ())))
+            self._user_dirs = dirs
+
+    def _refresh_stoken(self) -> None:
+        self._stoken_at = time.monotonic()
+        self.tree.stoken = self.client.get_stoken(self.tree.pwd_id, self.password)
+        self.stats['stoken'] += 1
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+性能剖析 - 记录命令的 CPU profile，并按网络、JSON 解码、渲染输出汇总耗时
+
+所有线程（主线程、请求调度器的工作线程、流式遍历和预取线程）都用 cProfile 记录，
+结束时合并为一份 profile，再按函数归类：
+
+    wait      主线程等待（请求结果、任务轮询间隔、用户输入）
+    network   发出请求到收到响应（各线程合计，并发请求会重叠）
+    json      解码 JSON（响应、快照、缓存）
+    render    渲染输出（LineWriter、json.dumps）
+
+同一类中互相调用的函数只计一次（减去直接调用方也属于该类的部分）。
+
+Python 3.12 起 cProfile 基于 sys.monitoring，同一时间只能启用一个，无法为每个线程
+分别记录，此时只记录主线程（报告中 thread_profiling 为 false，并注明）。
+
+    profiler = Profiler().start()
+    ...
+    report = profiler.stop()
+    profiler.write('list.prof')      # 写出 list.prof（pstats 格式）和 list.prof.txt（报告）
+
+list.prof 可以用 `python -m pstats list.prof` 或 snakeviz 等工具查看。
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import pad
+
+# 类别 -> (说明, 匹配的函数)：函数为 (文件名后缀, 函数名)，函数名为 None 时匹配该文件中的全部函数
+CATEGORIES = {
+    'wait': ('主线程等待', (('threading.py', 'wait'),
+                            ('~', '<built-in method time.sleep>'),
+                            ('~', '<built-in method builtins.input>'))),
+    'network': ('网络请求', (('requests/api.py', 'request'),
+                             ('requests/sessions.py', 'request'),
+                             ('faults.py', 'request'),
+                             ('recording.py', 'request'))),
+    'json': ('JSON 解码', (('json/__init__.py', 'loads'),
+                           ('json/__init__.py', 'load'),
+                           ('json/decoder.py', 'decode'),
+                           ('simplejson/__init__.py', 'loads'),
+                           ('simplejson/decoder.py', 'decode'))),
+    'render': ('渲染输出', (('renderer.py', None),
+                            ('json/__init__.py', 'dumps'),
+                            ('json/__init__.py', 'dump'))),
+}
+
+# 只统计主线程的类别（工作线程空闲时也在等待）
+MAIN_THREAD_ONLY = ('wait',)
+
+# 报告中列出的函数数
+TOP_FUNCTIONS = 30
+
+# 能否为每个线程启用各自的 cProfile（3.12 起 cProfile 改用进程内唯一的 sys.monitoring）
+THREAD_PROFILING = sys.version_info < (3, 12)
+
+
+class Profiler:
+    """记录所有线程的 cProfile"""
+
+    def __init__(self):
+        self._main = cProfile.Profile()
+        self._threads: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self.started = 0.0
+        # 是否记录了主线程以外的线程
+        self.thread_profiling = THREAD_PROFILING
+        self.report: Optional[Dict] = None
+        self.stats: Optional[pstats.Stats] = None
+
+    def start(self) -> 'Profiler':
+        """开始记录（支持时之后启动的线程也会记录）"""
+        if self.thread_profiling:
+            threading.setprofile(self._start_thread)
+        self.started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self._main.enable()
+        return self
+
+    def _start_thread(self, frame, event, arg) -> None:
+        # 新线程的第一次调用：换成该线程自己的 cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有其他剖析工具在运行（"Another profiling tool is already active"）：只记录主线程
+            self.thread_profiling = False
+            return
+        with self._lock:
+            self._threads.append(profile)
+
+    def stop(self) -> Dict:
+        """
+        停止记录并汇总
+
+        Returns:
+            {'wall': 秒, 'cpu': 秒, 'threads': 记录的线程数, 'thread_profiling': 是否记录了其他线程,
+             'breakdown': {类别: {...}}}
+        """
+        self._main.disable()
+        threading.setprofile(None)
+        wall = time.perf_counter() - self.started
+        cpu = time.process_time() - self._cpu_started
+
+        with self._lock:
+            threads = list(self._threads)
+        main_stats = pstats.Stats(self._main)
+        thread_stats = [pstats.Stats(profile) for profile in threads]
+        breakdown = {}
+        for category, (label, patterns) in CATEGORIES.items():
+            seconds = category_time(main_stats.stats, patterns)
+            if category not in MAIN_THREAD_ONLY:
+                seconds += sum(category_time(stats.stats, patterns) for stats in thread_stats)
+            breakdown[category] = {'label': label, 'seconds': round(seconds, 4),
+                                   'share': round(seconds / wall, 4) if wall else 0.0}
+
+        self.stats = main_stats
+        for stats in thread_stats:
+            self.stats.add(stats)
+        self.report = {'wall': round(wall, 4), 'cpu': round(cpu, 4),
+                       'threads': len(threads) + 1, 'thread_profiling': self.thread_profiling,
+                       'breakdown': breakdown}
+        return self.report
+
+    def write(self, path: str) -> str:
+        """
+        写出 profile（pstats 格式）和文字报告（path + '.txt'）
+
+        Returns:
+            报告文件路径
+        """
+        self.stats.dump_stats(path)
+        report_path = path + '.txt'
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.format_lines()) + '\n\n')
+            f.write(json.dumps(self.report, ensure_ascii=False, indent=2) + '\n\n')
+            output = io.StringIO()
+            pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            f.write(output.getvalue())
+        return report_path
+
+    def format_lines(self) -> List[str]:
+        """耗时分布（人类可读）"""
+        report = self.report
+        lines = [f"🔬 性能剖析：总耗时 {report['wall']:.2f}s，CPU {report['cpu']:.2f}s，"
+                 f"{report['threads']} 个线程"]
+        threads = report.get('thread_profiling', True)
+        for category, item in report['breakdown'].items():
+            note = '' if category in MAIN_THREAD_ONLY or not threads else '（各线程合计）'
+            lines.append(f"   {pad(item['label'], 10, False)} {item['seconds']:8.2f}s  "
+                         f"{item['share']:6.1%}{note}")
+        if not threads:
+            lines.append(f"   ⚠️  Python {sys.version_info[0]}.{sys.version_info[1]} 不支持逐线程剖析，"
+                         f"只为主线程启用了 cProfile，工作线程中的耗时可能不完整")
+        return lines
+
+
+def category_time(stats: Dict, patterns: Tuple) -> float:
+    """
+    一类函数的累计耗时
+
+    每个匹配函数取累计时间（cumtime），减去从同类函数直接调用的部分，避免重复计算。
+
+    Args:
+        stats: pstats.Stats.stats（(文件, 行号, 函数名) -> (cc, nc, tt, ct, callers)）
+        patterns: (文件名后缀, 函数名) 列表
+    """
+    matched = {func for func in stats if _matches(func, patterns)}
+    total = 0.0
+    for func in matched:
+        _, _, _, cumulative, callers = stats[func]
+        nested = sum(edge[3] for caller, edge in callers.items()
+                     if caller in matched and caller != func)
+        total += max(cumulative - nested, 0.0)
+    return total
+
+
+def _matches(func: Tuple, patterns: Tuple) -> bool:
+    filename, _, name = func
+    filename = filename.replace('\\', '/')
+    return any(filename.endswith(suffix) and (pattern is None or name == pattern)
+               for suffix, pattern in patterns)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+进度事件 - 遍历、路径解析、转存的机器可读进度（吞吐量与预计剩余时间）
+
+QuarkClient(on_progress=callback) 时，长时间的操作定期把进度事件（dict）交给回调：
+
+    {"event": "progress", "operation": "crawl", "phase": "running", "pwd_id": "...",
+     "folders_done": 120, "folders_queued": 35, "files_found": 2400,
+     "elapsed": 6.1, "requests": 131, "requests_per_sec": 21.5, "eta": 1.8}
+
+    operation   crawl（遍历分享）、resolve（解析网盘路径）、save（边遍历边转存）、task（等待转存任务）
+    phase       start、running、done（结束时必有一条，失败时带 error）
+    folders_*   已完成 / 待处理的目录数（resolve 为路径中已解析 / 待解析的层数）
+    eta         预计剩余秒数：按已观察到的速度（已完成数 / 已用时间）估算待处理部分，
+                还没有完成任何一项时为 null
+
+save 另有 files_matched、batches、tasks_done、tasks_pending、tasks_failed，
+task 另有 task_id、percent、status。running 事件最多每 INTERVAL 秒一条。
+
+    client = QuarkClient(cookies_path, on_progress=ndjson_writer())   # 逐行输出到 stderr
+"""
+
+import json
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, TextIO, Tuple
+
+# running 事件的最小间隔（秒）
+INTERVAL = 0.5
+
+# 估算剩余时间的 (已完成, 待处理) 计数
+FOLDER_UNITS = (('folders_done', 'folders_queued'),)
+
+
+class Progress:
+    """一次操作的进度（线程安全）"""
+
+    def __init__(self, operation: str, callback: Callable[[Dict], None],
+                 requests: Optional[Callable[[], int]] = None,
+                 units: Tuple[Tuple[str, str], ...] = FOLDER_UNITS,
+                 interval: float = INTERVAL, fields: Optional[Dict] = None, **counters):
+        """
+        Args:
+            operation: 操作名
+            callback: 接收进度事件的回调
+            requests: 返回累计请求数的函数（用于计算请求速率）
+            units: 估算剩余时间的 (已完成, 待处理) 计数名
+            interval: running 事件的最小间隔（秒）
+            fields: 事件中的固定字段（如 pwd_id、task_id）
+            **counters: 计数的初始值
+        """
+        self.operation = operation
+        self.callback = callback
+        self.units = units
+        self.interval = interval
+        self.fields = fields or {}
+        self.counters: Dict[str, int] = {name: 0 for pair in units for name in pair}
+        self.counters.update(counters)
+        self._requests = requests or (lambda: 0)
+        self._requests_started = self._requests()
+        self._lock = threading.RLock()
+        self._started = time.monotonic()
+        self._last_emit = self._started
+        self.finished = False
+        self._emit('start')
+
+    def add(self, **deltas) -> None:
+        """累加计数"""
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counters[name] = self.counters.get(name, 0) + delta
+            self._maybe_emit()
+
+    def set(self, **values) -> None:
+        """设置计数或状态字段"""
+        with self._lock:
+            self.counters.update(values)
+            self._maybe_emit()
+
+    def finish(self, error: Optional[str] = None, **values) -> None:
+        """结束（只输出一次 done 事件）"""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.counters.update(values)
+            if error is not None:
+                self.counters['error'] = error
+            self._emit('done')
+
+    def __enter__(self) -> 'Progress':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # 生成器提前关闭（GeneratorExit）不算失败
+        failed = exc_type is not None and issubclass(exc_type, Exception)
+        self.finish(error=str(exc) if failed else None)
+
+    def event(self, phase: str) -> Dict:
+        """当前进度事件"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            requests = self._requests() - self._requests_started
+            event = {'event': 'progress', 'operation': self.operation, 'phase': phase}
+            event.update(self.fields)
+            event.update(self.counters)
+            event.update({
+                'elapsed': round(elapsed, 3),
+                'requests': requests,
+                'requests_per_sec': round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+                'eta': 0.0 if phase == 'done' else self._eta(elapsed),
+            })
+            return event
+
+    def _eta(self, elapsed: float) -> Optional[float]:
+        estimates = []
+        for done_name, queued_name in self.units:
+            done = self.counters.get(done_name, 0)
+            queued = self.counters.get(queued_name, 0)
+            if queued <= 0:
+                continue
+            if done <= 0:
+                return None
+            estimates.append(queued * elapsed / done)
+        return round(max(estimates, default=0.0), 1)
+
+    def _maybe_emit(self) -> None:
+        if time.monotonic() - self._last_emit >= self.interval:
+            self._emit('running')
+
+    def _emit(self, phase: str) -> None:
+        self._last_emit = time.monotonic()
+        self.callback(self.event(phase))
+
+
+class _NoopProgress:
+    """没有回调时使用的空进度"""
+
+    finished = True
+
+    def add(self, **deltas) -> None:
+        pass
+
+    def set(self, **values) -> None:
+        pass
+
+    def finish(self, error: Optional[str] = None, **values) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopProgress':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP = _NoopProgress()
+
+
+def ndjson_writer(stream: Optional[TextIO] = None) -> Callable[[Dict], None]:
+    """把进度事件逐行写成 JSON 的回调（默认 stderr，不影响 stdout 上的结果）"""
+    lock = threading.Lock()
+
+    def write(event: Dict) -> None:
+        out = stream or sys.stderr
+        with lock:
+            out.write(json.dumps(event, ensure_ascii=False) + '\n')
+            out.flush()
+
+    return write
@@ -11,12 +11,26 @@ import os
 import re
 import json
 import time
-from typing import Dict, List, Optional, Any
+import queue
+import random
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from pathlib import Path
 
 import requests
 
+from deadline import Deadline, DeadlineExceeded, current_deadline, request_timeout
+from file_table import FileTable
+import tracing
+from metrics import RequestMetrics
+from progress import FOLDER_UNITS, NOOP, Progress
+from renderer import LineWriter
+from scheduler import BACKGROUND, POLLING, RequestScheduler, priority
+from selection_query import (ARCHIVE_EXTENSIONS, VIDEO_EXTENSIONS, compile_selection,
+                             parse_size)
+
 
 @dataclass
 class QuarkFileInfo:
@@ -29,6 +43,32 @@ class QuarkFileInfo:
     pdir_fid: str  # 父目录ID
 
 
+def _trace_attributes(kwargs: Dict) -> Dict:
+    """HTTP 请求 span 的属性：从参数中取出分享 ID、目录、页码、任务 ID"""
+    attributes = {}
+    for source in (kwargs.get('params') or {}, kwargs.get('json') or {}):
+        for key, name in (('pwd_id', 'pwd_id'), ('pdir_fid', 'pdir_fid'), ('_page', 'page'),
+                          ('task_id', 'task_id'), ('to_pdir_fid', 'to_pdir_fid')):
+            if key in source:
+                attributes[name] = source[key]
+        if 'fid_list' in source:
+            attributes['files'] = len(source['fid_list'])
+    return attributes
+
+
+def _percent(value) -> int:
+    """任务进度转为 0 ~ 100 的整数"""
+    try:
+        return min(max(int(float(value)), 0), 100)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _is_folder_item(item: Dict) -> bool:
+    """API 返回的分享条目是否为文件夹（与 convert_share_file 的 is_file 相反）"""
+    return item.get('type') != 'file' and bool(item.get('dir', False))
+
+
 class QuarkClient:
     """
     夸克网盘客户端
@@ -41,7 +81,8 @@ class QuarkClient:
     - 目录管理
     """
     
-    # 夸克网盘 API 基础 URL（PC 端）
+    # 夸克网盘 API 基础 URL（PC 端）；可用环境变量 QUARK_API_BASE_URL 或 base_url 参数
+    # 指向其他地址（如 mock_server.py 启动的本地模拟服务器）
     API_BASE_URL = "https://drive-pc.quark.cn/1/clouddrive"
     
     # API 端点
@@ -54,6 +95,14 @@ class QuarkClient:
         'create_dir': "/file",  # 创建目录
     }
     
+    # 失败请求的重试：连接错误、超时以及下列状态码；等待时间按指数退避（带随机抖动），
+    # 限流响应带 Retry-After 时按其等待。可用环境变量 QUARK_RETRIES / QUARK_RETRY_BACKOFF 覆盖
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.5
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    # 非幂等请求（转存、创建目录）只在服务端明确拒绝时重试
+    RETRY_STATUS_UNSAFE = {429, 503}
+    
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Content-Type": "application/json",
@@ -61,16 +110,51 @@ class QuarkClient:
         "Referer": "https://pan.quark.cn/",
     }
     
-    def __init__(self, cookies_path: str = "~/.config/quark/cookies.txt"):
+    def __init__(self, cookies_path: str = "~/.config/quark/cookies.txt",
+                 scheduler: Optional[RequestScheduler] = None,
+                 base_url: Optional[str] = None,
+                 transport: Optional[Callable] = None,
+                 metrics: Optional[RequestMetrics] = None,
+                 on_progress: Optional[Callable[[Dict], None]] = None):
         """
         初始化夸克客户端
         
         Args:
             cookies_path: Cookie 文件路径
+            scheduler: 请求调度器（默认新建；多个客户端可共用一个以共享速率限制）
+            base_url: API 基础 URL（默认取环境变量 QUARK_API_BASE_URL，否则为线上地址）
+            transport: 发出请求的函数（签名同 requests.request，默认 requests.request）；
+                设置环境变量 QUARK_REPLAY 时从录制文件回放，QUARK_FAULTS 时外面再包一层
+                故障注入（见 faults.py），QUARK_RECORD 时录制客户端收到的响应（见 recording.py）
+            metrics: 请求统计（默认新建；多个客户端可共用一个汇总统计）
+            on_progress: 进度事件回调（遍历、路径解析、转存，见 progress.py）
         """
+        base_url = base_url or os.environ.get('QUARK_API_BASE_URL')
+        if base_url:
+            self.API_BASE_URL = base_url.rstrip('/')
         self.cookies_path = os.path.expanduser(cookies_path)
         self.cookies = {}
         self.user_info = None
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or RequestMetrics()
+        self.on_progress = on_progress
+        if os.environ.get('QUARK_REPLAY'):
+            from recording import shared_replayer
+            transport = shared_replayer(os.environ['QUARK_REPLAY'],
+                                        os.environ.get('QUARK_REPLAY_LATENCY') or 'original').request
+        if os.environ.get('QUARK_FAULTS'):
+            from faults import FaultInjector
+            transport = FaultInjector.parse(os.environ['QUARK_FAULTS']).wrap(transport)
+        if os.environ.get('QUARK_RECORD'):
+            from recording import shared_recorder
+            transport = shared_recorder(os.environ['QUARK_RECORD'], self.API_BASE_URL).wrap(transport)
+        self.transport = transport
+        self.max_retries = int(os.environ.get('QUARK_RETRIES') or self.MAX_RETRIES)
+        self.retry_backoff = float(os.environ.get('QUARK_RETRY_BACKOFF') or self.RETRY_BACKOFF)
+        # stoken 过期后的续期：pwd_id -> 提取码，旧 stoken -> 新 stoken
+        self._passwords: Dict[str, str] = {}
+        self._renewed_stokens: Dict[str, str] = {}
+        self._stoken_lock = threading.Lock()
         self._load_cookies()
     
     def _load_cookies(self) -> None:
@@ -102,6 +186,128 @@ class QuarkClient:
         except Exception as e:
             print(f"❌ 保存 Cookie 失败: {e}")
     
+    def _http(self, method: str, url: str, level: Optional[int] = None,
+              idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        发出 HTTP 请求（所有请求都经由调度器，按优先级排队并受速率限制）
+        
+        连接错误、超时和 RETRY_STATUS 中的状态码最多重试 max_retries 次；
+        非幂等请求只在 RETRY_STATUS_UNSAFE 时重试，避免重复转存。
+        
+        Args:
+            method: HTTP 方法
+            url: 完整 URL
+            level: 优先级（默认取当前线程的优先级，见 scheduler.priority）
+            idempotent: 是否可以安全重试（默认 GET 为是）
+            **kwargs: 传给 requests 的参数（params、json 等）
+            
+        Raises:
+            DeadlineExceeded: 当前线程的截止时间（见 deadline.py）已过
+            requests.RequestException: 重试后仍然失败
+        """
+        if idempotent is None:
+            idempotent = method.upper() == 'GET'
+        retry_status = self.RETRY_STATUS if idempotent else self.RETRY_STATUS_UNSAFE
+        transport = self.transport or requests.request
+        endpoint = (url[len(self.API_BASE_URL):] if url.startswith(self.API_BASE_URL)
+                    else url.split('?', 1)[0])
+        
+        def send(timeout: float, attempt: int, queued_at: float) -> requests.Response:
+            # 在工作线程中计时，不含排队时间
+            start = time.perf_counter()
+            with tracing.span(f'HTTP {method} {endpoint}', attempt=attempt,
+                              queued_ms=round((start - queued_at) * 1000, 1),
+                              **_trace_attributes(kwargs)) as span:
+                try:
+                    response = transport(method, url, headers=self.headers, cookies=self.cookies,
+                                         timeout=timeout, **kwargs)
+                except Exception:
+                    self.metrics.record(endpoint, time.perf_counter() - start, error=True)
+                    raise
+                self.metrics.record(endpoint, time.perf_counter() - start, len(response.content),
+                                    error=response.status_code >= 400)
+                span.set(status=response.status_code, bytes=len(response.content))
+                return response
+        
+        attempt = 0
+        while True:
+            # 超时不超过当前线程截止时间的剩余时间
+            timeout = request_timeout(30)
+            queued_at = time.perf_counter()
+            try:
+                response = self.scheduler.call(lambda: send(timeout, attempt, queued_at), level)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # 连接超时的请求没有到达服务端，非幂等请求也可以重试
+                if attempt >= self.max_retries or not (
+                        idempotent or isinstance(e, requests.exceptions.ConnectTimeout)):
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in retry_status:
+                    return response
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get('Retry-After')
+            self.metrics.record_retry(endpoint)
+            self._retry_wait(attempt, retry_after)
+            attempt += 1
+    
+    def _retry_wait(self, attempt: int, retry_after: Optional[str]) -> None:
+        """重试前等待（不超过当前线程截止时间的剩余时间）"""
+        try:
+            wait = float(retry_after)
+        except (TypeError, ValueError):
+            wait = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        deadline = current_deadline()
+        if deadline is not None:
+            wait = min(wait, deadline.remaining())
+        time.sleep(max(wait, 0.0))
+    
+    def start_progress(self, operation: str, units=FOLDER_UNITS, **fields):
+        """
+        新建一次操作的进度（没有设置 on_progress 时返回空进度）
+
+        Args:
+            operation: 操作名（crawl、resolve、save、task）
+            units: 估算剩余时间的 (已完成, 待处理) 计数名
+            **fields: 事件中的固定字段；值为整数的作为计数初始值
+        """
+        if self.on_progress is None:
+            return NOOP
+        counters = {key: value for key, value in fields.items() if isinstance(value, int)}
+        return Progress(operation, self.on_progress, self.metrics.total_calls, units,
+                        fields={key: value for key, value in fields.items() if key not in counters},
+                        **counters)
+
+    @staticmethod
+    def _is_stoken_error(result: Dict) -> bool:
+        """响应是否为 stoken 过期 / 无效"""
+        message = str(result.get('message', result.get('msg', '')))
+        return 'stoken' in message.lower() or ('token' in message.lower() and '过期' in message)
+    
+    def _current_stoken(self, stoken: str) -> str:
+        """已续期的 stoken 换成最新的"""
+        with self._stoken_lock:
+            while stoken in self._renewed_stokens:
+                stoken = self._renewed_stokens[stoken]
+        return stoken
+    
+    def _renew_stoken(self, pwd_id: str, stoken: str) -> Optional[str]:
+        """
+        stoken 过期后重新获取（并发请求同时发现过期时只获取一次）
+        
+        Returns:
+            新的 stoken；没有获取过该分享的 stoken（不知道提取码）时返回 None
+        """
+        with self._stoken_lock:
+            if stoken in self._renewed_stokens:
+                return self._renewed_stokens[stoken]
+            if pwd_id not in self._passwords:
+                return None
+            renewed = self.get_stoken(pwd_id, self._passwords[pwd_id])
+            self._renewed_stokens[stoken] = renewed
+            return renewed
+    
     def _request(self, endpoint: str, method: str = "POST", 
                  data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict:
         """
@@ -120,22 +326,9 @@ class QuarkClient:
         
         try:
             if method.upper() == "GET":
-                response = requests.get(
-                    url=url,
-                    headers=self.headers,
-                    cookies=self.cookies,
-                    params=params,
-                    timeout=30
-                )
+                response = self._http('GET', url, params=params)
             else:
-                response = requests.post(
-                    url=url,
-                    headers=self.headers,
-                    cookies=self.cookies,
-                    params=params,
-                    json=data,
-                    timeout=30
-                )
+                response = self._http('POST', url, params=params, json=data)
             result = response.json()
             
             # 检查 API 返回码（兼容 status 和 code）
@@ -182,13 +375,7 @@ class QuarkClient:
                 '_size': 10,
             }
             
-            response = requests.get(
-                url=url,
-                headers=self.headers,
-                cookies=self.cookies,
-                params=params,
-                timeout=30
-            )
+            response = self._http('GET', url, params=params)
             result = response.json()
             
             # 兼容 status 和 code
@@ -282,6 +469,7 @@ class QuarkClient:
             'password': password
         }
 
+    @tracing.traced('get_stoken', ('pwd_id',))
     def get_stoken(self, pwd_id: str, password: str = '') -> str:
         """
         获取访问令牌 (stoken)
@@ -309,14 +497,7 @@ class QuarkClient:
             "passcode": password or ""
         }
         
-        response = requests.post(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            json=data,
-            timeout=30
-        )
+        response = self._http('POST', url, idempotent=True, params=params, json=data)
         result = response.json()
         
         # 兼容 status 和 code
@@ -326,6 +507,8 @@ class QuarkClient:
             if '密码' in error_msg or 'passcode' in error_msg:
                 raise Exception("提取码错误")
             raise Exception(f"获取 stoken 失败: {error_msg}")
+        # 记住提取码，stoken 过期时自动续期
+        self._passwords[pwd_id] = password or ''
         
         # 兼容不同格式的响应
         if 'data' in result:
@@ -334,6 +517,7 @@ class QuarkClient:
             return result['result']['data']['stoken']
         return result['data']['stoken']
 
+    @tracing.traced('list_page', ('pwd_id', 'pdir_fid', 'page'))
     def get_file_list(self, pwd_id: str, stoken: str, 
                       pdir_fid: str = '0', page: int = 1, size: int = 50) -> List[Dict]:
         """
@@ -353,6 +537,7 @@ class QuarkClient:
             Exception: 获取失败时抛出异常
         """
         url = f"{self.API_BASE_URL}/share/sharepage/detail"
+        stoken = self._current_stoken(stoken)
         params = {
             'pr': 'ucpro',
             'fr': 'pc',
@@ -363,26 +548,259 @@ class QuarkClient:
             '_size': size,
         }
         
-        response = requests.get(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            timeout=30
-        )
+        response = self._http('GET', url, params=params)
         result = response.json()
         
         # 兼容 status 和 code
         status_code = result.get('status') or result.get('code')
+        if status_code != 200 and self._is_stoken_error(result):
+            # stoken 过期：续期后重试一次
+            renewed = self._renew_stoken(pwd_id, stoken)
+            if renewed is not None:
+                params['stoken'] = renewed
+                result = self._http('GET', url, params=params).json()
+                status_code = result.get('status') or result.get('code')
         if status_code != 200:
             raise Exception(f"获取文件列表失败: {result.get('message', result.get('msg', '未知错误'))}")
         
         # 返回原始 list
         return result.get('data', {}).get('list', [])
 
+    def iter_folder_items(self, pwd_id: str, stoken: str,
+                          pdir_fid: str = '0', size: int = 50,
+                          on_page: Optional[Callable[[List[Dict]], None]] = None) -> Iterator[Dict]:
+        """
+        逐页获取目录下的所有条目（自动翻页）
+
+        Args:
+            pwd_id: 分享链接 ID
+            stoken: 访问令牌
+            pdir_fid: 目录 ID
+            size: 每页数量
+            on_page: 每获取一页时的回调，接收该页的条目
+
+        Yields:
+            Dict: API 返回的原始条目
+        """
+        page = 1
+        first_fid = None
+        while True:
+            items = self.get_file_list(pwd_id, stoken, pdir_fid, page=page, size=size)
+            if not items:
+                return
+            # 防止服务端忽略 _page 参数导致重复返回同一页
+            head = items[0].get('fid') or items[0].get('file_id')
+            if page > 1 and head == first_fid:
+                return
+            first_fid = first_fid or head
+            if on_page:
+                on_page(items)
+            yield from items
+            if len(items) < size:
+                return
+            page += 1
+
+    @staticmethod
+    def convert_share_file(file: Dict, pdir_fid: str) -> Dict:
+        """将 API 返回的分享条目转换为统一的文件字典"""
+        # 使用原始 file_name 和 fid 字段（API 返回的字段名）
+        file_name = file.get('file_name') or file.get('name')
+        fid = file.get('file_id') or file.get('fid')
+
+        return {
+            # 使用 API 期望的字段名
+            'file_name': file_name,
+            'fid': fid,
+            'file_id': fid,  # 兼容两种字段名
+            'size': file.get('size', 0),
+            'type': file.get('type', 'file' if not file.get('dir', False) else 'folder'),
+            'is_file': file.get('type') == 'file' or not file.get('dir', False),
+            'pdir_fid': pdir_fid,
+            'obj_category': file.get('obj_category'),
+            'phone_play_url': (file.get('play_lua') or {}).get('phone_play_url'),
+            'dir': file.get('dir', False),
+            'share_fid_token': file.get('share_fid_token', ''),
+            'updated_at': file.get('updated_at'),
+            'created_at': file.get('created_at'),
+        }
+
+    def _iter_folder(self, pwd_id: str, stoken: str, fid: str,
+                     entry: Optional[Dict], cache=None, on_page=None) -> Iterator[Dict]:
+        """
+        获取目录条目，优先使用缓存
+
+        Args:
+            fid: 目录 ID
+            entry: 目录自身的条目（根目录为 None）
+            cache: 目录缓存（见 share_snapshot.FolderCache），需提供 lookup/store
+            on_page: 每获取一页时的回调（使用缓存时整个目录算一页）
+        """
+        if cache is None:
+            return self.iter_folder_items(pwd_id, stoken, fid, on_page=on_page)
+
+        items = cache.lookup(fid, entry)
+        if items is None:
+            items = list(self.iter_folder_items(pwd_id, stoken, fid, on_page=on_page))
+        elif on_page:
+            on_page(items)
+        cache.store(fid, entry, items)
+        return iter(items)
+
+    def iter_files_recursive(self, pwd_id: str, stoken: str,
+                             pdir_fid: str = '0', depth: int = 0,
+                             max_depth: int = -1,
+                             include_folders: bool = False,
+                             cache=None, progress=None) -> Iterator[Dict]:
+        """
+        流式遍历分享中的所有文件（迭代实现，不受递归深度限制）
+
+        输出顺序与 get_all_files_recursive 完全一致（目录内按列表顺序深度优先），
+        因此边遍历边产出的序号与完整列表中的序号相同。
+
+        Args:
+            pwd_id: 分享链接 ID
+            stoken: 访问令牌
+            pdir_fid: 起始目录 ID
+            depth: 起始深度
+            max_depth: 最大深度（-1 表示无限）
+            include_folders: 是否同时产出文件夹条目（文件夹先于其内容产出）
+            cache: 目录缓存，updated_at 未变化的目录直接使用缓存的条目
+            progress: 累计遍历进度的 Progress（默认新建 crawl 进度，见 progress.py）
+
+        Yields:
+            Dict: 文件（及可选的文件夹）字典
+        """
+        if progress is None:
+            if self.on_progress is not None:
+                with self.start_progress('crawl', pwd_id=pwd_id, folders_queued=1,
+                                         files_found=0) as progress:
+                    yield from self.iter_files_recursive(pwd_id, stoken, pdir_fid, depth, max_depth,
+                                                         include_folders, cache, progress)
+                return
+            progress = NOOP
+
+        def listed(folder_depth: int):
+            # 每获取一页：记录找到的文件，将要展开的子目录计入待处理
+            if progress is NOOP:
+                return None
+
+            def on_page(page: List[Dict]) -> None:
+                folders = sum(1 for item in page if _is_folder_item(item))
+                progress.add(files_found=len(page) - folders,
+                             folders_queued=folders if max_depth == -1 or folder_depth < max_depth
+                             else 0)
+            return on_page
+
+        stack = [(pdir_fid, depth, self._iter_folder(pwd_id, stoken, pdir_fid, None, cache,
+                                                     listed(depth)))]
+        while stack:
+            folder_fid, folder_depth, items = stack[-1]
+            file = next(items, None)
+            if file is None:
+                stack.pop()
+                progress.add(folders_done=1, folders_queued=-1)
+                continue
+
+            converted_file = self.convert_share_file(file, folder_fid)
+            if converted_file['is_file']:
+                yield converted_file
+                continue
+
+            if include_folders:
+                yield converted_file
+            if max_depth == -1 or folder_depth < max_depth:
+                # 如果是文件夹且未达到最大深度，继续深入
+                sub_fid = converted_file['fid']
+                stack.append((sub_fid, folder_depth + 1,
+                              self._iter_folder(pwd_id, stoken, sub_fid, converted_file, cache,
+                                                listed(folder_depth + 1))))
+
+    @tracing.traced('list_folder', ('fid',))
+    def _list_folder_within(self, deadline: Deadline, pwd_id: str, stoken: str, fid: str,
+                            entry: Optional[Dict], cache=None) -> List[Dict]:
+        """在截止时间内获取一个目录的全部条目（在调度器的工作线程中执行）"""
+        with deadline.active():
+            deadline.check()
+            return [self.convert_share_file(item, fid)
+                    for item in self._iter_folder(pwd_id, stoken, fid, entry, cache)]
+
+    @tracing.traced('crawl_breadth_first', ('pwd_id', 'pdir_fid', 'max_depth'))
+    def crawl_breadth_first(self, pwd_id: str, stoken: str, deadline: Deadline,
+                            pdir_fid: str = '0', depth: int = 0, max_depth: int = -1,
+                            cache=None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        在时间预算内按层遍历分享
+        
+        先获取完整的第一层，再获取第二层……同一层的目录并行请求（共用调度器的工作线程）。
+        截止时间到达后停止展开，已获取的部分按 iter_files_recursive 的顺序返回，
+        因此可以直接交给 FileTable / build_file_tree。
+        
+        Args:
+            pwd_id: 分享链接 ID
+            stoken: 访问令牌
+            deadline: 截止时间
+            pdir_fid: 起始目录 ID
+            depth: 起始深度
+            max_depth: 最大深度（-1 表示无限）
+            cache: 目录缓存（可选）
+            
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (文件和文件夹条目, 未来得及展开的文件夹条目)；
+                第二项为空表示遍历完整，起始目录本身未获取时其中包含 fid 为 pdir_fid 的条目
+        """
+        children: Dict[str, List[Dict]] = {}
+        unlisted: List[Dict] = []
+        # 起始目录没有对应的条目，未获取时用占位条目记入 unlisted
+        root = {'fid': pdir_fid, 'file_id': pdir_fid, 'file_name': '', 'pdir_fid': None,
+                'is_file': False, 'dir': True}
+        level = [(pdir_fid, depth, None)]
+        
+        with self.start_progress('crawl', pwd_id=pwd_id, folders_queued=1, files_found=0) as progress:
+            while level:
+                if deadline.expired():
+                    unlisted.extend(entry or root for _, _, entry in level)
+                    break
+                jobs = [(fid, folder_depth, entry, self.scheduler.submit(
+                            lambda fid=fid, entry=entry: self._list_folder_within(
+                                deadline, pwd_id, stoken, fid, entry, cache)))
+                        for fid, folder_depth, entry in level]
+                level = []
+                for fid, folder_depth, entry, future in jobs:
+                    try:
+                        items = future.result(timeout=deadline.remaining())
+                    except (DeadlineExceeded, FutureTimeoutError, requests.exceptions.Timeout):
+                        if not deadline.expired():
+                            raise
+                        # 尚未开始的请求不再发出
+                        future.cancel()
+                        unlisted.append(entry or root)
+                        continue
+                    children[fid] = items
+                    folders = [item for item in items if not item['is_file']]
+                    if max_depth == -1 or folder_depth < max_depth:
+                        level.extend((item['fid'], folder_depth + 1, item) for item in folders)
+                    progress.add(folders_done=1, files_found=len(items) - len(folders),
+                                 folders_queued=(len(folders) if max_depth == -1
+                                                 or folder_depth < max_depth else 0) - 1)
+            progress.finish(partial=bool(unlisted), folders_unlisted=len(unlisted))
+        
+        # 按深度优先顺序（文件夹先于其内容）输出
+        entries = []
+        stack = [iter(children.get(pdir_fid, ()))]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+            entries.append(item)
+            if not item['is_file'] and item['fid'] in children:
+                stack.append(iter(children[item['fid']]))
+        return entries, unlisted
+
+    @tracing.traced('crawl', ('pwd_id', 'pdir_fid', 'max_depth'))
     def get_all_files_recursive(self, pwd_id: str, stoken: str, 
                                 pdir_fid: str = '0', depth: int = 0, 
-                                max_depth: int = -1) -> List[Dict]:
+                                max_depth: int = -1, cache=None) -> List[Dict]:
         """
         递归获取所有文件（包括子文件夹）
         
@@ -392,52 +810,36 @@ class QuarkClient:
             pdir_fid: 当前目录 ID
             depth: 当前深度（从 0 开始）
             max_depth: 最大深度（-1 表示无限，0 表示只显示当前层，1 表示显示当前层和下一层）
+            cache: 目录缓存（可选），updated_at 未变化的目录不再请求
             
         Returns:
             List[Dict]: 所有文件的列表
         """
-        all_files = []
-        
-        # 检查深度限制（max_depth <= 0 时只获取当前层）
-        if max_depth != -1 and depth >= max_depth:
-            # 仍然获取当前层的文件，只是不递归
-            pass
-        
         try:
-            files = self.get_file_list(pwd_id, stoken, pdir_fid)
-            
-            for file in files:
-                # 使用原始 file_name 和 fid 字段（API 返回的字段名）
-                file_name = file.get('file_name') or file.get('name')
-                fid = file.get('file_id') or file.get('fid')
-                
-                converted_file = {
-                    # 使用 API 期望的字段名
-                    'file_name': file_name,
-                    'fid': fid,
-                    'file_id': fid,  # 兼容两种字段名
-                    'size': file.get('size', 0),
-                    'type': file.get('type', 'file' if not file.get('dir', False) else 'folder'),
-                    'is_file': file.get('type') == 'file' or not file.get('dir', False),
-                    'pdir_fid': pdir_fid,
-                    'obj_category': file.get('obj_category'),
-                    'phone_play_url': file.get('play_lua', {}).get('phone_play_url'),
-                    'dir': file.get('dir', False),
-                    'share_fid_token': file.get('share_fid_token', ''),
-                    'updated_at': file.get('updated_at'),
-                    'created_at': file.get('created_at'),
-                }
-                
-                if converted_file['is_file']:
-                    all_files.append(converted_file)
-                elif max_depth == -1 or depth < max_depth:
-                    # 如果是文件夹且未达到最大深度，递归获取
-                    all_files.extend(
-                        self.get_all_files_recursive(pwd_id, stoken, converted_file['fid'], depth + 1, max_depth)
-                    )
-            
-            return all_files
-            
+            return list(self.iter_files_recursive(pwd_id, stoken, pdir_fid, depth, max_depth,
+                                                  cache=cache))
+        except Exception as e:
+            raise Exception(f"递归获取文件失败: {e}")
+
+    @tracing.traced('crawl', ('pwd_id', 'pdir_fid', 'max_depth'))
+    def get_all_files_table(self, pwd_id: str, stoken: str,
+                            pdir_fid: str = '0', depth: int = 0,
+                            max_depth: int = -1, cache=None,
+                            index_names: bool = False) -> FileTable:
+        """
+        获取所有文件，以紧凑的列式 FileTable 保存（适合超大分享）
+
+        参数与 get_all_files_recursive 相同；遍历过程中逐条写入表中，
+        不会同时持有完整的字典列表。index_names 为 True 时同时构建文件名搜索索引。
+
+        Returns:
+            FileTable: 文件表，按下标访问时生成与 get_all_files_recursive 相同结构的字典
+        """
+        try:
+            # 文件夹条目只用于记录目录路径（供 path: 选择使用），不占行
+            return FileTable(self.iter_files_recursive(pwd_id, stoken, pdir_fid, depth, max_depth,
+                                                       include_folders=True, cache=cache),
+                             index_names=index_names)
         except Exception as e:
             raise Exception(f"递归获取文件失败: {e}")
 
@@ -500,6 +902,7 @@ class QuarkClient:
         except Exception as e:
             raise Exception(f"获取文件夹树失败: {e}")
     
+    @tracing.traced('save_files', ('pwd_id', 'to_pdir_fid'), result='task_id')
     def save_files(self, pwd_id: str, stoken: str, fid_list: List[str],
                    share_fid_tokens: List[str], 
                    to_pdir_fid: str = '0') -> str:
@@ -527,7 +930,7 @@ class QuarkClient:
         
         data = {
             "pwd_id": pwd_id,
-            "stoken": stoken,
+            "stoken": self._current_stoken(stoken),
             "fid_list": fid_list,
             "share_fid_token_list": share_fid_tokens,
             "to_pdir_fid": to_pdir_fid,
@@ -535,18 +938,18 @@ class QuarkClient:
             "scene": "link"
         }
         
-        response = requests.post(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            json=data,
-            timeout=30
-        )
+        response = self._http('POST', url, params=params, json=data)
         result = response.json()
         
         # 兼容 status 和 code
         status_code = result.get('status') or result.get('code')
+        if status_code != 200 and self._is_stoken_error(result):
+            # stoken 过期时服务端没有创建任务，续期后可以安全重试
+            renewed = self._renew_stoken(pwd_id, data['stoken'])
+            if renewed is not None:
+                data['stoken'] = renewed
+                result = self._http('POST', url, params=params, json=data).json()
+                status_code = result.get('status') or result.get('code')
         if status_code != 200:
             error_msg = result.get('message', result.get('msg', '未知错误'))
             if '容量' in error_msg or '空间' in error_msg or 'space' in str(error_msg).lower():
@@ -560,6 +963,149 @@ class QuarkClient:
             return result['result']['data'].get('task_id', '')
         return result.get('data', {}).get('task_id', '')
 
+    @tracing.traced('save_stream', ('pwd_id', 'to_pdir_fid', 'batch_size'))
+    def save_files_streaming(self, pwd_id: str, stoken: str,
+                             file_filter: Callable[[Dict], bool],
+                             to_pdir_fid: str = '0', batch_size: int = 100,
+                             max_inflight: int = 4, max_depth: int = -1,
+                             on_batch: Optional[Callable[[int, int, str], None]] = None,
+                             deadline: Optional[Deadline] = None) -> Dict:
+        """
+        边遍历边转存：遍历与转存并行进行
+
+        后台线程流式遍历分享，匹配 file_filter 的文件进入有界队列；
+        主线程每凑满 batch_size 个文件就提交一次 save_files。
+        队列满时遍历线程阻塞，未完成的转存任务达到 max_inflight 时
+        先等待最早的任务完成，从两端形成背压。
+
+        Args:
+            pwd_id: 分享链接 ID
+            stoken: 访问令牌
+            file_filter: 文件筛选函数（见 build_selection_filter）
+            to_pdir_fid: 目标目录 ID
+            batch_size: 每批转存的文件数
+            max_inflight: 同时未完成的转存任务上限
+            max_depth: 最大遍历深度（-1 表示无限）
+            on_batch: 批次提交回调，接收 (批次序号, 文件数, task_id)
+            deadline: 遍历的截止时间（可选），到达后停止遍历，已匹配的文件照常转存
+
+        Returns:
+            Dict: {'task_ids', 'file_count', 'batch_count', 'failed_tasks', 'partial'}，
+                partial 为 True 表示遍历因截止时间未完成
+        """
+        pending = queue.Queue(maxsize=batch_size * 2)
+        stop = threading.Event()
+        done = object()
+        partial = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def crawl():
+            # 遍历请求让位于转存请求
+            with priority(BACKGROUND):
+                for record in self.iter_files_recursive(pwd_id, stoken, max_depth=max_depth,
+                                                        progress=progress):
+                    if deadline is not None and deadline.expired():
+                        # 使用缓存等不发请求的情况也按时停止
+                        partial.set()
+                        return
+                    if file_filter(record) and not put(record):
+                        return
+
+        def produce():
+            try:
+                if deadline is None:
+                    crawl()
+                else:
+                    with deadline.active():
+                        crawl()
+            except (DeadlineExceeded, requests.exceptions.Timeout) as e:
+                if deadline is None or not deadline.expired():
+                    put(e)
+                else:
+                    partial.set()
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        progress = self.start_progress('save', units=FOLDER_UNITS + (('tasks_done', 'tasks_pending'),),
+                                       pwd_id=pwd_id, to_pdir_fid=to_pdir_fid, folders_queued=1,
+                                       files_found=0, files_matched=0, batches=0, tasks_failed=0)
+        crawler = threading.Thread(target=tracing.bind(produce), name='quark-stream-crawl',
+                                   daemon=True)
+        crawler.start()
+
+        task_ids: List[str] = []
+        inflight: List[str] = []
+        failed_tasks: List[str] = []
+        batch: List[Dict] = []
+        file_count = 0
+
+        def finished(task_id: str) -> None:
+            ok = self.wait_task_complete(task_id)
+            if not ok:
+                failed_tasks.append(task_id)
+            progress.add(tasks_done=1, tasks_pending=-1, tasks_failed=0 if ok else 1)
+
+        def submit(records: List[Dict]) -> None:
+            while len(inflight) >= max_inflight:
+                finished(inflight.pop(0))
+            task_id = self.save_files(
+                pwd_id, stoken,
+                [r['fid'] for r in records],
+                [r.get('share_fid_token', '') for r in records],
+                to_pdir_fid,
+            )
+            if not task_id:
+                raise Exception("创建转存任务失败")
+            task_ids.append(task_id)
+            inflight.append(task_id)
+            progress.add(batches=1, tasks_pending=1)
+            if on_batch:
+                on_batch(len(task_ids), len(records), task_id)
+
+        try:
+            while True:
+                item = pending.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise Exception(f"递归获取文件失败: {item}")
+                batch.append(item)
+                file_count += 1
+                progress.add(files_matched=1)
+                if len(batch) >= batch_size:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+
+            for task_id in inflight:
+                finished(task_id)
+        except Exception as e:
+            progress.finish(error=str(e))
+            raise
+        finally:
+            stop.set()
+
+        progress.finish(partial=partial.is_set())
+        return {
+            'task_ids': task_ids,
+            'file_count': file_count,
+            'batch_count': len(task_ids),
+            'failed_tasks': failed_tasks,
+            'partial': partial.is_set(),
+        }
+
+    @tracing.traced('check_task', ('task_id',))
     def check_task_status(self, task_id: str) -> Dict:
         """
         查询转存任务状态
@@ -578,13 +1124,7 @@ class QuarkClient:
             'retry_index': '0',
         }
         
-        response = requests.get(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            timeout=30
-        )
+        response = self._http('GET', url, params=params, level=POLLING)
         result = response.json()
         
         # 兼容不同格式的响应
@@ -613,6 +1153,7 @@ class QuarkClient:
             'raw_status': status
         }
         
+    @tracing.traced('wait_task', ('task_id',), result='completed')
     def wait_task_complete(self, task_id: str, timeout: int = 300, 
                           on_progress=None) -> bool:
         """
@@ -628,40 +1169,48 @@ class QuarkClient:
         """
         start_time = time.time()
         
-        while time.time() - start_time < timeout:
-            status = self.check_task_status(task_id)
-            
-            # 调用进度回调
-            if on_progress:
-                on_progress(status['progress'], status['status'], status['message'])
-            
-            if status['status'] == 'completed':
-                print("✅ 转存完成！")
-                return True
-            elif status['status'] == 'failed':
-                print(f"❌ 转存失败: {status['message']}")
-                return False
-            elif status['status'] == 'cancelled':
-                print("❌ 转存已取消")
-                return False
+        with self.start_progress('task', units=(('percent', 'percent_left'),), task_id=task_id,
+                                 percent_left=100) as progress:
+            while time.time() - start_time < timeout:
+                status = self.check_task_status(task_id)
+                
+                # 调用进度回调
+                if on_progress:
+                    on_progress(status['progress'], status['status'], status['message'])
+                percent = _percent(status['progress'])
+                progress.set(percent=percent, percent_left=100 - percent, status=status['status'])
+                
+                if status['status'] == 'completed':
+                    print("✅ 转存完成！")
+                    return True
+                elif status['status'] == 'failed':
+                    print(f"❌ 转存失败: {status['message']}")
+                    progress.finish(error=status['message'] or status['status'])
+                    return False
+                elif status['status'] == 'cancelled':
+                    print("❌ 转存已取消")
+                    progress.finish(error=status['status'])
+                    return False
+                
+                # 显示进度
+                print(f"⏳ 转存进度: {status['progress']}% - {status['message']}")
+                time.sleep(2)
             
-            # 显示进度
-            print(f"⏳ 转存进度: {status['progress']}% - {status['message']}")
-            time.sleep(2)
-        
-        print("❌ 转存超时")
-        return False
+            print("❌ 转存超时")
+            progress.finish(error='timeout', status='timeout')
+            return False
 
-    def get_user_dirs(self, pdir_fid: str = '0', prefix: str = '') -> List[Dict]:
+    @tracing.traced('list_user_folder', ('pdir_fid',))
+    def list_user_folders(self, pdir_fid: str = '0', prefix: str = '') -> List[Dict]:
         """
-        获取用户网盘目录列表
+        获取用户网盘某个目录下的直接子目录（单次请求）
         
         Args:
             pdir_fid: 父目录 ID
-            prefix: 前缀路径
+            prefix: 父目录路径
             
         Returns:
-            List[Dict]: 目录列表
+            List[Dict]: 子目录列表，每项为 {'fid', 'name', 'path', 'pdir_fid'}
         """
         url = f"{self.API_BASE_URL}/file/sort"
         params = {
@@ -672,13 +1221,7 @@ class QuarkClient:
             '_size': 100,
         }
         
-        response = requests.get(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            timeout=30
-        )
+        response = self._http('GET', url, params=params)
         result = response.json()
         
         dirs = []
@@ -691,11 +1234,28 @@ class QuarkClient:
                     'path': current_path,
                     'pdir_fid': pdir_fid
                 })
-                # 递归获取子目录
-                dirs.extend(self.get_user_dirs(item.get('file_id') or item.get('fid'), current_path))
+        return dirs
+
+    def get_user_dirs(self, pdir_fid: str = '0', prefix: str = '') -> List[Dict]:
+        """
+        获取用户网盘目录列表
+        
+        Args:
+            pdir_fid: 父目录 ID
+            prefix: 前缀路径
+            
+        Returns:
+            List[Dict]: 目录列表
+        """
+        dirs = []
+        for folder in self.list_user_folders(pdir_fid, prefix):
+            dirs.append(folder)
+            # 递归获取子目录
+            dirs.extend(self.get_user_dirs(folder['fid'], folder['path']))
         
         return dirs
 
+    @tracing.traced('create_dir', ('dir_name', 'parent_fid'), result='fid')
     def create_dir(self, dir_name: str, parent_fid: str = '0') -> str:
         """
         创建新目录
@@ -722,14 +1282,7 @@ class QuarkClient:
             "_version": 2
         }
         
-        response = requests.post(
-            url=url,
-            headers=self.headers,
-            cookies=self.cookies,
-            params=params,
-            json=data,
-            timeout=30
-        )
+        response = self._http('POST', url, params=params, json=data)
         result = response.json()
         
         # 兼容 status 和 code
@@ -756,6 +1309,7 @@ class QuarkClient:
         
         return result.get('data', {}).get('file_id', '')
 
+    @tracing.traced('resolve_path', ('path',), result='fid')
     def get_dir_by_path(self, path: str) -> Optional[str]:
         """
         根据路径获取目录 ID
@@ -772,16 +1326,20 @@ class QuarkClient:
         parts = [p for p in path.split('/') if p]
         current_fid = '0'
         
-        for part in parts:
-            dirs = self.get_user_dirs(current_fid)
-            found = False
-            for d in dirs:
-                if d['name'] == part:
-                    current_fid = d['fid']
-                    found = True
-                    break
-            if not found:
-                return None
+        with self.start_progress('resolve', path=path, folders_queued=len(parts)) as progress:
+            for part in parts:
+                dirs = self.get_user_dirs(current_fid)
+                found = False
+                for d in dirs:
+                    if d['name'] == part:
+                        current_fid = d['fid']
+                        found = True
+                        break
+                if not found:
+                    progress.finish(found=False)
+                    return None
+                progress.add(folders_done=1, folders_queued=-1)
+            progress.finish(found=True)
         
         return current_fid
 
@@ -798,8 +1356,186 @@ def format_size(size_bytes: int) -> str:
     return f"{size_bytes:.2f} PB"
 
 
+# 全局函数：由遍历结果构建文件夹树
+def build_file_tree(entries: List[Dict]) -> Dict:
+    """
+    由 iter_files_recursive(include_folders=True) 的结果构建文件夹树
+
+    结构与 get_folder_tree 相同，但不需要再次遍历分享。
+
+    Args:
+        entries: 文件和文件夹条目（文件夹先于其内容）
+
+    Returns:
+        Dict: 文件夹树
+    """
+    root = {'type': 'folder', 'fid': None, 'name': '根目录', 'children': []}
+    nodes = {'0': root}
+
+    for entry in entries:
+        parent = nodes.get(entry.get('pdir_fid'), root)
+        if entry.get('is_file', True):
+            parent['children'].append({
+                'type': 'file',
+                'fid': entry['fid'],
+                'name': _file_name(entry),
+                'size': entry.get('size', 0),
+                'size_str': format_size(entry.get('size', 0)),
+            })
+        else:
+            node = {'type': 'folder', 'fid': entry['fid'], 'name': _file_name(entry), 'children': []}
+            nodes[entry['fid']] = node
+            parent['children'].append(node)
+
+    return root
+
+
+# 全局函数：生成文件夹树的显示行
+def iter_tree_lines(tree: Dict, indent: str = '', is_last: bool = True,
+                    paths=None) -> Iterator[str]:
+    """
+    逐行生成文件夹树的显示内容（显式栈，不受递归深度限制）
+
+    参数与 display_file_tree 相同。
+    """
+    if tree is None:
+        return
+
+    stack = [(tree, indent, is_last)]
+    while stack:
+        node, indent, is_last = stack.pop()
+        prefix = '└─ ' if is_last else '├─ '
+        children = node.get('children', [])
+
+        if node.get('type') == 'folder':
+            if node.get('name'):
+                folder = None
+                if paths is not None:
+                    folder = paths.root if node.get('fid') is None else paths.node(node['fid'])
+                if folder is not None:
+                    summary = f" ({paths.file_count(folder)} 个文件, {format_size(folder.total_size)})"
+                else:
+                    summary = ''
+                yield f"{indent}{prefix}📁 {node['name']}/{summary}"
+            child_indent = indent + ('   ' if is_last else '│  ')
+        elif node.get('type') == 'file':
+            yield f"{indent}{prefix}📄 {node['name']} ({format_size(node.get('size', 0))})"
+            continue
+        elif 'children' in node:
+            # 不带类型的树节点：子节点沿用当前缩进
+            child_indent = indent
+        else:
+            continue
+
+        # 逆序入栈，保证按原顺序输出
+        last = len(children) - 1
+        for i in range(last, -1, -1):
+            stack.append((children[i], child_indent, i == last))
+
+
+# 全局函数：边遍历边生成树形显示行
+def iter_entry_lines(entries: Iterable[Dict]) -> Iterator[str]:
+    """
+    由 iter_files_recursive(include_folders=True) 的结果边遍历边生成显示行
+
+    遍历尚未结束时无法知道某个条目是否为最后一项，因此统一使用 "├─ "；
+    缩进由父目录链推出，不需要等待完整的文件夹树。
+
+    Args:
+        entries: 文件和文件夹条目（文件夹先于其内容，可以是生成器）
+    """
+    folders: List[str] = []
+    for entry in entries:
+        pdir_fid = entry.get('pdir_fid')
+        # 回到父目录所在的层级
+        while folders and folders[-1] != pdir_fid:
+            folders.pop()
+        indent = '│  ' * len(folders)
+        name = _file_name(entry)
+        if entry.get('is_file', True):
+            yield f"{indent}├─ 📄 {name} ({format_size(entry.get('size', 0))})"
+        else:
+            yield f"{indent}├─ 📁 {name}/"
+            folders.append(entry.get('fid'))
+
+
+# 全局函数：生成汇总树的显示行
+def iter_summary_lines(paths, files=None, max_children: int = 20,
+                       max_depth: int = 2) -> Iterator[str]:
+    """
+    逐行生成汇总树：每个目录显示文件数和总大小，超出范围的内容折叠为一行
+
+    - 深度达到 max_depth 的目录不再展开
+    - 子目录超过 max_children 个时，只显示前 max_children 个，其余合并为一行
+    - 目录下直接包含的文件不超过 max_children 个且提供了 files 时逐个显示，否则合并为一行
+
+    统计数据全部来自遍历时构建的路径索引，不需要扫描文件列表。
+
+    Args:
+        paths: 路径索引（见 path_index.PathIndex）
+        files: 文件列表（可选，与 paths 的行号对应，用于显示少量文件）
+        max_children: 每个目录最多显示的子目录 / 文件数
+        max_depth: 最多展开的目录层数
+    """
+    def summary(count: int, size: int) -> str:
+        return f"{count:,} 个文件, {format_size(size)}"
+
+    root = paths.root
+    yield f"📁 根目录/ ({summary(paths.file_count(root), root.total_size)})"
+
+    # 栈中每项为 (目录节点或 None, 显示文本, 缩进, 是否最后一项, 深度)
+    stack = [(root, None, '', True, 0)]
+    first = True
+    while stack:
+        node, text, indent, is_last, depth = stack.pop()
+        prefix = '└─ ' if is_last else '├─ '
+        if node is None:
+            yield f"{indent}{prefix}{text}"
+            continue
+
+        count = paths.file_count(node)
+        if first:
+            # 根目录已经显示
+            first = False
+            child_indent = indent
+        else:
+            if depth >= max_depth:
+                yield f"{indent}{prefix}📁 {node.name}/ … {summary(count, node.total_size)}"
+                continue
+            yield f"{indent}{prefix}📁 {node.name}/ ({summary(count, node.total_size)})"
+            child_indent = indent + ('   ' if is_last else '│  ')
+
+        items = []
+        children = paths.child_nodes(node)
+        items.extend((child, None) for child in children[:max_children])
+        hidden = children[max_children:]
+        if hidden:
+            hidden_count = sum(paths.file_count(child) for child in hidden)
+            hidden_size = sum(child.total_size for child in hidden)
+            items.append((None, f"… 还有 {len(hidden):,} 个文件夹，{summary(hidden_count, hidden_size)}"))
+
+        direct = paths.direct_rows(node)
+        direct_count = sum(end - start for start, end in direct)
+        if direct_count:
+            if files is not None and direct_count <= max_children:
+                for start, end in direct:
+                    for row in range(start, end):
+                        file = files[row]
+                        items.append((None, f"📄 {_file_name(file)} ({format_size(file.get('size', 0))})"))
+            else:
+                direct_size = node.total_size - sum(child.total_size for child in children)
+                items.append((None, f"… {summary(direct_count, direct_size)}"))
+
+        # 逆序入栈，保证按原顺序输出
+        last = len(items) - 1
+        for i in range(last, -1, -1):
+            child, text = items[i]
+            stack.append((child, text, child_indent, i == last, depth + 1))
+
+
 # 全局函数：树形显示文件列表
-def display_file_tree(tree: Dict, indent: str = '', is_last: bool = True) -> None:
+def display_file_tree(tree: Dict, indent: str = '', is_last: bool = True,
+                      paths=None, writer: Optional[LineWriter] = None) -> None:
     """
     以树形结构显示文件夹树
     
@@ -807,39 +1543,42 @@ def display_file_tree(tree: Dict, indent: str = '', is_last: bool = True) -> Non
         tree: 文件夹树
         indent: 缩进
         is_last: 是否是最后一个节点
+        paths: 路径索引（可选，见 path_index.PathIndex），提供时文件夹后显示文件数和总大小
+        writer: 输出（可选，见 renderer.LineWriter），用于分页或与其他输出共用缓冲
     """
-    if tree is None:
+    if writer is not None:
+        writer.write_lines(iter_tree_lines(tree, indent, is_last, paths))
         return
-    
-    # 构建当前节点的前缀
-    prefix = '└─ ' if is_last else '├─ '
-    
-    # 显示文件夹
-    if tree.get('type') == 'folder':
-        if tree.get('name'):
-            print(f"{indent}{prefix}📁 {tree['name']}/")
-        children = tree.get('children', [])
-        for i, child in enumerate(children):
-            is_child_last = (i == len(children) - 1)
-            new_indent = indent + ('   ' if is_last else '│  ')
-            display_file_tree(child, new_indent, is_child_last)
-    
-    # 显示文件
-    elif tree.get('type') == 'file':
-        size_str = format_size(tree.get('size', 0))
-        print(f"{indent}{prefix}📄 {tree['name']} ({size_str})")
-    
-    # 显示树节点（带序号）
-    elif 'children' in tree:
-        children = tree.get('children', [])
-        for i, child in enumerate(children):
-            is_child_last = (i == len(children) - 1)
-            display_file_tree(child, indent, is_child_last)
+    with LineWriter() as out:
+        out.write_lines(iter_tree_lines(tree, indent, is_last, paths))
+
+
+def _file_columns(files: Iterable[Dict]) -> Iterator[tuple]:
+    """逐行取出 (名称, 大小, 是否文件)；FileTable 直接读列，不生成字典"""
+    if isinstance(files, FileTable):
+        return zip(files.names, files.sizes, files.is_file)
+    # 兼容 'name' 和 'file_name' 字段
+    return ((file.get('name') or file.get('file_name'), file.get('size', 0), file.get('is_file', True))
+            for file in files)
+
+
+def _file_lines(files: Iterable[Dict], show_index: bool) -> Iterator[str]:
+    """display_files 的表格行"""
+    for i, (name, size, is_file) in enumerate(_file_columns(files), 1):
+        name = (name or '未知')[:38]
+        size = format_size(size) if size > 0 else '-'
+        ftype = '📁 文件夹' if not is_file else '📄 文件'
+        
+        if show_index:
+            yield f"{f'[{i}]':<5} {name:<40} {size:>15} {ftype:<10}"
+        else:
+            yield f"  {name:<48} {size:>15} {ftype:<10}"
 
 
 # 全局函数：显示文件列表（带序号）
 def display_files(files: List[Dict], show_size: bool = True, 
-                  show_index: bool = True) -> List[str]:
+                  show_index: bool = True,
+                  writer: Optional[LineWriter] = None) -> List[str]:
     """
     格式化显示文件列表
     
@@ -847,6 +1586,7 @@ def display_files(files: List[Dict], show_size: bool = True,
         files: 文件列表
         show_size: 是否显示文件大小
         show_index: 是否显示序号
+        writer: 输出（可选，见 renderer.LineWriter），用于分页
         
     Returns:
         List[str]: 序号映射表
@@ -855,47 +1595,62 @@ def display_files(files: List[Dict], show_size: bool = True,
         print("📂 空目录")
         return []
     
+    out = writer or LineWriter()
+    
     # 显示表头
+    out.write("\n" + "="*80)
     if show_index:
-        print("\n" + "="*80)
-        print(f"{'序号':<5} {'名称':<40} {'大小':>15} {'类型':<10}")
-        print("="*80)
+        out.write(f"{'序号':<5} {'名称':<40} {'大小':>15} {'类型':<10}")
     else:
-        print("\n" + "="*80)
-        print(f"{'名称':<50} {'大小':>15} {'类型':<10}")
-        print("="*80)
-    
-    # 序号映射表
-    index_map = []
-    
-    for i, file in enumerate(files, 1):
-        # 序号
-        if show_index:
-            index_str = f"[{i}]"
-        else:
-            index_str = ""
-        
-        # 兼容 'name' 和 'file_name' 字段
-        name = (file.get('name') or file.get('file_name') or '未知')[:38]
-        name = name + '..' if len(name) > 38 else name
-        size = format_size(file.get('size', 0)) if file.get('size', 0) > 0 else '-'
-        ftype = '📁 文件夹' if not file.get('is_file', True) else '📄 文件'
-        
-        if show_index:
-            print(f"{index_str:<5} {name:<40} {size:>15} {ftype:<10}")
-        else:
-            print(f"  {name:<48} {size:>15} {ftype:<10}")
-        
-        index_map.append(str(i))
+        out.write(f"{'名称':<50} {'大小':>15} {'类型':<10}")
+    out.write("="*80)
     
-    if show_index:
-        print("="*80)
-        print(f"共 {len(files)} 个项目\n")
-    else:
-        print("="*80)
-        print(f"共 {len(files)} 个项目\n")
+    if out.write_lines(_file_lines(files, show_index)):
+        out.write("="*80)
+        out.write(f"共 {len(files)} 个项目\n")
+    out.flush()
     
-    return index_map
+    # 序号映射表
+    return [str(i) for i in range(1, len(files) + 1)]
+
+
+def _file_name(file: Dict) -> str:
+    """兼容 'name' 和 'file_name' 字段"""
+    return file.get('name') or file.get('file_name') or ''
+
+
+def is_index_selection(selection: str) -> bool:
+    """是否为序号选择（如 "1,2,3" 或 "1-10"），序号选择依赖完整文件列表"""
+    return selection.replace(',', '').replace('-', '').replace(' ', '').isdigit()
+
+
+# 全局函数：构建文件筛选函数
+def build_selection_filter(selection: str) -> Optional[Callable[[Dict], bool]]:
+    """
+    将按规则的选择字符串编译为单文件筛选函数
+
+    与 parse_file_selection 的规则一致（语法见 selection_query），只编译一次，
+    可逐条判断文件，适合在遍历过程中流式筛选。序号选择依赖完整列表，返回 None。
+
+    Args:
+        selection: 选择字符串，例如 "all"、"*.mkv"、"video and >1G"
+
+    Returns:
+        Callable: 筛选函数；无法逐条判断（序号选择）时返回 None
+
+    Raises:
+        ValueError: 语法错误，或使用了流式遍历无法判断的 path: 条件
+    """
+    selection = selection.strip()
+
+    # 序号选择需要完整列表
+    if is_index_selection(selection):
+        return None
+
+    plan = compile_selection(selection)
+    if plan.uses_paths:
+        raise ValueError("流式筛选不支持 path: 条件")
+    return plan.match
 
 
 # 全局函数：解析文件选择
@@ -904,11 +1659,15 @@ def parse_file_selection(selection: str, files: List[Dict]) -> List[Dict]:
     解析文件选择字符串
     
     Args:
-        selection: 选择字符串，例如 "1,2,3" 或 "1-10" 或 "all" 或 "*.mkv"
+        selection: 选择字符串，例如 "1,2,3" 或 "1-10" 或 "all" 或 "*.mkv"，
+            以及 "video and >1G"、"path:/S2 mkv,mp4" 等条件（见 selection_query）
         files: 文件列表
         
     Returns:
         List[Dict]: 选中的文件列表
+
+    Raises:
+        ValueError: 条件语法错误
     """
     selected = []
     
@@ -928,8 +1687,8 @@ def parse_file_selection(selection: str, files: List[Dict]) -> List[Dict]:
                 selected.append(files[i - 1])
         return selected
     
-    # 按序号选择 (如 "1,2,3")
-    if ',' in selection or selection.isdigit():
+    # 按序号选择 (如 "1,2,3")；"mkv,pdf" 等扩展名列表交给条件匹配
+    if is_index_selection(selection):
         indices = []
         for part in selection.split(','):
             part = part.strip()
@@ -951,68 +1710,33 @@ def parse_file_selection(selection: str, files: List[Dict]) -> List[Dict]:
                 selected.append(files[idx - 1])
         return selected
     
-    # 通配符匹配 (如 "*.mkv")
-    if '*' in selection:
-        pattern = selection.replace('.', '\\.').replace('*', '.*')
-        for file in files:
-            if re.match(pattern, file['name'], re.IGNORECASE):
-                selected.append(file)
-        return selected
-    
-    # 按类型选择
-    if selection.lower() in ['video', 'videos', '电影', '影视']:
-        video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', 
-                          '.m4v', '.mpg', '.mpeg', '.webm', '.ts', '.vob'}
-        for file in files:
-            ext = os.path.splitext(file['name'])[1].lower()
-            if ext in video_extensions:
-                selected.append(file)
-        return selected
-    
-    if selection.lower() in ['zip', 'rar', '7z', '压缩包', '压缩文件']:
-        archive_extensions = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', 
-                            '.tgz', '.xz', '.lzma'}
-        for file in files:
-            ext = os.path.splitext(file['name'])[1].lower()
-            if ext in archive_extensions:
-                selected.append(file)
-        return selected
-    
-    # 文件扩展名匹配 (如 "mkv", "pdf")
-    if not selection.startswith('.') and '.' not in selection:
-        ext_lower = selection.lower()
-        for file in files:
-            ext = os.path.splitext(file['name'])[1].lower()
-            if ext == '.' + ext_lower or ext == ext_lower:
-                selected.append(file)
-        return selected
-    
-    return selected
+    # 通配符 / 类型 / 扩展名 / 大小 / 路径等条件，编译后对整个列表一次求值
+    return compile_selection(selection.strip()).filter(files)
 
 
 # 全局函数：显示文件树视图（带序号）
-def display_file_tree_view(files: List[Dict], index_map: List[str]) -> None:
+def display_file_tree_view(files: List[Dict], index_map: List[str],
+                           writer: Optional[LineWriter] = None) -> None:
     """
     以树形结构显示文件列表（带序号）
     
     Args:
         files: 文件列表
         index_map: 序号映射表
+        writer: 输出（可选，见 renderer.LineWriter），用于分页
     """
     if not files:
         print("📂 空目录")
         return
     
-    print("\n📁 文件树：")
-    print("-" * 60)
-    
-    for i, file in enumerate(files, 1):
-        name = file['name']
-        size = format_size(file['size']) if file['size'] > 0 else '-'
-        ftype = '📁' if not file['is_file'] else '📄'
-        index = f"[{i}]"
-        
-        print(f"  {index} {ftype} {name} ({size})")
+    out = writer or LineWriter()
+    out.write("\n📁 文件树：")
+    out.write("-" * 60)
     
-    print("-" * 60)
-    print(f"共 {len(files)} 个项目\n")
+    lines = (f"  [{i}] {'📄' if is_file else '📁'} {name or ''} "
+             f"({format_size(size) if size > 0 else '-'})"
+             for i, (name, size, is_file) in enumerate(_file_columns(files), 1))
+    if out.write_lines(lines):
+        out.write("-" * 60)
+        out.write(f"共 {len(files)} 个项目\n")
+    out.flush()
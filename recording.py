@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+请求录制与回放 - 离线复现线上遍历 / 转存的性能问题
+
+录制：包装客户端的传输层，把每个请求和响应（含耗时）逐行写入 NDJSON 文件。
+Cookie 不写入文件；stoken、提取码、share_fid_token 等凭据替换为占位符
+（同一个值始终替换为同一个占位符，文件中的请求和响应仍然对得上）。
+
+回放：按录制文件返回响应，不需要网络、Cookie 和原来的分享。延迟可以是原始耗时、
+零延迟或按比例缩放，同一次录制可以反复运行，用来分析遍历和渲染的开销：
+
+    # 录制一次线上运行
+    QUARK_RECORD=slow.ndjson python3 main.py list <分享链接> --json-only
+
+    # 离线回放（原始耗时 / 零延迟只测客户端开销）
+    QUARK_REPLAY=slow.ndjson python3 main.py list <分享链接> --json-only
+    QUARK_REPLAY=slow.ndjson QUARK_REPLAY_LATENCY=zero python3 main.py list <分享链接> --stats
+
+    # 查看录制文件的请求统计
+    python3 recording.py slow.ndjson
+
+回放时按 (方法, 路径, 参数, 请求体) 匹配录制的请求，忽略凭据和时间戳参数（__t、__dt）；
+同一个请求录制了多次（重试、轮询转存任务）时按录制顺序依次返回，用完后重复最后一个。
+录制的连接错误、超时在回放时抛出同类异常。
+
+在代码中：
+
+    QuarkClient(cookies_path, transport=Recorder('run.ndjson').wrap())
+    QuarkClient(cookies_path, transport=Replayer('run.ndjson', latency='zero').request)
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from faults import make_response
+from metrics import RequestMetrics
+
+FORMAT_VERSION = 1
+
+# 替换为占位符的字段（参数、请求体、响应体中的键，不区分大小写）
+SECRET_KEYS = frozenset(('stoken', 'passcode', 'share_fid_token', 'fid_token_list',
+                         'cookie', 'set-cookie', 'authorization'))
+
+# 回放匹配时忽略的参数（每次请求都不同）
+VOLATILE_KEYS = frozenset(('__t', '__dt'))
+
+# 录制的响应头
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+
+class ReplayMiss(requests.exceptions.RequestException):
+    """录制文件中没有对应的请求"""
+
+
+class Recorder:
+    """录制请求与响应（线程安全，每条记录写入后立即落盘）"""
+
+    def __init__(self, path: str, base_url: Optional[str] = None):
+        """
+        Args:
+            path: 录制文件路径（覆盖已有文件）
+            base_url: API 基础 URL（用于记录接口名，统计时按接口汇总）
+        """
+        self.path = path
+        self.base_url = base_url
+        self.count = 0
+        self._lock = threading.Lock()
+        self._placeholders: Dict[str, str] = {}
+        self._started = time.perf_counter()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({'recording': FORMAT_VERSION, 'base_url': base_url,
+                     'created': time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+
+    def wrap(self, transport: Callable = None) -> Callable:
+        """包装传输函数（签名与 requests.request 相同）"""
+        def request(method, url, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = (transport or requests.request)(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(method, url, kwargs, start, error=e)
+                raise
+            self._record(method, url, kwargs, start, response=response)
+            return response
+
+        return request
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _record(self, method: str, url: str, kwargs: Dict, start: float,
+                response: Optional[requests.Response] = None,
+                error: Optional[Exception] = None) -> None:
+        elapsed = time.perf_counter() - start
+        path = urlparse(url).path
+        endpoint = (url[len(self.base_url):].split('?', 1)[0]
+                    if self.base_url and url.startswith(self.base_url) else path)
+        record = {
+            'at': round(start - self._started, 6),
+            'elapsed': round(elapsed, 6),
+            'thread': threading.current_thread().name,
+            'method': method.upper(),
+            'path': path,
+            'endpoint': endpoint,
+        }
+        with self._lock:
+            if kwargs.get('params'):
+                record['params'] = self._scrub(kwargs['params'])
+            if kwargs.get('json') is not None:
+                record['json'] = self._scrub(kwargs['json'])
+            if error is not None:
+                record['error'] = type(error).__name__
+                record['message'] = str(error)
+            else:
+                record['status'] = response.status_code
+                record['headers'] = {key: response.headers[key] for key in KEPT_HEADERS
+                                     if key in response.headers}
+                record['bytes'] = len(response.content)
+                try:
+                    record['body'] = self._scrub(json.loads(response.content))
+                except ValueError:
+                    record['text'] = response.content.decode('utf-8', 'replace')
+            self.count += 1
+            record['seq'] = self.count
+            self._write(record)
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def _scrub(self, value, secret: bool = False):
+        """替换凭据（同一个值替换为同一个占位符）"""
+        if isinstance(value, dict):
+            return {key: self._scrub(item, secret or str(key).lower() in SECRET_KEYS)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._scrub(item, secret) for item in value]
+        if secret and isinstance(value, str) and value:
+            if value not in self._placeholders:
+                self._placeholders[value] = f'<secret-{len(self._placeholders) + 1}>'
+            return self._placeholders[value]
+        return value
+
+
+class Replayer:
+    """按录制文件返回响应（线程安全）"""
+
+    def __init__(self, path: str, latency='original'):
+        """
+        Args:
+            path: 录制文件路径
+            latency: original（原始耗时）、zero（不等待）或耗时的缩放比例
+
+        Raises:
+            ValueError: 文件格式或 latency 无效
+        """
+        self.path = path
+        self.scale = parse_latency(latency)
+        self.served = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._queues: Dict[Tuple, Deque[Dict]] = {}
+        self._last: Dict[Tuple, Dict] = {}
+        for record in load(path):
+            key = _key(record['method'], record['path'], record.get('params'), record.get('json'))
+            self._queues.setdefault(key, deque()).append(record)
+
+    def request(self, method, url, params=None, json=None, timeout=None, **kwargs):
+        """传输函数（签名与 requests.request 相同）"""
+        key = _key(method.upper(), urlparse(url).path, params, json)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                record = self._last[key] = queue.popleft()
+            else:
+                record = self._last.get(key)
+            if record is None:
+                self.misses += 1
+            else:
+                self.served += 1
+        if record is None:
+            raise ReplayMiss(f"录制文件中没有该请求: {method.upper()} {urlparse(url).path} "
+                             f"{_canonical(params or {})}")
+        if self.scale:
+            time.sleep(record['elapsed'] * self.scale)
+        if 'error' in record:
+            error = getattr(requests.exceptions, record['error'], None)
+            if not (isinstance(error, type) and issubclass(error, requests.exceptions.RequestException)):
+                error = requests.exceptions.ConnectionError
+            raise error(record.get('message', ''))
+        if 'body' in record:
+            body = _json_bytes(record['body'])
+        else:
+            body = record.get('text', '').encode('utf-8')
+        return make_response(url, record['status'], record.get('headers', {}), body)
+
+
+def parse_latency(text) -> float:
+    """回放延迟：original -> 1、zero -> 0、数字为缩放比例"""
+    if text in (None, '', 'original'):
+        return 1.0
+    if text == 'zero':
+        return 0.0
+    try:
+        scale = float(text)
+    except (TypeError, ValueError):
+        scale = -1.0
+    if scale < 0:
+        raise ValueError(f"无效的回放延迟: {text}（可选 original、zero 或缩放比例）")
+    return scale
+
+
+def load(path: str) -> List[Dict]:
+    """
+    读取录制文件中的请求记录（按录制顺序）
+
+    Raises:
+        ValueError: 不是录制文件
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline() or '{}')
+        except ValueError:
+            header = {}
+        if not isinstance(header, dict) or header.get('recording') != FORMAT_VERSION:
+            raise ValueError(f"不是录制文件（或版本不支持）: {path}")
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records: List[Dict]) -> RequestMetrics:
+    """把录制的请求汇总为请求统计（总耗时为录制的时间跨度）"""
+    metrics = RequestMetrics()
+    for record in records:
+        metrics.record(record['endpoint'], record['elapsed'], record.get('bytes', 0),
+                       error='error' in record or record.get('status', 0) >= 400)
+    span = max((record['at'] + record['elapsed'] for record in records), default=0.0)
+    metrics.started = time.monotonic() - span
+    return metrics
+
+
+def _key(method: str, path: str, params: Optional[Dict], body) -> Tuple:
+    return (method, path.rstrip('/'), _canonical(params or {}), _canonical(body))
+
+
+def _canonical(value) -> str:
+    """匹配用的规范形式（去掉凭据和时间戳）"""
+    def strip(item):
+        if isinstance(item, dict):
+            return {str(key): strip(v) for key, v in item.items()
+                    if str(key).lower() not in SECRET_KEYS and key not in VOLATILE_KEYS}
+        if isinstance(item, (list, tuple)):
+            return [strip(v) for v in item]
+        # 参数经过 URL 编码后不区分数字和字符串
+        return item if item is None or isinstance(item, bool) else str(item)
+    return json.dumps(strip(value), sort_keys=True, ensure_ascii=False)
+
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+# 同一进程中多个客户端共用同一个录制 / 回放文件
+_shared: Dict[Tuple, object] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_recorder(path: str, base_url: Optional[str] = None) -> Recorder:
+    """路径对应的录制器（进程内共用，避免互相覆盖文件）"""
+    with _shared_lock:
+        key = ('record', path)
+        if key not in _shared:
+            _shared[key] = Recorder(path, base_url)
+        return _shared[key]
+
+
+def shared_replayer(path: str, latency='original') -> Replayer:
+    """路径对应的回放器（进程内共用，按顺序消费录制的响应）"""
+    with _shared_lock:
+        key = ('replay', path, latency)
+        if key not in _shared:
+            _shared[key] = Replayer(path, latency)
+        return _shared[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看请求录制文件')
+    parser.add_argument('file', help='录制文件（QUARK_RECORD 写出的 NDJSON）')
+    parser.add_argument('--json', action='store_true', help='输出 JSON 统计')
+    args = parser.parse_args()
+
+    try:
+        records = load(args.file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    metrics = summarize(records)
+    if args.json:
+        print(json.dumps(metrics.snapshot(), ensure_ascii=False, indent=2))
+    else:
+        print('\n'.join(metrics.format_lines()))
+
+
+if __name__ == '__main__':
+    main()
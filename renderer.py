@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+终端输出 - 带缓冲、可分页的逐行输出
+
+逐行 print 在几十万行时终端 I/O 会成为主要开销。LineWriter 先把行攒在内存里，
+够一批（或距上次输出超过一定时间）才一次性写出；设置每页行数时，每满一页暂停，
+等待用户按回车继续或输入 q 停止。
+"""
+
+import sys
+import time
+import shutil
+from typing import Callable, Iterable, List, Optional, TextIO
+
+
+# 攒够多少行写出一次
+FLUSH_LINES = 512
+
+# 边遍历边显示时，距上次写出超过该时间（秒）也写出，避免长时间无输出
+FLUSH_INTERVAL = 0.2
+
+
+def terminal_page_size(stream: Optional[TextIO] = None) -> int:
+    """
+    终端可显示的行数（留出提示行），输出不是终端时返回 0（不分页）
+
+    Args:
+        stream: 输出流（默认 sys.stdout）
+    """
+    stream = stream or sys.stdout
+    if not (hasattr(stream, 'isatty') and stream.isatty() and sys.stdin.isatty()):
+        return 0
+    try:
+        return max(shutil.get_terminal_size().lines - 2, 5)
+    except (OSError, ValueError):
+        return 0
+
+
+class LineWriter:
+    """带缓冲、可分页的逐行输出"""
+
+    def __init__(self, stream: Optional[TextIO] = None, page_size: int = 0,
+                 flush_lines: int = FLUSH_LINES,
+                 prompt: Callable[[str], str] = input):
+        """
+        Args:
+            stream: 输出流（默认 sys.stdout）
+            page_size: 每页行数（0 表示不分页）
+            flush_lines: 攒够多少行写出一次
+            prompt: 分页时读取用户输入的函数
+        """
+        self.stream = stream or sys.stdout
+        self.page_size = page_size
+        self.flush_lines = flush_lines
+        self.prompt = prompt
+        self.stopped = False
+        self.lines_written = 0
+        self._buffer: List[str] = []
+        self._page_lines = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, line: str) -> bool:
+        """
+        写入一行
+
+        Returns:
+            bool: 用户在分页提示时选择停止后返回 False，调用方应停止输出
+        """
+        if self.stopped:
+            return False
+        self._buffer.append(line)
+        self.lines_written += 1
+
+        if self.page_size:
+            self._page_lines += 1
+            if self._page_lines >= self.page_size:
+                self._page_lines = 0
+                self.flush()
+                return self._next_page()
+
+        if (len(self._buffer) >= self.flush_lines
+                or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+            self.flush()
+        return True
+
+    def write_lines(self, lines: Iterable[str]) -> bool:
+        """写入多行（逐行消费，可以是生成器），用户停止时返回 False"""
+        for line in lines:
+            if not self.write(line):
+                return False
+        return True
+
+    def flush(self) -> None:
+        """写出缓冲中的行"""
+        if self._buffer:
+            self._buffer.append('')
+            self.stream.write('\n'.join(self._buffer))
+            self._buffer = []
+        self.stream.flush()
+        self._last_flush = time.monotonic()
+
+    def _next_page(self) -> bool:
+        try:
+            answer = self.prompt("-- 回车显示更多，q 停止显示 --").strip().lower()
+        except EOFError:
+            # 没有交互输入：不再分页
+            self.page_size = 0
+            return True
+        if answer in ('q', 'quit', 'n'):
+            self.stopped = True
+            return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
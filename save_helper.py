@@ -5,21 +5,28 @@
 提供交互式界面来选择文件并转存到夸克网盘
 
 使用方式：
-    python save_helper.py <share_url> [--password <pwd>]
+    python save_helper.py <share_url> [--password <pwd>] [--full] [--no-prefetch]
+    python save_helper.py <share_url> --auto [--select <规则>]
+    python save_helper.py <share_url> --profile save.prof   # 或设置环境变量 QUARK_PROFILE
+    python save_helper.py <share_url> --auto --progress     # stderr 输出 JSON 进度事件
 """
 
 import os
 import sys
 import json
 import argparse
-import readline
 from pathlib import Path
 
 # 添加当前目录到路径（支持作为 skill 被引用）
 current_dir = Path(__file__).parent.resolve()
 sys.path.insert(0, str(current_dir))
 
-from quark_client import QuarkClient, display_files, display_file_tree_view, format_size, parse_file_selection
+# quark_client（requests）、profiling（cProfile）和 readline 较重，用到时再导入：
+# --help 和参数错误不需要加载它们
+from lazy_tree import LazyShareTree
+from prefetch import Prefetcher
+from progress import ndjson_writer
+from renderer import LineWriter, terminal_page_size
 
 
 def get_cookies_path() -> str:
@@ -32,10 +39,12 @@ def get_cookies_path() -> str:
     return "~/.config/quark/cookies.txt"
 
 
-def create_client() -> QuarkClient:
+def create_client(on_progress=None) -> 'QuarkClient':
     """创建 QuarkClient 实例并验证 Cookie"""
+    from quark_client import QuarkClient
+    
     cookies_path = get_cookies_path()
-    client = QuarkClient(cookies_path)
+    client = QuarkClient(cookies_path, on_progress=on_progress)
     
     if not client.login():
         print("❌ Cookie 失效或未登录")
@@ -45,6 +54,30 @@ def create_client() -> QuarkClient:
     return client
 
 
+def ask(prompt: str, prefetcher: Prefetcher = None) -> str:
+    """读取用户输入；等待期间允许后台预取"""
+    if prefetcher is None:
+        return input(prompt)
+    with prefetcher.idle():
+        return input(prompt)
+
+
+def find_dir(dirs: list, path: str):
+    """
+    在 get_user_dirs 返回的目录列表中按路径查找目录 ID
+    
+    Returns:
+        str: 目录 ID，不存在返回 None
+    """
+    path = '/' + '/'.join(p for p in path.split('/') if p)
+    if path == '/':
+        return '0'
+    for d in dirs:
+        if d['path'] == path:
+            return d['fid']
+    return None
+
+
 def get_file_selection(files: list, index_map: list) -> list:
     """
     获取用户文件选择
@@ -56,6 +89,8 @@ def get_file_selection(files: list, index_map: list) -> list:
     Returns:
         list: 选中的文件列表
     """
+    from quark_client import format_size, parse_file_selection
+    
     print("\n" + "="*60)
     print("📝 请选择要转存的文件")
     print("="*60)
@@ -67,6 +102,8 @@ def get_file_selection(files: list, index_map: list) -> list:
     print("  video            - 选择所有视频文件")
     print("  zip              - 选择所有压缩包")
     print("  mkv,pdf,mp4      - 选择指定扩展名的文件")
+    print("  video and >1G    - 组合条件（and/or/not、size:、re:、path: 等）")
+    print("  search:关键词    - 模糊搜索文件名（按相似度排序）")
     print()
     
     while True:
@@ -85,10 +122,16 @@ def get_file_selection(files: list, index_map: list) -> list:
                 print("  video            - 选择所有视频文件")
                 print("  zip              - 选择所有压缩包")
                 print("  mkv,pdf,mp4      - 选择指定扩展名的文件")
+                print("  video and >1G    - 组合条件（and/or/not、size:、re:、path: 等）")
+                print("  search:关键词    - 模糊搜索文件名（按相似度排序）")
                 continue
             
             # 解析选择
-            selected = parse_file_selection(selection, files)
+            try:
+                selected = parse_file_selection(selection, files)
+            except ValueError as e:
+                print(f"⚠️  {e}")
+                continue
             
             if not selected:
                 print("⚠️  没有匹配的文件，请重新输入")
@@ -99,7 +142,7 @@ def get_file_selection(files: list, index_map: list) -> list:
             for i, f in enumerate(selected, 1):
                 size_str = format_size(f['size']) if f['size'] > 0 else '-'
                 ftype = '📁' if not f['is_file'] else '📄'
-                print(f"  {i}. {ftype} {f['name']} ({size_str})")
+                print(f"  {i}. {ftype} {f.get('file_name') or f.get('name')} ({size_str})")
             
             confirm = input("\n确认选择吗？(y/n): ").strip().lower()
             if confirm in ['y', 'yes', '是']:
@@ -110,12 +153,108 @@ def get_file_selection(files: list, index_map: list) -> list:
             sys.exit(0)
 
 
-def get_target_dir(client: QuarkClient) -> tuple:
+def browse_share(tree: LazyShareTree, prefetcher: Prefetcher = None) -> list:
+    """
+    交互浏览分享：先显示根目录，进入子目录时才请求其内容
+    
+    Args:
+        tree: 按需展开的分享目录树
+        prefetcher: 后台预取（等待输入时预先展开子目录）
+        
+    Returns:
+        list: 选中的文件 / 文件夹列表
+    """
+    from quark_client import display_file_tree_view, format_size, parse_file_selection
+    
+    current = '0'
+    show = True
+    
+    print("\n浏览命令：")
+    print("  cd 序号/名称     - 进入子目录（cd .. 返回上级，cd / 回到根目录）")
+    print("  ls               - 重新显示当前目录")
+    print("  find 规则        - 在当前目录及子目录中按规则选择文件（如 find video）")
+    print("  其他输入         - 在当前目录中选择（序号、all、*.mkv 等，选中文件夹会整体转存）")
+    
+    while True:
+        try:
+            items = tree.children(current)
+            if show:
+                print(f"\n📂 {tree.path(current)}")
+                display_file_tree_view(items, [], writer=LineWriter(page_size=terminal_page_size()))
+                show = False
+            
+            command = ask(f"[{tree.path(current)}] 请输入命令或选择: ", prefetcher).strip()
+            if not command:
+                continue
+            
+            name, _, arg = command.partition(' ')
+            arg = arg.strip()
+            
+            if command.lower() == 'help':
+                print("  cd / ls / find 规则 / 序号、all、*.mkv 等选择")
+                continue
+            
+            if name.lower() == 'ls':
+                show = True
+                continue
+            
+            if name.lower() == 'cd':
+                target = None
+                if arg.isdigit():
+                    index = int(arg)
+                    if 1 <= index <= len(items) and not items[index - 1]['is_file']:
+                        target = items[index - 1]['fid']
+                elif arg:
+                    target = tree.resolve(current, arg)
+                else:
+                    target = '0'
+                if target is None:
+                    print(f"⚠️  {arg} 不是目录" if arg.isdigit() else f"⚠️  目录不存在: {arg}")
+                    continue
+                current = target
+                if prefetcher is not None:
+                    prefetcher.set_focus(current)
+                show = True
+                continue
+            
+            if name.lower() == 'find':
+                if not arg:
+                    print("⚠️  请输入规则，如 find video")
+                    continue
+                print("🔍 正在展开子目录...")
+                selected = tree.find(current, arg)
+            else:
+                selected = parse_file_selection(command, items)
+            
+            if not selected:
+                print("⚠️  没有匹配的文件，请重新输入")
+                continue
+            
+            # 显示选中的文件
+            print(f"\n✅ 选中 {len(selected)} 项：")
+            for i, f in enumerate(selected, 1):
+                size_str = format_size(f['size']) if f['size'] > 0 else '-'
+                ftype = '📁' if not f['is_file'] else '📄'
+                print(f"  {i}. {ftype} {f['file_name']} ({size_str})")
+            
+            confirm = ask("\n确认选择吗？(y/n): ", prefetcher).strip().lower()
+            if confirm in ['y', 'yes', '是']:
+                return selected
+        
+        except ValueError as e:
+            print(f"⚠️  {e}")
+        except (KeyboardInterrupt, EOFError):
+            print("\n❌ 操作已取消")
+            sys.exit(0)
+
+
+def get_target_dir(client: 'QuarkClient', prefetcher: Prefetcher = None) -> tuple:
     """
     获取目标目录
     
     Args:
         client: QuarkClient 实例
+        prefetcher: 后台预取（已预取用户目录时不再请求）
         
     Returns:
         tuple: (目录路径, 目录ID)
@@ -126,7 +265,9 @@ def get_target_dir(client: QuarkClient) -> tuple:
     
     while True:
         try:
-            dirs = client.get_user_dirs()
+            dirs = prefetcher.user_dirs() if prefetcher is not None else None
+            if dirs is None:
+                dirs = client.get_user_dirs()
             
             # 显示目录树
             print("\n📁 我的目录：")
@@ -143,7 +284,7 @@ def get_target_dir(client: QuarkClient) -> tuple:
             print("  home            - 使用根目录 (/)")
             print()
             
-            path_input = input("请输入目标路径 (或按回车输入 'help'): ").strip()
+            path_input = ask("请输入目标路径 (或按回车输入 'help'): ", prefetcher).strip()
             
             if not path_input:
                 continue
@@ -163,12 +304,12 @@ def get_target_dir(client: QuarkClient) -> tuple:
                 print("  /              - 根目录")
                 print("  /路径/目录     - 指定目录")
                 print("  (留空)         - 根目录")
-                parent_path = input("父目录路径: ").strip()
+                parent_path = ask("父目录路径: ", prefetcher).strip()
                 
                 if not parent_path:
                     parent_fid = '0'
                 else:
-                    parent_fid = client.get_dir_by_path(parent_path)
+                    parent_fid = find_dir(dirs, parent_path)
                     if parent_fid is None:
                         print(f"❌ 父目录不存在: {parent_path}")
                         continue
@@ -187,10 +328,10 @@ def get_target_dir(client: QuarkClient) -> tuple:
                 return ('/', '0')
             
             # 检查目录是否存在
-            dir_id = client.get_dir_by_path(path_input)
+            dir_id = find_dir(dirs, path_input)
             if dir_id is None:
                 print(f"❌ 目录不存在: {path_input}")
-                create = input("是否创建该目录？(y/n): ").strip().lower()
+                create = ask("是否创建该目录？(y/n): ", prefetcher).strip().lower()
                 if create in ['y', 'yes', '是']:
                     # 递归创建目录
                     parts = [p for p in path_input.split('/') if p]
@@ -199,7 +340,7 @@ def get_target_dir(client: QuarkClient) -> tuple:
                     
                     for part in parts:
                         current_path = f"{current_path}/{part}" if current_path else f"/{part}"
-                        existing_id = client.get_dir_by_path(current_path)
+                        existing_id = find_dir(dirs, current_path)
                         if existing_id:
                             current_fid = existing_id
                         else:
@@ -217,8 +358,90 @@ def get_target_dir(client: QuarkClient) -> tuple:
             sys.exit(0)
 
 
+def auto_save(client: 'QuarkClient', args, pwd_id: str, stoken: str) -> None:
+    """
+    自动模式：流式遍历分享，匹配规则的文件凑满一批即转存到根目录
+    
+    Args:
+        client: QuarkClient 实例
+        args: 命令行参数
+        pwd_id: 分享链接 ID
+        stoken: 访问令牌
+    """
+    from quark_client import build_selection_filter
+    
+    try:
+        file_filter = build_selection_filter(args.select)
+    except ValueError as e:
+        # 语法错误，或自动模式不支持的 path: / 目录条件
+        print(f"❌ 无效的选择规则: {e}")
+        result = {
+            'action': 'save',
+            'status': 'error',
+            'message': str(e)
+        }
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        sys.exit(1)
+    if file_filter is None:
+        print(f"❌ 自动模式不支持序号选择: {args.select}")
+        sys.exit(1)
+    
+    print(f"\n💡 自动模式：选择 '{args.select}'，边遍历边转存到根目录")
+    print("\n" + "="*60)
+    print("📤 开始转存")
+    print("="*60)
+    
+    def on_batch(batch_no, count, task_id):
+        print(f"✅ 第 {batch_no} 批转存任务已创建: {task_id} ({count} 个文件)")
+    
+    try:
+        summary = client.save_files_streaming(
+            pwd_id, stoken, file_filter, '0',
+            batch_size=args.batch_size, on_batch=on_batch
+        )
+        
+        result = {
+            'action': 'save',
+            'status': 'error' if summary['failed_tasks'] else 'success',
+            'task_ids': summary['task_ids'],
+            'failed_tasks': summary['failed_tasks'],
+            'file_count': summary['file_count'],
+            'target_dir': '/',
+            'target_fid': '0',
+            'partial': summary['partial']
+        }
+        
+    except Exception as e:
+        result = {
+            'action': 'save',
+            'status': 'error',
+            'message': str(e)
+        }
+    
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if result['status'] != 'success':
+        sys.exit(1)
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    if not args.profile:
+        run(args)
+        return
+    from profiling import Profiler
+    profiler = Profiler().start()
+    try:
+        run(args)
+    finally:
+        profiler.stop()
+        report_path = profiler.write(args.profile)
+        print('\n'.join(profiler.format_lines()), file=sys.stderr)
+        print(f"🔬 已写入性能剖析: {args.profile}（报告 {report_path}）", file=sys.stderr)
+
+
+def parse_args():
+    """解析命令行参数"""
     parser = argparse.ArgumentParser(
         description='夸克网盘保存助手 - 交互式转存工具',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -226,18 +449,35 @@ def main():
 使用示例：
   python save_helper.py https://pan.quark.cn/s/xxxxx
   python save_helper.py https://pan.quark.cn/s/xxxxx --password 1234
+  python save_helper.py https://pan.quark.cn/s/xxxxx --auto --select "*.mkv"
+  python save_helper.py https://pan.quark.cn/s/xxxxx --auto --profile save.prof
         '''
     )
     
     parser.add_argument('share_url', help='夸克分享链接')
     parser.add_argument('--password', '-p', help='提取码')
     parser.add_argument('--auto', '-a', action='store_true', 
-                       help='自动模式（不交互，使用默认设置）')
-    
-    args = parser.parse_args()
+                       help='自动模式（不交互，边遍历边转存到根目录）')
+    parser.add_argument('--select', '-s', default='all',
+                       help='自动模式下的选择规则（如 all、*.mkv、video，默认 all）')
+    parser.add_argument('--batch-size', type=int, default=100,
+                       help='自动模式下每批转存的文件数（默认 100）')
+    parser.add_argument('--full', action='store_true',
+                       help='先获取完整文件列表再选择（默认按需浏览目录）')
+    parser.add_argument('--no-prefetch', action='store_true',
+                       help='不在等待输入时后台预取子目录、用户目录')
+    parser.add_argument('--profile', metavar='FILE', default=os.environ.get('QUARK_PROFILE') or None,
+                       help='把 CPU profile 写入 FILE、耗时分布写入 FILE.txt（默认取环境变量 QUARK_PROFILE）')
+    parser.add_argument('--progress', action='store_true', default=bool(os.environ.get('QUARK_PROGRESS')),
+                       help='在 stderr 逐行输出 JSON 进度事件（也可设置环境变量 QUARK_PROGRESS=1）')
     
+    return parser.parse_args()
+
+
+def run(args):
+    """按参数执行转存流程"""
     # 创建客户端
-    client = create_client()
+    client = create_client(ndjson_writer() if args.progress else None)
     
     # 解析分享链接
     try:
@@ -258,31 +498,52 @@ def main():
         print(f"❌ 获取 stoken 失败: {e}")
         sys.exit(1)
     
-    # 获取所有文件
-    print("\n📂 正在获取文件列表...")
-    try:
-        files = client.get_all_files_recursive(pwd_id, stoken)
-        print(f"✅ 获取到 {len(files)} 个文件/文件夹")
-    except Exception as e:
-        print(f"❌ 获取文件列表失败: {e}")
-        sys.exit(1)
+    # 自动模式：不等待完整列表，边遍历边转存
+    if args.auto:
+        auto_save(client, args, pwd_id, stoken)
+        return
     
-    # 显示文件树
-    display_file_tree_view(files, [])
+    # 交互输入时支持行编辑
+    import readline
+    from quark_client import display_file_tree_view
     
-    # 自动模式
-    if args.auto:
-        print("\n💡 自动模式：选择所有文件，保存到根目录")
-        selected = files
-        target_path = '/'
-        target_fid = '0'
-    else:
+    prefetcher = None
+    if args.full:
+        # 获取所有文件
+        print("\n📂 正在获取文件列表...")
+        try:
+            # 交互选择支持 search: 模糊搜索，索引在遍历时一并构建
+            files = client.get_all_files_table(pwd_id, stoken, index_names=True)
+            print(f"✅ 获取到 {len(files)} 个文件/文件夹")
+        except Exception as e:
+            print(f"❌ 获取文件列表失败: {e}")
+            sys.exit(1)
+        
+        # 显示文件树
+        # 文件很多时每满一屏暂停
+        display_file_tree_view(files, [], writer=LineWriter(page_size=terminal_page_size()))
+        
         # 获取文件选择
         index_map = [str(i) for i in range(1, len(files) + 1)]
         selected = get_file_selection(files, index_map)
-        
-        # 获取目标目录
-        target_path, target_fid = get_target_dir(client)
+    else:
+        # 按需浏览：先显示根目录，进入子目录时才请求
+        tree = LazyShareTree(client, pwd_id, stoken)
+        if not args.no_prefetch:
+            prefetcher = Prefetcher(client, tree, password).start()
+        try:
+            selected = browse_share(tree, prefetcher)
+        except Exception as e:
+            print(f"❌ 获取文件列表失败: {e}")
+            sys.exit(1)
+    
+    # 获取目标目录
+    target_path, target_fid = get_target_dir(client, prefetcher)
+    
+    if prefetcher is not None:
+        # 转存前停止预取；stoken 可能已在后台刷新过
+        prefetcher.stop()
+        stoken = tree.stoken
     
     # 转存文件
     print("\n" + "="*60)
@@ -294,7 +555,7 @@ def main():
     
     # 构建文件ID列表
     fid_list = [f['fid'] for f in selected]
-    share_fid_tokens = [''] * len(fid_list)
+    share_fid_tokens = [f.get('share_fid_token', '') for f in selected]
     
     try:
         # 执行转存
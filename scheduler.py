@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+请求调度 - 按优先级分配共享的请求线程和速率配额
+
+同一个 QuarkClient 上可能同时有用户正在等待的请求（浏览目录、转存）、任务轮询，
+以及后台预取、流式遍历等大量请求。所有 HTTP 请求都交给 RequestScheduler 执行：
+
+    FOREGROUND  用户正在等待的请求（默认）
+    POLLING     转存任务状态轮询
+    BACKGROUND  后台预取、流式转存中的遍历
+
+请求按优先级排队，由固定数量的工作线程执行。默认不限速；设置 QUARK_RATE_LIMIT
+（或传入 rate）后整体不超过每秒请求数上限，工作线程内嵌套发起的请求同样计入。
+每次发出请求前（拿到速率配额之后）才从队列中挑选任务，因此后到的前台请求会排在
+所有等待中的后台请求之前；另外保留 RESERVED_WORKERS 个线程不执行后台请求，
+后台请求再多也不会占满所有线程。
+
+请求的优先级由调用线程决定：
+
+    with priority(BACKGROUND):
+        client.get_file_list(...)    # 该线程内的请求都按后台优先级排队
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import tracing
+
+
+FOREGROUND = 0
+POLLING = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {FOREGROUND: 'foreground', POLLING: 'polling', BACKGROUND: 'background'}
+
+# 工作线程数
+DEFAULT_WORKERS = 4
+
+# 每秒最多发出的请求数（0 表示不限），可用环境变量 QUARK_RATE_LIMIT 开启限速
+DEFAULT_RATE = 0.0
+
+# 不执行后台请求的线程数
+RESERVED_WORKERS = 1
+
+_local = threading.local()
+
+
+@contextmanager
+def priority(level: int):
+    """当前线程内发起的请求使用优先级 level"""
+    previous = getattr(_local, 'priority', None)
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority(default: int = FOREGROUND) -> int:
+    """当前线程的请求优先级"""
+    level = getattr(_local, 'priority', None)
+    return default if level is None else level
+
+
+class RateLimiter:
+    """令牌桶：平均每秒 rate 个请求，最多连续 burst 个"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """取得一个配额（不足时等待）"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+    def release(self) -> None:
+        """归还未使用的配额"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class RequestScheduler:
+    """按优先级执行请求的工作线程池"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, rate: Optional[float] = None,
+                 reserved: int = RESERVED_WORKERS):
+        """
+        Args:
+            workers: 工作线程数
+            rate: 每秒最多请求数（0 表示不限；默认取 QUARK_RATE_LIMIT，否则 DEFAULT_RATE）
+            reserved: 不执行后台请求的线程数
+        """
+        if rate is None:
+            rate = float(os.environ.get('QUARK_RATE_LIMIT') or DEFAULT_RATE)
+        self.workers = max(workers, 1)
+        self.background_limit = max(self.workers - reserved, 1)
+        self.limiter = RateLimiter(rate)
+        # 每个优先级完成的请求数
+        self.completed = {level: 0 for level in PRIORITY_NAMES}
+
+        self._queues = {level: deque() for level in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._background_active = 0
+        self._threads = []
+        self._closed = False
+
+    def submit(self, fn: Callable, level: Optional[int] = None) -> Future:
+        """
+        提交请求
+
+        Args:
+            fn: 发起请求的函数（无参数）
+            level: 优先级（默认取当前线程的优先级）
+
+        Returns:
+            Future: 请求结果
+        """
+        level = current_priority() if level is None else level
+        # 在工作线程中执行时沿用提交时的追踪上下文
+        fn = tracing.bind(fn)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("请求调度器已关闭")
+            if len(self._threads) < self.workers:
+                self._start_worker()
+            self._queues[level].append((fn, future))
+            self._cond.notify()
+        return future
+
+    def call(self, fn: Callable, level: Optional[int] = None):
+        """提交请求并等待结果（请求抛出的异常原样抛出）"""
+        if getattr(_local, 'worker', False):
+            # 工作线程内嵌套的请求直接执行，避免等待自己（仍然占用速率配额）
+            self.limiter.acquire()
+            return fn()
+        return self.submit(fn, level).result()
+
+    def pending(self) -> int:
+        """排队中的请求数"""
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def shutdown(self, wait: bool = True) -> None:
+        """不再接受新请求；排队中的请求仍会执行完"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(target=self._work, name=f'quark-request-{len(self._threads) + 1}',
+                                  daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _runnable(self) -> Optional[int]:
+        """可以执行的最高优先级（调用时需持有锁）"""
+        for level, queue in self._queues.items():
+            # 已取消的请求直接丢弃，不占用速率配额
+            while queue and queue[0][1].cancelled():
+                queue.popleft()
+            if queue and (level != BACKGROUND or self._background_active < self.background_limit):
+                return level
+        return None
+
+    def _work(self) -> None:
+        _local.worker = True
+        while True:
+            with self._cond:
+                while self._runnable() is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+
+            # 先取得配额再挑选任务：等待配额期间到达的前台请求优先
+            self.limiter.acquire()
+            with self._cond:
+                level = self._runnable()
+                if level is None:
+                    self.limiter.release()
+                    continue
+                fn, future = self._queues[level].popleft()
+                if level == BACKGROUND:
+                    self._background_active += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self.completed[level] += 1
+                    if level == BACKGROUND:
+                        self._background_active -= 1
+                        self._cond.notify_all()
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+文件选择查询 - 把选择字符串编译成查询计划，对整个文件列表一次性求值
+
+语法（大小写不敏感，空格分隔的条件默认为 and）：
+
+    all                     所有文件
+    *.mkv / name:第*集*      通配符（匹配完整文件名）
+    re:S0[12]E\\d+           正则（在文件名中搜索）
+    mkv / mkv,mp4 / ext:mkv 扩展名
+    video / zip / 压缩包     文件类型（与 type:video 相同）
+    >1G / size:<500M        大小比较（支持 > >= < <= =）
+    size:1G-4G              大小范围（闭区间）
+    cat:video               obj_category
+    search:权力的游戏        模糊搜索，按相似度排序（未加引号时其后全部内容都是搜索词）
+    path:"/Season 2/4K"     目录（含子目录）下的文件，也可以直接写 "/Season 2/4K"
+                            （需要目录信息，FileTable / CrawlStore 自带路径索引）
+    movie.mkv               完整文件名
+    and / or / not / ( )    组合条件
+
+例如：`video and >1G and not re:sample`、`path:/S2 (*.mkv or *.mp4)`。
+
+编译结果带缓存，同一个选择字符串只解析一次。求值时每个条件只扫描一列，
+结果以逐字节的 0/1 掩码表示，and/or/not 通过大整数位运算一次完成。
+"""
+
+import re
+import fnmatch
+from functools import lru_cache
+from itertools import compress
+from operator import methodcaller
+from typing import Callable, Dict, List, Optional, Sequence
+
+from name_search import NameIndex, match_score
+
+
+# 视频 / 压缩包扩展名
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv',
+                    '.m4v', '.mpg', '.mpeg', '.webm', '.ts', '.vob'}
+ARCHIVE_EXTENSIONS = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2',
+                      '.tgz', '.xz', '.lzma'}
+
+# 文件类型关键字
+TYPE_GROUPS = {
+    'video': VIDEO_EXTENSIONS,
+    'videos': VIDEO_EXTENSIONS,
+    '电影': VIDEO_EXTENSIONS,
+    '影视': VIDEO_EXTENSIONS,
+    'zip': ARCHIVE_EXTENSIONS,
+    'rar': ARCHIVE_EXTENSIONS,
+    '7z': ARCHIVE_EXTENSIONS,
+    'archive': ARCHIVE_EXTENSIONS,
+    '压缩包': ARCHIVE_EXTENSIONS,
+    '压缩文件': ARCHIVE_EXTENSIONS,
+}
+
+_SIZE_UNITS = {'': 0, 'K': 1, 'M': 2, 'G': 3, 'T': 4, 'P': 5}
+
+
+def parse_size(text: str) -> int:
+    """
+    解析可读的大小字符串（1024 进制）
+
+    Args:
+        text: 例如 "1024"、"512K"、"64MB"、"1.5G"
+
+    Returns:
+        int: 字节数
+
+    Raises:
+        ValueError: 格式错误
+    """
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)I?B?\s*$', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无效的大小: {text}")
+    return int(float(match.group(1)) * 1024 ** _SIZE_UNITS[match.group(2).upper()])
+
+
+class _Columns:
+    """求值上下文：按需从 FileTable / CrawlStore 或字典列表中取出列，每列只取一次"""
+
+    def __init__(self, files: Sequence, folder_path: Optional[Callable[[str], str]] = None):
+        self.files = files
+        self.n = len(files)
+        # FileTable / CrawlStore 按列读取
+        self.columnar = hasattr(files, 'column')
+        self.folder_path = folder_path or getattr(files, 'folder_path', None)
+        # 路径索引（FileTable / CrawlStore 在遍历时构建，见 path_index）
+        self.paths = None if folder_path else getattr(files, 'paths', None)
+        # search: 条件的得分（行号 -> 得分），用于结果排序
+        self.scores: Dict[int, float] = {}
+        self._cache = {}
+
+    def column(self, name: str) -> Sequence:
+        if name not in self._cache:
+            self._cache[name] = self._load(name)
+        return self._cache[name]
+
+    def _load(self, name: str) -> Sequence:
+        files = self.files
+        if name == 'lower_name':
+            return list(map(str.lower, self.column('name')))
+        if self.columnar:
+            return files.column(name)
+        if name == 'name':
+            return [f.get('name') or f.get('file_name') or '' for f in files]
+        if name == 'size':
+            return [f.get('size') or 0 for f in files]
+        if name == 'category':
+            return [f.get('obj_category') for f in files]
+        if name == 'pdir':
+            return [f.get('pdir_fid') for f in files]
+        raise KeyError(name)
+
+    def ones(self) -> int:
+        return int.from_bytes(b'\x01' * self.n, 'little')
+
+
+def _to_int(mask) -> int:
+    return int.from_bytes(mask, 'little')
+
+
+class _Node:
+    """查询计划节点"""
+
+    uses_paths = False
+
+    def mask(self, ctx: _Columns) -> int:
+        """对整列求值，返回逐字节 0/1 掩码（以大整数表示）"""
+        raise NotImplementedError
+
+    def match(self, record: Dict, folder_path=None) -> bool:
+        """对单条记录求值"""
+        raise NotImplementedError
+
+
+class _All(_Node):
+    def mask(self, ctx):
+        return ctx.ones()
+
+    def match(self, record, folder_path=None):
+        return True
+
+
+class _Name(_Node):
+    """文件名条件（通配符、正则、扩展名、完整文件名都编译为正则，用 search 匹配）"""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        try:
+            self.regex = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        except re.error:
+            raise ValueError(f"无效的正则表达式: {pattern}") from None
+
+    def mask(self, ctx):
+        return _to_int(bytearray(map(bool, map(self.regex.search, ctx.column('name')))))
+
+    def match(self, record, folder_path=None):
+        return self.regex.search(record.get('name') or record.get('file_name') or '') is not None
+
+
+class _Suffix(_Node):
+    """扩展名条件：小写文件名以任一后缀结尾（比正则快得多）"""
+
+    def __init__(self, suffixes):
+        self.suffixes = tuple(sorted(set(suffixes)))
+
+    def mask(self, ctx):
+        return _to_int(bytearray(map(methodcaller('endswith', self.suffixes),
+                                     ctx.column('lower_name'))))
+
+    def match(self, record, folder_path=None):
+        return (record.get('name') or record.get('file_name') or '').lower().endswith(self.suffixes)
+
+
+class _Search(_Node):
+    """模糊搜索（三元组索引，见 name_search）"""
+
+    def __init__(self, query: str):
+        self.query = query
+
+    def mask(self, ctx):
+        index = getattr(ctx.files, 'name_index', None)
+        if index is None:
+            index = NameIndex(ctx.column('name'))
+        mask = bytearray(ctx.n)
+        for row, score in index.search(self.query):
+            mask[row] = 1
+            ctx.scores[row] = max(score, ctx.scores.get(row, 0.0))
+        return _to_int(mask)
+
+    def match(self, record, folder_path=None):
+        return match_score(self.query, record.get('name') or record.get('file_name') or '') > 0
+
+
+class _Size(_Node):
+    def __init__(self, low: Optional[int], high: Optional[int]):
+        self.low = low
+        self.high = high
+
+    def mask(self, ctx):
+        sizes = ctx.column('size')
+        result = ctx.ones()
+        if self.low is not None:
+            result &= _to_int(bytearray(map(self.low.__le__, sizes)))
+        if self.high is not None:
+            result &= _to_int(bytearray(map(self.high.__ge__, sizes)))
+        return result
+
+    def match(self, record, folder_path=None):
+        size = record.get('size') or 0
+        return ((self.low is None or size >= self.low)
+                and (self.high is None or size <= self.high))
+
+
+class _Category(_Node):
+    def __init__(self, categories: set):
+        self.categories = categories
+
+    def mask(self, ctx):
+        contains = lambda value: (value or '').lower() in self.categories
+        values = ctx.column('category')
+        # 类别重复度很高，先对不同的值求值一次
+        hits = {value for value in set(values) if contains(value)}
+        return _to_int(bytearray(map(hits.__contains__, values)))
+
+    def match(self, record, folder_path=None):
+        return (record.get('obj_category') or '').lower() in self.categories
+
+
+class _PathPrefix(_Node):
+    uses_paths = True
+
+    def __init__(self, prefix: str):
+        self.prefix = '/' + prefix.strip('/').lower() if prefix.strip('/') else '/'
+
+    def _under(self, path: Optional[str]) -> bool:
+        if path is None:
+            return False
+        path = path.lower()
+        return (self.prefix == '/' or path == self.prefix
+                or path.startswith(self.prefix + '/'))
+
+    def _resolver(self, folder_path):
+        if folder_path is None:
+            raise ValueError("path: 选择需要目录信息（请使用 get_all_files_table 的结果）")
+        return folder_path
+
+    def mask(self, ctx):
+        if ctx.paths is not None:
+            # 路径索引：目录下的文件是连续的一段，按区间置位，不扫描文件列表
+            mask = bytearray(ctx.n)
+            for start, end in ctx.paths.subtree_rows(self.prefix):
+                mask[start:end] = b'\x01' * (end - start)
+            return _to_int(mask)
+
+        resolve = self._resolver(ctx.folder_path)
+        pdirs = ctx.column('pdir')
+        # 每个目录只解析一次路径
+        hits = {pdir for pdir in set(pdirs) if self._under(resolve(pdir))}
+        return _to_int(bytearray(map(hits.__contains__, pdirs)))
+
+    def match(self, record, folder_path=None):
+        return self._under(self._resolver(folder_path)(record.get('pdir_fid')))
+
+
+class _Not(_Node):
+    def __init__(self, child: _Node):
+        self.child = child
+        self.uses_paths = child.uses_paths
+
+    def mask(self, ctx):
+        return self.child.mask(ctx) ^ ctx.ones()
+
+    def match(self, record, folder_path=None):
+        return not self.child.match(record, folder_path)
+
+
+class _And(_Node):
+    def __init__(self, children: List[_Node]):
+        self.children = children
+        self.uses_paths = any(c.uses_paths for c in children)
+
+    def mask(self, ctx):
+        result = ctx.ones()
+        for child in self.children:
+            result &= child.mask(ctx)
+            if not result:
+                break
+        return result
+
+    def match(self, record, folder_path=None):
+        return all(c.match(record, folder_path) for c in self.children)
+
+
+class _Or(_Node):
+    def __init__(self, children: List[_Node]):
+        self.children = children
+        self.uses_paths = any(c.uses_paths for c in children)
+
+    def mask(self, ctx):
+        result = 0
+        for child in self.children:
+            result |= child.mask(ctx)
+        return result
+
+    def match(self, record, folder_path=None):
+        return any(c.match(record, folder_path) for c in self.children)
+
+
+def _or(children: List[_Node]) -> _Node:
+    """合并 or 中的文件名条件（正则合并为一个、扩展名合并为一组），一次扫描完成"""
+    names = [c for c in children if isinstance(c, _Name)]
+    suffixes = [c for c in children if isinstance(c, _Suffix)]
+    others = [c for c in children if not isinstance(c, (_Name, _Suffix))]
+    if len(names) > 1:
+        names = [_Name('|'.join(f'(?:{c.pattern})' for c in names))]
+    if len(suffixes) > 1:
+        suffixes = [_Suffix(suffix for c in suffixes for suffix in c.suffixes)]
+    merged = names + suffixes + others
+    return merged[0] if len(merged) == 1 else _Or(merged)
+
+
+def _and(children: List[_Node]) -> _Node:
+    children = [c for c in children if not isinstance(c, _All)] or [_All()]
+    return children[0] if len(children) == 1 else _And(children)
+
+
+def _extensions(extensions) -> _Suffix:
+    """扩展名集合（"mkv" 与 ".mkv" 等价）"""
+    return _Suffix('.' + ext.lstrip('.').lower() for ext in extensions if ext.lstrip('.'))
+
+
+def _glob_pattern(glob: str) -> str:
+    """通配符匹配整个文件名（translate 只锚定结尾，开头另加 ^）"""
+    return '^' + fnmatch.translate(glob)
+
+
+_SIZE_CMP = re.compile(r'^(>=|<=|>|<|=)\s*(.+)$')
+# 单独的比较符（"> 1G"、"size: >= 1G" 中与大小分开的部分）
+_SIZE_OP = re.compile(r'^(?:size:)?(>=|<=|>|<|=)$', re.IGNORECASE)
+_TOKEN = re.compile(r'\s*(\(|\)|(?:[^\s()"\']|"[^"]*"|\'[^\']*\')+)')
+
+
+def _size_atom(expr: str) -> _Node:
+    """解析大小条件：>1G、<=500M、=0、1G-4G"""
+    match = _SIZE_CMP.match(expr)
+    if match:
+        op, value = match.group(1), parse_size(match.group(2))
+        return {
+            '>': _Size(value + 1, None),
+            '>=': _Size(value, None),
+            '<': _Size(None, value - 1),
+            '<=': _Size(None, value),
+            '=': _Size(value, value),
+        }[op]
+    if '-' in expr:
+        low, high = expr.split('-', 1)
+        return _Size(parse_size(low), parse_size(high))
+    raise ValueError(f"无效的大小条件: {expr}")
+
+
+def _atom(token: str) -> _Node:
+    """解析单个条件"""
+    word = re.sub(r'"([^"]*)"|\'([^\']*)\'', lambda m: m.group(1) or m.group(2) or '', token)
+    lower = word.lower()
+    prefix, _, value = word.partition(':')
+    prefix = prefix.lower() if _ else ''
+
+    if lower == 'all':
+        return _All()
+    if prefix == 're':
+        return _Name(value)
+    if prefix == 'name':
+        return _Name(_glob_pattern(value))
+    if prefix == 'ext':
+        return _extensions(value.split(','))
+    if prefix == 'type':
+        if value.lower() not in TYPE_GROUPS:
+            raise ValueError(f"未知的文件类型: {value}")
+        return _extensions(TYPE_GROUPS[value.lower()])
+    if prefix == 'size':
+        return _size_atom(value)
+    if prefix in ('cat', 'category'):
+        return _Category({c.lower() for c in value.split(',') if c})
+    if prefix == 'path':
+        return _PathPrefix(value)
+    if prefix == 'search':
+        return _Search(value)
+    if word.startswith('/'):
+        return _PathPrefix(word)
+    if _SIZE_CMP.match(word):
+        return _size_atom(word)
+    if lower in TYPE_GROUPS:
+        return _extensions(TYPE_GROUPS[lower])
+    if any(ch in word for ch in '*?['):
+        return _Name(_glob_pattern(word))
+    if '.' not in word.strip(',') and re.match(r'^[\w,]+$', word):
+        # 扩展名（如 "mkv" 或 "mkv,pdf,mp4"）
+        return _extensions(word.split(','))
+    # 完整文件名
+    return _Name('^' + re.escape(word) + '$')
+
+
+class _Parser:
+    """递归下降解析：or < and（含隐式 and） < not < 括号/条件"""
+
+    def __init__(self, text: str):
+        self.tokens = _TOKEN.findall(text)
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> _Node:
+        if not self.tokens:
+            raise ValueError("选择条件为空")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"无法解析: {' '.join(self.tokens[self.pos:])}")
+        return node
+
+    def parse_or(self) -> _Node:
+        children = [self.parse_and()]
+        while (self.peek() or '').lower() == 'or':
+            self.take()
+            children.append(self.parse_and())
+        return _or(children)
+
+    def parse_and(self) -> _Node:
+        children = [self.parse_not()]
+        while True:
+            token = (self.peek() or '').lower()
+            if token == 'and':
+                self.take()
+            elif token in ('', 'or', ')'):
+                break
+            children.append(self.parse_not())
+        return _and(children)
+
+    def parse_not(self) -> _Node:
+        token = self.peek()
+        if token is None:
+            raise ValueError("选择条件不完整")
+        if token.lower() == 'not':
+            self.take()
+            return _Not(self.parse_not())
+        if token == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise ValueError("括号不匹配")
+            self.take()
+            return node
+        if token == ')':
+            raise ValueError("括号不匹配")
+        if token.lower() in ('and', 'or'):
+            raise ValueError(f"{token} 前缺少条件")
+        if _SIZE_OP.match(token):
+            # 比较符与大小之间有空格：合并为一个条件
+            self.take()
+            value = self.peek()
+            if value is None or value in ('(', ')') or _SIZE_OP.match(value):
+                raise ValueError(f"大小条件不完整: {token}")
+            return _atom(token + self.take())
+        return _atom(self.take())
+
+
+class SelectionPlan:
+    """编译后的选择条件"""
+
+    def __init__(self, text: str, root: _Node):
+        self.text = text
+        self.root = root
+        self.uses_paths = root.uses_paths
+
+    def _evaluate(self, files: Sequence, folder_path=None):
+        ctx = _Columns(files, folder_path)
+        if not ctx.n:
+            return b'', ctx
+        return self.root.mask(ctx).to_bytes(ctx.n, 'little'), ctx
+
+    def mask(self, files: Sequence, folder_path=None) -> bytes:
+        """对整个列表求值，返回每个文件是否选中（0/1 字节）"""
+        return self._evaluate(files, folder_path)[0]
+
+    @staticmethod
+    def _rows(mask: bytes, ctx: _Columns) -> List[int]:
+        rows = list(compress(range(ctx.n), mask))
+        if ctx.scores:
+            rows.sort(key=lambda row: -ctx.scores.get(row, 0.0))
+        return rows
+
+    def indices(self, files: Sequence, folder_path=None) -> List[int]:
+        """选中的文件下标（从 0 开始）；含 search: 条件时按搜索得分排序"""
+        return self._rows(*self._evaluate(files, folder_path))
+
+    def filter(self, files: Sequence, folder_path=None) -> List[Dict]:
+        """
+        筛选文件列表
+
+        Args:
+            files: 文件列表（字典列表、FileTable 或 CrawlStore）
+            folder_path: 目录 fid → 路径的函数（path: 条件需要；FileTable 自带）
+
+        Returns:
+            List[Dict]: 选中的文件
+        """
+        mask, ctx = self._evaluate(files, folder_path)
+        rows = self._rows(mask, ctx)
+        if hasattr(files, 'row'):
+            return [files.row(i) for i in rows]
+
+        # 字典列表 / CrawlStore 顺序读取一遍，再按得分重排
+        selected = list(compress(files, mask))
+        if not ctx.scores:
+            return selected
+        position = {row: i for i, row in enumerate(compress(range(ctx.n), mask))}
+        return [selected[position[row]] for row in rows]
+
+    def match(self, record: Dict, folder_path=None) -> bool:
+        """判断单个文件是否选中"""
+        return self.root.match(record, folder_path)
+
+
+@lru_cache(maxsize=128)
+def compile_selection(text: str) -> SelectionPlan:
+    """
+    编译选择字符串（结果缓存）
+
+    Args:
+        text: 选择字符串
+
+    Returns:
+        SelectionPlan: 查询计划
+
+    Raises:
+        ValueError: 语法错误
+    """
+    text = text.strip()
+    if text[:7].lower() == 'search:' and not any(q in text for q in '"\''):
+        # 未加引号时 search: 之后的全部内容都是搜索词（可以包含空格）
+        return SelectionPlan(text, _Search(text[7:]))
+    return SelectionPlan(text, _Parser(text).parse())
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+合成分享目录树 - 规模测试用的确定性数据
+
+ShareGenerator 不在内存中保存目录树：每个目录的内容只由 (seed, 目录 fid) 决定，
+需要时现场生成。任意目录的任意一页都可以直接算出，遍历几百万个条目也只占用常数内存，
+相同参数每次生成的结果完全相同（不依赖 PYTHONHASHSEED）。
+
+fid 中编码了生成子条目所需的信息（32 位十六进制，与线上格式相同）：
+
+    02 d 3 1a 9f0c...      深度(2) 类型(1: d 文件夹 / f 文件) 题材(1) 标题序号(2) 哈希(26)
+
+生成的条目与 sharepage/detail 返回的 data.list 中的条目格式相同（fid、file_name、
+pdir_fid、dir、file_type、size、obj_category、include_items、updated_at、created_at、
+share_fid_token），可以直接交给 QuarkClient.convert_share_file；
+DriveGenerator 生成 /file/sort 格式的网盘目录（get_user_dirs 使用）。
+
+同一目录中文件夹排在文件之前。文件名混合中英文、多种扩展名；
+少量目录（huge_ratio）包含 huge_files 个文件，用于测试超大单目录。
+
+使用方式：
+    python share_generator.py --depth 4 --fanout 8 --files 40 --count
+    python share_generator.py --depth 3 --format tree --output share.json   # mock_server --tree
+    python share_generator.py --format ndjson | head                        # 每行一个条目
+
+在代码中：
+
+    gen = ShareGenerator(seed=1, depth=5, fanout=10, files=100)
+    for item in gen.walk():        # 深度优先，文件夹先于其内容
+        ...
+    MockConfig(generator=gen)      # 模拟服务器直接按需生成，不占内存
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+# 题材：(名称, 文件名模板, 扩展名及权重, obj_category)；模板都含 {n}，同一目录下的文件名不重复
+_KINDS = [
+    ('剧集', '{title}.S{season:02d}E{n:02d}.{quality}', [('mkv', 6), ('mp4', 3), ('srt', 2), ('nfo', 1)], 'video'),
+    ('电影', '{title}.{year}.{quality}.CD{n}', [('mkv', 5), ('mp4', 3), ('ass', 2), ('jpg', 1)], 'video'),
+    ('动漫', '[字幕组] {title} - {n:02d} [{quality}]', [('mp4', 5), ('mkv', 4), ('ass', 2)], 'video'),
+    ('纪录片', '{title} 第{n}集', [('mp4', 6), ('srt', 2), ('txt', 1)], 'video'),
+    ('照片', 'IMG_{year}{n:04d}', [('jpg', 8), ('heic', 3), ('png', 2), ('mov', 1)], 'image'),
+    ('学习资料', '{title} 第{n}章', [('pdf', 6), ('docx', 2), ('pptx', 2), ('zip', 1)], 'doc'),
+    ('音乐', '{n:02d}. {title}', [('flac', 4), ('mp3', 5), ('lrc', 2), ('jpg', 1)], 'audio'),
+    ('软件', '{title}_v{season}.{n}', [('zip', 4), ('exe', 3), ('dmg', 2), ('7z', 2), ('rar', 2)], 'archive'),
+]
+
+_TITLES = [
+    '权力的游戏', '三体', '流浪地球', '甄嬛传', '琅琊榜', '庆余年', '狂飙', '漫长的季节',
+    '繁花', '鬼吹灯', '仙剑奇侠传', '西游记', '红楼梦', '舌尖上的中国', '河西走廊', '航拍中国',
+    'Breaking Bad', 'The Last of Us', 'Planet Earth', 'Interstellar', 'Inception', 'Friends',
+    'Game of Thrones', 'Stranger Things', 'Cosmos', 'Python 编程', '线性代数', '机器学习',
+    '考研英语', '家庭相册', '旅行 2023', '毕业典礼', '周杰伦', '陈奕迅', 'Taylor Swift', 'Office 2021',
+]
+
+_SUBFOLDERS = ['第 {n} 季', 'Season {n:02d}', '{year}', 'Disc {n}', '第 {n} 部分', '合集 {n}', 'Extras {n}']
+
+_QUALITIES = ['1080p', '2160p.HDR', '720p', 'WEB-DL.1080p', 'BluRay.x265']
+
+# 各类扩展名的典型大小（字节）
+_SIZES = {
+    'mkv': 2 << 30, 'mp4': 800 << 20, 'mov': 300 << 20, 'srt': 60 << 10, 'ass': 120 << 10,
+    'nfo': 4 << 10, 'jpg': 3 << 20, 'heic': 2 << 20, 'png': 5 << 20, 'pdf': 8 << 20,
+    'docx': 1 << 20, 'pptx': 15 << 20, 'zip': 200 << 20, 'flac': 30 << 20, 'mp3': 8 << 20,
+    'lrc': 2 << 10, 'exe': 100 << 20, 'dmg': 600 << 20, '7z': 300 << 20, 'rar': 400 << 20,
+    'txt': 8 << 10,
+}
+
+_CATEGORIES = {'srt': 'doc', 'ass': 'doc', 'nfo': 'doc', 'txt': 'doc', 'lrc': 'doc',
+               'jpg': 'image', 'png': 'image', 'heic': 'image', 'mov': 'video',
+               'zip': 'archive', '7z': 'archive', 'rar': 'archive'}
+
+_BASE_TIME = 1600000000000
+
+ROOT = '0'
+
+
+def _digest(*parts) -> int:
+    """稳定的 128 位哈希"""
+    data = ':'.join(str(p) for p in parts).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), 'big')
+
+
+def _pick(weighted: List[Tuple[str, int]], value: int) -> str:
+    total = sum(weight for _, weight in weighted)
+    value %= total
+    for name, weight in weighted:
+        if value < weight:
+            return name
+        value -= weight
+    return weighted[-1][0]
+
+
+class ShareGenerator:
+    """确定性的合成分享目录树（按需生成，不占内存）"""
+
+    def __init__(self, seed: int = 0, depth: int = 3, fanout: int = 6, files: int = 30,
+                 huge_ratio: float = 0.0, huge_files: int = 50000):
+        """
+        Args:
+            seed: 随机种子
+            depth: 最大目录深度（根目录为 0，depth 层的目录不再有子文件夹）
+            fanout: 每个目录平均的子文件夹数（实际在 0.5 ~ 1.5 倍之间）
+            files: 每个目录平均的文件数（实际在 0 ~ 2 倍之间）
+            huge_ratio: 目录成为超大目录的概率
+            huge_files: 超大目录的文件数
+        """
+        self.seed = seed
+        self.depth = depth
+        self.fanout = fanout
+        self.files = files
+        self.huge_ratio = huge_ratio
+        self.huge_files = huge_files
+
+    # ------------------------------------------------------------ fid 编码
+
+    @staticmethod
+    def is_folder(fid: str) -> bool:
+        """fid 是否为（本生成器生成的）文件夹"""
+        return fid == ROOT or (len(fid) == 32 and fid[2] == 'd')
+
+    @staticmethod
+    def _decode(fid: str) -> Tuple[int, int, int]:
+        """(深度, 题材, 标题序号)"""
+        if fid == ROOT:
+            return 0, -1, -1
+        return int(fid[:2], 16), int(fid[3], 16), int(fid[4:6], 16)
+
+    def _fid(self, pdir_fid: str, index: int, depth: int, folder: bool,
+             kind: int, title: int) -> str:
+        digest = _digest(self.seed, pdir_fid, index)
+        return (f"{depth:02x}{'d' if folder else 'f'}{kind:x}{title:02x}"
+                f"{digest & ((1 << 104) - 1):026x}")
+
+    # ------------------------------------------------------------ 目录结构
+
+    def child_counts(self, fid: str) -> Tuple[int, int]:
+        """目录的 (子文件夹数, 文件数)"""
+        depth, _, _ = self._decode(fid)
+        h = _digest(self.seed, 'counts', fid)
+        folders = 0
+        if depth < self.depth and self.fanout:
+            low = self.fanout // 2
+            folders = low + (h & 0xFFFF) % (self.fanout + 1)
+        if self.huge_ratio and ((h >> 16) & 0xFFFFFF) / 0x1000000 < self.huge_ratio:
+            return folders, self.huge_files
+        files = ((h >> 40) & 0xFFFF) % (2 * self.files + 1) if self.files else 0
+        return folders, files
+
+    def item(self, pdir_fid: str, index: int) -> Dict:
+        """
+        目录中第 index 个条目（sharepage/detail 的条目格式）
+
+        Raises:
+            IndexError: index 超出目录的条目数
+        """
+        folders, files = self.child_counts(pdir_fid)
+        if not 0 <= index < folders + files:
+            raise IndexError(index)
+        depth, kind, title = self._decode(pdir_fid)
+        h = _digest(self.seed, 'item', pdir_fid, index)
+        if kind < 0:
+            # 第一层目录决定题材和标题，下层继承
+            kind, title = h % len(_KINDS), (h >> 8) % len(_TITLES)
+
+        year = 2000 + (h >> 16) % 25
+        updated_at = _BASE_TIME + (h >> 24) % 200000000000
+        if index < folders:
+            fid = self._fid(pdir_fid, index, depth + 1, True, kind, title)
+            name = self._folder_name(pdir_fid, index)
+            # 同一目录下名称唯一：与前面的文件夹重名时加序号（文件名都带扩展名，不会与文件夹重名）
+            if any(self._folder_name(pdir_fid, i) == name for i in range(index)):
+                name = f"{name} ({index + 1})"
+            counts = self.child_counts(fid)
+            return {
+                'fid': fid,
+                'file_name': name,
+                'pdir_fid': pdir_fid,
+                'dir': True,
+                'file_type': 0,
+                'size': 0,
+                'obj_category': '',
+                'include_items': counts[0] + counts[1],
+                'updated_at': updated_at,
+                'created_at': updated_at - (h >> 80) % 100000000,
+                'share_fid_token': fid[-16:],
+            }
+
+        n = index - folders + 1
+        _, template, extensions, category = _KINDS[kind]
+        ext = _pick(extensions, h >> 32)
+        stem = template.format(title=_TITLES[title], season=1 + depth, n=n, year=year,
+                               quality=_QUALITIES[(h >> 48) % len(_QUALITIES)])
+        # 少量中文名称变体
+        if (h >> 56) % 16 == 0:
+            stem = f"{stem} 【高清】"
+        size = _SIZES.get(ext, 1 << 20)
+        size = size // 4 + (h >> 64) % (size * 3 // 2 + 1)
+        fid = self._fid(pdir_fid, index, depth + 1, False, kind, title)
+        return {
+            'fid': fid,
+            'file_name': f"{stem}.{ext}",
+            'pdir_fid': pdir_fid,
+            'dir': False,
+            'file_type': 1,
+            'size': size,
+            'obj_category': _CATEGORIES.get(ext, category),
+            'updated_at': updated_at,
+            'created_at': updated_at - (h >> 80) % 100000000,
+            'share_fid_token': fid[-16:],
+        }
+
+    def _folder_name(self, pdir_fid: str, index: int) -> str:
+        """目录中第 index 个文件夹未去重的名称"""
+        depth, kind, title = self._decode(pdir_fid)
+        h = _digest(self.seed, 'item', pdir_fid, index)
+        if depth == 0:
+            kind, title = h % len(_KINDS), (h >> 8) % len(_TITLES)
+            return f"{_TITLES[title]} {_KINDS[kind][0]}" if h >> 120 & 1 else _TITLES[title]
+        return _SUBFOLDERS[(h >> 64) % len(_SUBFOLDERS)].format(n=index + 1,
+                                                                  year=2000 + (h >> 16) % 25)
+
+    def list_page(self, pdir_fid: str, page: int = 1, size: int = 50) -> List[Dict]:
+        """目录的第 page 页（与 sharepage/detail 的分页相同），只生成这一页的条目"""
+        folders, files = self.child_counts(pdir_fid)
+        start = (max(page, 1) - 1) * size
+        return [self.item(pdir_fid, i) for i in range(start, min(start + size, folders + files))]
+
+    def iter_children(self, pdir_fid: str = ROOT) -> Iterator[Dict]:
+        """逐个生成目录的子条目"""
+        folders, files = self.child_counts(pdir_fid)
+        for index in range(folders + files):
+            yield self.item(pdir_fid, index)
+
+    def walk(self, pdir_fid: str = ROOT) -> Iterator[Dict]:
+        """
+        深度优先生成整棵树（文件夹先于其内容，与 iter_files_recursive 的顺序相同）
+
+        只保存当前路径上的迭代器，内存占用与目录深度成正比。
+        """
+        stack = [self.iter_children(pdir_fid)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+            yield item
+            if item['dir']:
+                stack.append(self.iter_children(item['fid']))
+
+    def count(self, pdir_fid: str = ROOT) -> Tuple[int, int]:
+        """整棵树的 (文件夹数, 文件数)，只计算数量，不生成文件条目"""
+        total_folders = total_files = 0
+        stack = [pdir_fid]
+        while stack:
+            fid = stack.pop()
+            folders, files = self.child_counts(fid)
+            total_folders += folders
+            total_files += files
+            stack.extend(self.item(fid, i)['fid'] for i in range(folders))
+        return total_folders, total_files
+
+    def write_tree(self, out: TextIO, pdir_fid: str = ROOT) -> None:
+        """
+        以 mock_server 目录树格式（嵌套 JSON）流式写出
+
+        边生成边写，不在内存中构建整棵树。
+        """
+        out.write('[')
+        stack = [(self.iter_children(pdir_fid), True)]
+        while stack:
+            children, first = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                out.write(']}' if stack else ']\n')
+                continue
+            stack[-1] = (children, False)
+            if not first:
+                out.write(',')
+            name = json.dumps(item['file_name'], ensure_ascii=False)
+            if item['dir']:
+                out.write(f'{{"name":{name},"children":[')
+                stack.append((self.iter_children(item['fid']), True))
+            else:
+                out.write(f'{{"name":{name},"size":{item["size"]}}}')
+
+
+class DriveGenerator:
+    """确定性的合成网盘目录（只有文件夹，/file/sort 的条目格式）"""
+
+    _NAMES = ['我的视频', '电影', '剧集', '学习', '工作', '照片', '音乐', '软件', '下载', '备份',
+              '追剧', '纪录片', '2023', '2024', '归档', 'Projects', 'Books', 'Temp']
+
+    def __init__(self, seed: int = 0, depth: int = 3, fanout: int = 5):
+        """
+        Args:
+            seed: 随机种子
+            depth: 最大目录深度
+            fanout: 每个目录的子目录数上限
+        """
+        self.seed = seed
+        self.depth = depth
+        self.fanout = fanout
+
+    def children(self, pdir_fid: str = ROOT, depth: int = 0) -> List[Dict]:
+        """目录下的子目录（/file/sort 的 data.list 格式）"""
+        if depth >= self.depth:
+            return []
+        h = _digest(self.seed, 'drive', pdir_fid)
+        count = 1 + h % self.fanout if self.fanout else 0
+        start = (h >> 16) % len(self._NAMES)
+        items = []
+        for i in range(count):
+            ih = _digest(self.seed, 'drive', pdir_fid, i)
+            position = start + i
+            name = self._NAMES[position % len(self._NAMES)]
+            if position >= len(self._NAMES):
+                name = f"{name} {position // len(self._NAMES) + 1}"
+            fid = f"{depth + 1:02x}d0{ih & ((1 << 112) - 1):028x}"
+            items.append({'fid': fid, 'file_name': name, 'pdir_fid': pdir_fid, 'dir': True,
+                          'file_type': 0, 'size': 0,
+                          'updated_at': _BASE_TIME + (ih >> 32) % 200000000000})
+        return items
+
+    def as_tree(self) -> List:
+        """mock_server 目录树格式（MockConfig(drive=...)）"""
+        root: List = []
+        stack = [(ROOT, 0, root)]
+        while stack:
+            fid, depth, target = stack.pop()
+            for item in self.children(fid, depth):
+                node = {'name': item['file_name'], 'children': []}
+                target.append(node)
+                stack.append((item['fid'], depth + 1, node['children']))
+        return root
+
+
+def parse_options(text: str, keys=('seed', 'depth', 'fanout', 'files', 'huge_ratio',
+                                     'huge_files')) -> Dict:
+    """
+    解析 "depth=4,fanout=8,files=40" 形式的生成参数
+
+    Raises:
+        ValueError: 格式错误或参数名不在 keys 中
+    """
+    options = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        key, sep, value = part.partition('=')
+        if not sep or key not in keys:
+            raise ValueError(f"无效的生成参数: {part}")
+        try:
+            options[key] = float(value) if key == 'huge_ratio' else int(value)
+        except ValueError:
+            raise ValueError(f"无效的生成参数: {part}")
+    return options
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='生成确定性的合成分享目录树')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子（默认 0）')
+    parser.add_argument('--depth', type=int, default=3, help='最大目录深度（默认 3）')
+    parser.add_argument('--fanout', type=int, default=6, help='平均子文件夹数（默认 6）')
+    parser.add_argument('--files', type=int, default=30, help='每个目录平均文件数（默认 30）')
+    parser.add_argument('--huge-ratio', type=float, default=0.0, help='超大目录的比例（默认 0）')
+    parser.add_argument('--huge-files', type=int, default=50000, help='超大目录的文件数（默认 50000）')
+    parser.add_argument('--format', choices=['tree', 'ndjson'], default='tree',
+                        help='输出格式：tree（mock_server --tree）或 ndjson（每行一个 API 条目）')
+    parser.add_argument('--output', '-o', help='输出文件（默认标准输出）')
+    parser.add_argument('--count', action='store_true', help='只统计文件夹数和文件数')
+    args = parser.parse_args()
+
+    generator = ShareGenerator(args.seed, args.depth, args.fanout, args.files,
+                               args.huge_ratio, args.huge_files)
+    if args.count:
+        folders, files = generator.count()
+        print(f"{folders} 个文件夹, {files} 个文件")
+        return
+
+    out: Optional[TextIO] = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'tree':
+            generator.write_tree(out)
+        else:
+            for item in generator.walk():
+                out.write(json.dumps(item, ensure_ascii=False))
+                out.write('\n')
+    except BrokenPipeError:
+        pass
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+分享快照 - 记录分享的目录结构，用于追更和变化检测
+
+快照按目录保存每个目录的直接子条目：
+    {
+        'pwd_id': 分享 ID,
+        'created_at': 生成时间（秒）,
+        'folders': {
+            目录 fid: {'name', 'pdir_fid', 'updated_at', 'hash', 'items': [条目, ...]}
+        },
+        'pending': [文件 fid, ...]    # 可选：追更时已选中、尚未转存成功的文件
+    }
+
+根目录的 fid 为 '0'。重新遍历时，若某个目录的 updated_at 与上次快照一致，
+则整棵子树直接沿用上次的结果，不再发起请求（见 FolderCache）。
+
+每个目录的 hash 由其直接子条目（文件的 fid/名称/大小、子目录的 fid/名称/hash）
+计算得到（Merkle 树），两个快照比较时只需深入 hash 不同的子树。
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional
+
+
+# 快照默认保存目录
+SNAPSHOT_DIR = "~/.config/quark/snapshots"
+
+# 遍历缓存默认保存目录（与追更快照分开，避免 list 覆盖追更进度）
+CACHE_DIR = "~/.config/quark/cache"
+
+
+def default_snapshot_path(pwd_id: str) -> str:
+    """获取分享快照的默认保存路径"""
+    return os.path.join(os.path.expanduser(SNAPSHOT_DIR), f"{pwd_id}.json")
+
+
+def default_cache_path(pwd_id: str) -> str:
+    """获取分享遍历缓存的默认保存路径"""
+    return os.path.join(os.path.expanduser(CACHE_DIR), f"{pwd_id}.json")
+
+
+def load_snapshot(path: str) -> Optional[Dict]:
+    """
+    读取快照文件
+
+    Args:
+        path: 快照文件路径
+
+    Returns:
+        Dict: 快照；文件不存在时返回 None
+    """
+    path = os.path.expanduser(path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_snapshot(snapshot: Dict, path: str) -> None:
+    """
+    保存快照（先写临时文件再替换，避免中途中断损坏旧快照）
+
+    Args:
+        snapshot: 快照
+        path: 快照文件路径
+    """
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _slim(item: Dict, pdir_fid: str) -> Dict:
+    """将 API 条目转换为快照条目，只保留需要的字段"""
+    return {
+        'fid': item.get('file_id') or item.get('fid'),
+        'file_name': item.get('file_name') or item.get('name'),
+        'size': item.get('size', 0),
+        'is_file': item.get('type') == 'file' or not item.get('dir', False),
+        'dir': item.get('dir', False),
+        'pdir_fid': pdir_fid,
+        'obj_category': item.get('obj_category'),
+        'share_fid_token': item.get('share_fid_token', ''),
+        'updated_at': item.get('updated_at'),
+        'created_at': item.get('created_at'),
+    }
+
+
+class FolderCache:
+    """
+    基于快照的目录缓存，供 QuarkClient.iter_files_recursive 使用
+
+    目录条目的 updated_at 与上次快照一致时直接返回缓存的子条目；
+    由于缓存的子目录条目也带着上次的 updated_at，整棵子树都会命中缓存。
+    遍历过程中访问到的目录会记录下来，用于生成新快照。
+    """
+
+    def __init__(self, previous: Optional[Dict] = None):
+        """
+        Args:
+            previous: 上一次的快照（可选）
+        """
+        self.previous = (previous or {}).get('folders', {})
+        self.folders = {}
+        self.stats = {'listed_folders': 0, 'reused_folders': 0}
+
+    def lookup(self, fid: str, entry: Optional[Dict]) -> Optional[List[Dict]]:
+        """
+        查找目录缓存
+
+        Args:
+            fid: 目录 ID
+            entry: 目录自身的条目（根目录为 None，总是重新请求）
+
+        Returns:
+            List[Dict]: 缓存的子条目；目录已变化或没有缓存时返回 None
+        """
+        cached = self.previous.get(fid)
+        if (entry is None or cached is None or entry.get('updated_at') is None
+                or cached.get('updated_at') != entry.get('updated_at')):
+            return None
+        self.stats['reused_folders'] += 1
+        return cached['items']
+
+    def store(self, fid: str, entry: Optional[Dict], items: List[Dict]) -> None:
+        """记录本次遍历得到的目录条目"""
+        if fid in self.previous and items is self.previous[fid]['items']:
+            self.folders[fid] = self.previous[fid]
+            return
+
+        self.stats['listed_folders'] += 1
+        self.folders[fid] = {
+            'name': entry.get('file_name') if entry else '',
+            'pdir_fid': entry.get('pdir_fid') if entry else None,
+            'updated_at': entry.get('updated_at') if entry else None,
+            'items': [_slim(item, fid) for item in items],
+        }
+
+    def snapshot(self, pwd_id: str) -> Dict:
+        """生成本次遍历的快照（含目录 hash）"""
+        snapshot = {
+            'pwd_id': pwd_id,
+            'created_at': int(time.time()),
+            'folders': self.folders,
+        }
+        compute_folder_hashes(snapshot)
+        return snapshot
+
+
+def crawl_snapshot(client, pwd_id: str, stoken: str,
+                   previous: Optional[Dict] = None) -> Dict:
+    """
+    遍历分享生成快照，跳过 updated_at 未变化的目录
+
+    Args:
+        client: QuarkClient 实例
+        pwd_id: 分享链接 ID
+        stoken: 访问令牌
+        previous: 上一次的快照（可选）
+
+    Returns:
+        Dict: 新快照，附带 'stats': {'listed_folders', 'reused_folders'}
+    """
+    cache = FolderCache(previous)
+    for _ in client.iter_files_recursive(pwd_id, stoken, cache=cache):
+        pass
+
+    snapshot = cache.snapshot(pwd_id)
+    snapshot['stats'] = cache.stats
+    return snapshot
+
+
+def snapshot_files(snapshot: Dict) -> List[Dict]:
+    """
+    按 get_all_files_recursive 的顺序列出快照中的所有文件
+
+    Args:
+        snapshot: 快照
+
+    Returns:
+        List[Dict]: 文件列表
+    """
+    return _subtree_files(snapshot.get('folders', {}), '0')
+
+
+def compute_folder_hashes(snapshot: Dict) -> None:
+    """
+    自底向上计算快照中每个目录的 hash（写入 folder['hash']）
+
+    Args:
+        snapshot: 快照
+    """
+    folders = snapshot.get('folders', {})
+    if '0' not in folders:
+        return
+
+    # 先序遍历得到目录顺序，逆序处理即可保证子目录先于父目录
+    order = []
+    stack = ['0']
+    while stack:
+        fid = stack.pop()
+        order.append(fid)
+        stack.extend(item['fid'] for item in folders[fid]['items']
+                     if not item['is_file'] and item['fid'] in folders)
+
+    for fid in reversed(order):
+        lines = []
+        for item in folders[fid]['items']:
+            if item['is_file']:
+                lines.append(f"f|{item['fid']}|{item['file_name']}|{item['size']}")
+            else:
+                child = folders.get(item['fid'])
+                lines.append(f"d|{item['fid']}|{item['file_name']}|{child['hash'] if child else ''}")
+        lines.sort()
+        folders[fid]['hash'] = hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def _ensure_hashes(snapshot: Dict) -> None:
+    """兼容没有 hash 的旧快照"""
+    folders = snapshot.get('folders', {})
+    if '0' in folders and 'hash' not in folders['0']:
+        compute_folder_hashes(snapshot)
+
+
+def _subtree_files(folders: Dict, fid: str) -> List[Dict]:
+    """列出快照中某个目录下的所有文件（深度优先）"""
+    files = []
+    if fid not in folders:
+        return files
+
+    stack = [iter(folders[fid]['items'])]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+        elif item['is_file']:
+            files.append(item)
+        elif item['fid'] in folders:
+            stack.append(iter(folders[item['fid']]['items']))
+    return files
+
+
+def diff_snapshots(old: Optional[Dict], new: Dict) -> Dict:
+    """
+    比较两个快照中的文件
+
+    从根目录开始，只深入 hash 不同的目录，比较的开销与变化量成正比。
+    同一 fid 在不同目录之间移动不算新增/删除；大小变化记为 changed。
+
+    Args:
+        old: 旧快照（None 表示全部为新增）
+        new: 新快照
+
+    Returns:
+        Dict: {'added': [...], 'removed': [...], 'changed': [...], 'compared_folders': int}
+            changed 中每项为 {'fid', 'file_name', 'old_size', 'new_size'}
+    """
+    new_folders = new.get('folders', {})
+    if not old:
+        return {'added': _subtree_files(new_folders, '0'), 'removed': [],
+                'changed': [], 'compared_folders': 0}
+
+    _ensure_hashes(old)
+    _ensure_hashes(new)
+    old_folders = old.get('folders', {})
+
+    added, removed, changed = [], [], []
+    compared = 0
+
+    stack = ['0']
+    while stack:
+        fid = stack.pop()
+        old_folder = old_folders.get(fid)
+        new_folder = new_folders.get(fid)
+        if old_folder is None or new_folder is None:
+            continue
+        if old_folder.get('hash') == new_folder.get('hash'):
+            continue
+        compared += 1
+
+        old_items = {item['fid']: item for item in old_folder['items']}
+        new_items = {item['fid']: item for item in new_folder['items']}
+        sub_folders = []
+
+        for item in new_folder['items']:
+            prev = old_items.get(item['fid'])
+            if item['is_file']:
+                if prev is None:
+                    added.append(item)
+                elif prev['size'] != item['size']:
+                    changed.append({'fid': item['fid'], 'file_name': item['file_name'],
+                                    'old_size': prev['size'], 'new_size': item['size']})
+            elif prev is None:
+                added.extend(_subtree_files(new_folders, item['fid']))
+            else:
+                sub_folders.append(item['fid'])
+
+        for item in old_folder['items']:
+            if item['fid'] in new_items:
+                continue
+            if item['is_file']:
+                removed.append(item)
+            else:
+                removed.extend(_subtree_files(old_folders, item['fid']))
+
+        # 逆序入栈，保证按列表顺序深度优先
+        stack.extend(reversed(sub_folders))
+
+    # 在目录之间移动的文件：两边都出现，不算新增/删除
+    moved = {f['fid'] for f in added} & {f['fid'] for f in removed}
+    if moved:
+        old_sizes = {f['fid']: f['size'] for f in removed if f['fid'] in moved}
+        changed.extend({'fid': f['fid'], 'file_name': f['file_name'],
+                        'old_size': old_sizes[f['fid']], 'new_size': f['size']}
+                       for f in added if f['fid'] in moved and old_sizes[f['fid']] != f['size'])
+        added = [f for f in added if f['fid'] not in moved]
+        removed = [f for f in removed if f['fid'] not in moved]
+
+    return {'added': added, 'removed': removed, 'changed': changed,
+            'compared_folders': compared}
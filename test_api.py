@@ -6,12 +6,16 @@
 import json
 import re
 import time
+import os
 import requests
 from pathlib import Path
 
 # Cookie 文件路径
 COOKIES_PATH = Path.home() / ".config" / "quark" / "cookies.txt"
 
+# API 基础 URL（可用环境变量指向 mock_server.py 启动的本地模拟服务器）
+API_BASE_URL = os.environ.get("QUARK_API_BASE_URL", "https://drive-pc.quark.cn/1/clouddrive").rstrip("/")
+
 def load_cookies() -> dict:
     """加载 Cookie"""
     if not COOKIES_PATH.exists():
@@ -45,7 +49,7 @@ def get_stoken(pwd_id: str, password: str = '') -> str:
     if not cookies:
         raise Exception("未找到 Cookie")
     
-    url = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/token"
+    url = f"{API_BASE_URL}/share/sharepage/token"
     params = {
         'pr': 'ucpro',
         'fr': 'pc',
@@ -71,7 +75,7 @@ def get_file_list(pwd_id: str, stoken: str, pdir_fid: str = '0'):
     if not cookies:
         raise Exception("未找到 Cookie")
     
-    url = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/detail"
+    url = f"{API_BASE_URL}/share/sharepage/detail"
     params = {
         'pr': 'ucpro',
         'fr': 'pc',
@@ -6,11 +6,15 @@
 import re
 import json
 import time
+import os
 import requests
 from pathlib import Path
 
 COOKIES_PATH = Path.home() / '.config' / 'quark' / 'cookies.txt'
 
+# API 基础 URL（可用环境变量指向 mock_server.py 启动的本地模拟服务器）
+API_BASE_URL = os.environ.get('QUARK_API_BASE_URL', 'https://drive-pc.quark.cn/1/clouddrive').rstrip('/')
+
 def load_cookies():
     if not COOKIES_PATH.exists():
         print(f"❌ Cookie 文件不存在：{COOKIES_PATH}")
@@ -37,7 +41,7 @@ def get_stoken(cookies, pwd_id, password=''):
     """获取访问令牌"""
     params = {'pr': 'ucpro', 'fr': 'pc', '__dt': int(time.time()*1000)%10000, '__t': int(time.time()*1000)}
     data = {'pwd_id': pwd_id, 'passcode': password}
-    resp = requests.post('https://drive-pc.quark.cn/1/clouddrive/share/sharepage/token', 
+    resp = requests.post(f'{API_BASE_URL}/share/sharepage/token', 
                         headers=get_headers(), cookies=cookies, params=params, json=data)
     result = resp.json()
     if result.get('status') != 200:
@@ -48,7 +52,7 @@ def get_files(cookies, pwd_id, stoken, pdir_fid='0'):
     """获取文件列表"""
     params = {'pr': 'ucpro', 'fr': 'pc', 'pwd_id': pwd_id, 'stoken': stoken, 
               'pdir_fid': pdir_fid, '_page': '1', '_size': '50'}
-    resp = requests.get('https://drive-pc.quark.cn/1/clouddrive/share/sharepage/detail',
+    resp = requests.get(f'{API_BASE_URL}/share/sharepage/detail',
                        headers=get_headers(), cookies=cookies, params=params)
     result = resp.json()
     if result.get('status') != 200:
@@ -67,7 +71,7 @@ def save_files(cookies, pwd_id, stoken, fid_list, share_fid_tokens, to_pdir_fid=
         "pdir_fid": "0",
         "scene": "link"
     }
-    resp = requests.post('https://drive-pc.quark.cn/1/clouddrive/share/sharepage/save',
+    resp = requests.post(f'{API_BASE_URL}/share/sharepage/save',
                         headers=get_headers(), cookies=cookies, params=params, json=data)
     result = resp.json()
     print(f"转存响应：{json.dumps(result, indent=2, ensure_ascii=False)}")
@@ -78,7 +82,7 @@ def save_files(cookies, pwd_id, stoken, fid_list, share_fid_tokens, to_pdir_fid=
 def check_task(cookies, task_id):
     """查询任务状态"""
     params = {'pr': 'ucpro', 'fr': 'pc', 'task_id': task_id, 'retry_index': '0'}
-    resp = requests.get('https://drive-pc.quark.cn/1/clouddrive/task',
+    resp = requests.get(f'{API_BASE_URL}/task',
                        headers=get_headers(), cookies=cookies, params=params)
     result = resp.json()
     print(f"任务状态：{json.dumps(result, indent=2, ensure_ascii=False)}")
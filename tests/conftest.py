@@ -0,0 +1,76 @@
+"""
+测试公共设置：在本地模拟服务器（mock_server）上准备分享，客户端直接连接它
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 与 main.py 一样从项目目录导入模块
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_server import MockConfig, MockQuarkServer
+from quark_client import QuarkClient
+
+GB = 1 << 30
+MB = 1 << 20
+
+# 测试用分享：两季剧集（含同名文件、子目录和大小写不同的扩展名）和根目录下的零散文件
+SHARE_TREE = [
+    {'name': 'Season 1', 'children': [
+        {'name': 'E01.mkv', 'size': 3 * GB},
+        {'name': 'E02.mkv', 'size': 2 * GB},
+        {'name': 'extras', 'children': [
+            {'name': 'making.mp4', 'size': 100 * MB},
+        ]},
+    ]},
+    {'name': 'Season 2', 'children': [
+        {'name': '4K', 'children': [
+            {'name': 'E01.MKV', 'size': 8 * GB},
+        ]},
+        {'name': 'E01.mkv', 'size': 3 * GB},
+    ]},
+    {'name': 'ba.txt', 'size': 10},
+    {'name': 'a.txt', 'size': 20},
+    {'name': 'x第1集.mp4', 'size': 30},
+    {'name': '第1集.mp4', 'size': 40},
+]
+
+
+@pytest.fixture(scope='session')
+def cookies_path(tmp_path_factory):
+    """模拟服务器不校验 Cookie，内容非空即可"""
+    path = tmp_path_factory.mktemp('quark') / 'cookies.json'
+    path.write_text('{"__test": "1"}', encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def server():
+    with MockQuarkServer(MockConfig(tree=SHARE_TREE, task_duration='0')) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server, cookies_path):
+    return QuarkClient(cookies_path, base_url=server.base_url)
+
+
+@pytest.fixture
+def share(client, server):
+    """(pwd_id, stoken)"""
+    pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+    return pwd_id, client.get_stoken(pwd_id)
+
+
+@pytest.fixture
+def table(client, share):
+    """遍历测试分享得到的 FileTable"""
+    return client.get_all_files_table(*share)
+
+
+@pytest.fixture
+def entries(client, share):
+    """遍历顺序的条目（文件夹先于其内容）"""
+    return list(client.iter_files_recursive(*share, include_folders=True))
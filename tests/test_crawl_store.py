@@ -0,0 +1,63 @@
+"""crawl_store：内存受限遍历的结果与深度优先遍历一致"""
+
+import pytest
+
+from crawl_store import FOLDER_OVERHEAD, CrawlStore, crawl_to_store
+from mock_server import MockConfig, MockQuarkServer
+from quark_client import QuarkClient
+
+
+@pytest.fixture
+def store():
+    with CrawlStore() as store:
+        yield store
+
+
+@pytest.mark.parametrize('memory_budget', [64 << 20, 2000, 1])
+def test_order_matches_depth_first_crawl(client, share, store, memory_budget):
+    """预算很小时结果和待遍历目录都会写入磁盘，顺序仍与 get_all_files_recursive 相同"""
+    expected = client.get_all_files_recursive(*share)
+    crawl_to_store(client, *share, store, memory_budget=memory_budget)
+
+    assert len(store) == len(expected)
+    assert [f['fid'] for f in store] == [f['fid'] for f in expected]
+    assert store.column('name') == [f['file_name'] for f in expected]
+    assert store.column('size') == [f['size'] for f in expected]
+    assert store[-1]['fid'] == expected[-1]['fid']
+
+
+def test_paths_match_file_table(client, share, store, table):
+    crawl_to_store(client, *share, store, memory_budget=1)
+    for path in ('/', '/Season 1', '/Season 2/4K', '/season 1/EXTRAS'):
+        assert store.paths.subtree_rows(path) == table.paths.subtree_rows(path)
+    fid = store.paths.lookup('/Season 2/4K')[0].fid
+    assert store.folder_path(fid) == '/Season 2/4K'
+
+
+def test_max_depth(client, share, store):
+    crawl_to_store(client, *share, store, max_depth=0)
+    assert [f['file_name'] for f in store] == ['ba.txt', 'a.txt', 'x第1集.mp4', '第1集.mp4']
+
+
+def test_flushes_folder_heavy_share(cookies_path, monkeypatch):
+    """几乎全是文件夹的分享也按预算分批写入，不在内存中无限累积"""
+    tree = [{'name': f'd{i}', 'children': [{'name': f'e{i}-{j}', 'children': []}
+                                            for j in range(20)]} for i in range(20)]
+    budget = 40 * FOLDER_OVERHEAD
+    batches = []
+    add_folders = CrawlStore.add_folders
+
+    def record(self, rows):
+        batches.append(len(rows))
+        add_folders(self, rows)
+
+    monkeypatch.setattr(CrawlStore, 'add_folders', record)
+    with MockQuarkServer(MockConfig(tree=tree)) as server, CrawlStore() as store:
+        client = QuarkClient(cookies_path, base_url=server.base_url)
+        pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+        crawl_to_store(client, pwd_id, client.get_stoken(pwd_id), store, memory_budget=budget)
+        assert len(store) == 0
+        assert store.conn.execute('SELECT COUNT(*) FROM folders').fetchone()[0] == 420
+
+    assert len(batches) > 1
+    assert max(batches) <= budget // 2 // FOLDER_OVERHEAD
@@ -0,0 +1,50 @@
+"""deadline：时间预算内的遍历与部分结果标记"""
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+from file_table import FileTable
+from main import partial_info
+
+
+def expired():
+    return Deadline(0)
+
+
+def test_deadline_basics():
+    deadline = expired()
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check()
+    assert not Deadline(60).expired()
+
+
+def test_expired_deadline_reports_partial(client, share):
+    """截止时间在开始前已到：起始目录本身未展开，结果不能标记为完整"""
+    entries, unlisted = client.crawl_breadth_first(*share, expired())
+    assert entries == []
+    assert [entry['fid'] for entry in unlisted] == ['0']
+
+    info = partial_info(FileTable(entries), unlisted)
+    assert info == {'partial': True, 'unlisted_folders': ['/']}
+
+
+def test_generous_deadline_matches_full_crawl(client, share, entries):
+    crawled, unlisted = client.crawl_breadth_first(*share, Deadline(60))
+    assert unlisted == []
+    assert [e['fid'] for e in crawled] == [e['fid'] for e in entries]
+
+
+def test_max_depth_leaves_nothing_unlisted(client, share):
+    crawled, unlisted = client.crawl_breadth_first(*share, Deadline(60), max_depth=0)
+    assert unlisted == []
+    assert [e['file_name'] for e in crawled] == \
+        ['Season 1', 'Season 2', 'ba.txt', 'a.txt', 'x第1集.mp4', '第1集.mp4']
+
+
+def test_streaming_save_with_expired_deadline_is_partial(client, share):
+    result = client.save_files_streaming(*share, lambda f: True, deadline=expired())
+    assert result['partial'] is True
+    assert result['file_count'] == 0
+    assert result['task_ids'] == []
@@ -0,0 +1,127 @@
+"""faults：故障注入下的请求重试与 stoken 续期"""
+
+from contextlib import contextmanager
+
+import pytest
+
+from conftest import SHARE_TREE
+from faults import FaultInjector
+from metrics import RequestMetrics
+from mock_server import MockConfig, MockQuarkServer
+from quark_client import QuarkClient
+
+DETAIL = '/share/sharepage/detail'
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setenv('QUARK_RETRY_BACKOFF', '0.001')
+    monkeypatch.delenv('QUARK_FAULTS', raising=False)
+
+
+@pytest.fixture
+def faulty(cookies_path):
+    """faulty(规则) 启动注入故障的模拟服务器，返回 (server, client, pwd_id, stoken)"""
+    @contextmanager
+    def start(rules):
+        config = MockConfig(tree=SHARE_TREE, task_duration='0', drive=[],
+                            faults=FaultInjector.parse(rules))
+        with MockQuarkServer(config) as server:
+            client = QuarkClient(cookies_path, base_url=server.base_url, metrics=RequestMetrics())
+            pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+            yield server, client, pwd_id, client.get_stoken(pwd_id)
+    return start
+
+
+def names(files):
+    return [f['file_name'] for f in files]
+
+
+@pytest.mark.parametrize('text', ['detail:boom=0.1', 'detail:5xx=2', 'detail=0.1', 'detail:5xx=x'])
+def test_invalid_rules_raise_value_error(text):
+    with pytest.raises(ValueError):
+        FaultInjector.parse(text)
+
+
+def test_sampling_is_deterministic_per_seed():
+    def draws(seed):
+        injector = FaultInjector.parse(f'detail:5xx=0.5,*:spike=0.3@0.1,seed={seed}')
+        return [injector.choose('detail') for _ in range(50)]
+
+    assert draws(3) == draws(3)
+    injector = FaultInjector.parse('detail:throttle=1,detail:5xx=1')
+    assert injector.choose('detail').kind == 'throttle'
+    assert injector.choose('save').kind is None
+    assert injector.injected == {'detail': {'throttle': 1}}
+
+
+def test_crawl_recovers_from_transient_faults(faulty, client, share):
+    expected = names(client.get_all_files_recursive(*share))
+    rules = 'detail:5xx=0.3,detail:reset=0.1,detail:throttle=0.2@0.001,seed=4'
+    with faulty(rules) as (server, faulty_client, pwd_id, stoken):
+        assert names(faulty_client.get_all_files_recursive(pwd_id, stoken)) == expected
+        injected = server.state.config.faults.injected['detail']
+        stats = faulty_client.metrics.snapshot()['endpoints'][DETAIL]
+
+    assert sum(injected.values()) > 0
+    # 每次注入的故障都重试一次；客户端与服务端记录的请求数一致
+    assert stats['retries'] == sum(injected.values())
+    assert stats['calls'] == server.request_counts()['detail']
+
+
+def test_gives_up_after_max_retries(faulty):
+    with faulty('detail:5xx=1@502') as (server, client, pwd_id, stoken):
+        with pytest.raises(Exception, match='502'):
+            client.get_all_files_recursive(pwd_id, stoken)
+        assert server.request_counts()['detail'] == client.max_retries + 1
+
+
+def test_save_is_not_retried_after_server_error(faulty):
+    """转存可能已在服务端执行，500 后不重试，避免重复转存"""
+    with faulty('save:5xx=1@500') as (server, client, pwd_id, stoken):
+        with pytest.raises(Exception):
+            client.save_files(pwd_id, stoken, ['x'], [''], '0')
+        assert server.request_counts()['save'] == 1
+
+
+def test_save_is_retried_when_throttled(faulty):
+    # seed=1 时第一次抽样命中、第二次不命中
+    with faulty('save:throttle=0.5@0.001,seed=1') as (server, client, pwd_id, stoken):
+        files = [f for f in client.get_all_files_recursive(pwd_id, stoken) if f['size'] < 100]
+        task_id = client.save_files(pwd_id, stoken, [f['fid'] for f in files],
+                                    [f['share_fid_token'] for f in files], '0')
+        assert client.wait_task_complete(task_id)
+        assert server.request_counts()['save'] == 2
+        assert len(server.state.tasks) == 1
+
+
+def test_expired_stoken_is_renewed_during_crawl(faulty, client, share):
+    expected = names(client.get_all_files_recursive(*share))
+    with faulty('detail:stoken=0.3,seed=7') as (server, faulty_client, pwd_id, stoken):
+        assert names(faulty_client.get_all_files_recursive(pwd_id, stoken)) == expected
+        renewals = server.request_counts()['token'] - 1
+        expired = server.state.config.faults.injected['detail']['stoken']
+
+    assert expired > 0
+    # 续期后的 stoken 被后续请求沿用；并发发现过期时也只续期一次
+    assert 0 < renewals <= expired
+
+
+def test_gives_up_when_renewed_stoken_also_fails(faulty):
+    with faulty('detail:stoken=1') as (server, client, pwd_id, stoken):
+        with pytest.raises(Exception, match='stoken'):
+            client.get_all_files_recursive(pwd_id, stoken)
+        # 续期后只重试一次
+        assert server.request_counts()['token'] == 2
+        assert server.request_counts()['detail'] == 2
+
+
+def test_expired_stoken_is_renewed_before_saving(faulty):
+    with faulty('save:stoken=0.5,seed=1') as (server, client, pwd_id, stoken):
+        files = client.get_all_files_recursive(pwd_id, stoken)[:2]
+        task_id = client.save_files(pwd_id, stoken, [f['fid'] for f in files],
+                                    [f['share_fid_token'] for f in files], '0')
+        assert task_id and client.wait_task_complete(task_id)
+        assert server.request_counts()['token'] == 2
+        assert server.request_counts()['save'] == 2
+        assert len(server.state.tasks) == 1
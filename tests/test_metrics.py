@@ -0,0 +1,71 @@
+"""metrics：按接口统计请求次数、耗时分布、字节数与错误"""
+
+import pytest
+
+from metrics import BUCKETS, RequestMetrics, pad
+from quark_client import QuarkClient
+
+DETAIL = '/share/sharepage/detail'
+TOKEN = '/share/sharepage/token'
+
+
+def test_totals_and_errors():
+    metrics = RequestMetrics()
+    metrics.record('/a', 0.02, 100)
+    metrics.record('/a', 0.04, 300, error=True)
+    metrics.record_retry('/a')
+    metrics.record('/b', 0.5, 10)
+
+    data = metrics.snapshot()
+    assert data['total'] == {'calls': 3, 'errors': 1, 'retries': 1, 'bytes': 410, 'seconds': 0.56}
+    assert metrics.total_calls() == 3
+    # 按总耗时降序
+    assert list(data['endpoints']) == ['/b', '/a']
+    a = data['endpoints']['/a']
+    assert (a['calls'], a['errors'], a['retries'], a['bytes']) == (2, 1, 1, 400)
+    assert a['mean'] == 0.03 and a['max'] == 0.04
+    assert a['histogram'] == {'0.025': 1, '0.05': 1}
+
+
+def test_percentiles_interpolate_within_bucket():
+    metrics = RequestMetrics()
+    for i in range(100):
+        metrics.record('/x', 0.011 + i * 0.0001)
+    stats = metrics.snapshot()['endpoints']['/x']
+    # 全部落在 (0.01, 0.025] 桶内，插值范围收窄到 [最小值, 最大值]
+    assert stats['histogram'] == {'0.025': 100}
+    assert stats['p50'] == pytest.approx(0.011 + 0.5 * 0.0099, abs=1e-4)
+    assert 0.011 <= stats['p50'] < stats['p95'] < stats['p99'] <= stats['max'] == 0.0209
+
+
+def test_slowest_bucket_is_unbounded():
+    metrics = RequestMetrics()
+    metrics.record('/slow', BUCKETS[-1] + 5)
+    stats = metrics.snapshot()['endpoints']['/slow']
+    assert stats['histogram'] == {'+inf': 1}
+    assert stats['p99'] == stats['max'] == BUCKETS[-1] + 5
+
+
+def test_format_lines_aligns_wide_characters():
+    metrics = RequestMetrics()
+    assert len(metrics.format_lines()) == 1
+    metrics.record(DETAIL, 0.01, 2048)
+    header, columns, row = metrics.format_lines()
+    assert '1 个请求' in header
+    assert row.strip().startswith(DETAIL)
+    assert pad('接口', 6, False) == '接口  ' and pad('ab', 4, True) == '  ab'
+
+
+def test_client_records_every_request(server, cookies_path):
+    metrics = RequestMetrics()
+    client = QuarkClient(cookies_path, base_url=server.base_url, metrics=metrics)
+    before = server.request_counts()
+    pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+    client.get_all_files_recursive(pwd_id, client.get_stoken(pwd_id))
+    after = server.request_counts()
+
+    endpoints = metrics.snapshot()['endpoints']
+    assert endpoints[DETAIL]['calls'] == after['detail'] - before.get('detail', 0) == 5
+    assert endpoints[TOKEN]['calls'] == after['token'] - before.get('token', 0) == 1
+    assert all(stats['errors'] == 0 and stats['bytes'] > 0 for stats in endpoints.values())
+    assert metrics.total_calls() == 6
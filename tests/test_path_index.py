@@ -0,0 +1,77 @@
+"""path_index：遍历时构建的目录行号区间"""
+
+from path_index import PathIndex
+
+
+def folder(fid, name, pdir_fid):
+    return {'fid': fid, 'file_name': name, 'pdir_fid': pdir_fid, 'is_file': False}
+
+
+def file(name, pdir_fid, size=1):
+    return {'fid': name, 'file_name': name, 'pdir_fid': pdir_fid, 'size': size, 'is_file': True}
+
+
+# 行号：0 root.txt | 1-2 A | 3 A/B | 4 A | 5 C | 6 另一个同名的 C
+ENTRIES = [
+    file('root.txt', '0', 1),
+    folder('a', 'A', '0'),
+    file('a1', 'a', 10),
+    file('a2', 'a', 20),
+    folder('b', 'B', 'a'),
+    file('b1', 'b', 100),
+    file('a3', 'a', 30),
+    folder('c', 'C', '0'),
+    file('c1', 'c', 1000),
+    folder('c2', 'C', '0'),
+    file('c2-1', 'c2', 2000),
+]
+
+
+def test_row_ranges_and_sizes():
+    index = PathIndex.from_entries(ENTRIES)
+    a = index.node('a')
+    assert index.rows == 7
+    assert index.row_range(index.root) == (0, 7)
+    assert index.row_range(a) == (1, 5)
+    assert index.row_range(index.node('b')) == (3, 4)
+    assert index.file_count(a) == 4
+    assert a.total_size == 160
+    assert index.root.total_size == 3161
+
+
+def test_direct_rows_skip_subfolders():
+    index = PathIndex.from_entries(ENTRIES)
+    assert index.direct_rows(index.node('a')) == [(1, 3), (4, 5)]
+    assert index.direct_rows(index.root) == [(0, 1)]
+
+
+def test_lookup_is_case_insensitive_and_keeps_duplicates():
+    index = PathIndex.from_entries(ENTRIES)
+    assert [node.fid for node in index.lookup('/a/b')] == ['b']
+    assert [node.fid for node in index.lookup('/C')] == ['c', 'c2']
+    assert index.lookup('/missing') == []
+    assert index.subtree_rows('/C') == [(5, 6), (6, 7)]
+    assert index.subtree_rows('/') == [(0, 7)]
+
+
+def test_folder_path():
+    index = PathIndex.from_entries(ENTRIES)
+    assert index.folder_path('b') == '/A/B'
+    assert index.folder_path('unknown') == '/'
+    assert index.node('b').path == '/A/B'
+
+
+def test_ranges_match_crawled_table(table):
+    """模拟服务器上遍历得到的区间与文件所在目录一致"""
+    for path in ('/Season 1', '/Season 1/extras', '/Season 2', '/Season 2/4K'):
+        rows = [row for start, end in table.paths.subtree_rows(path) for row in range(start, end)]
+        expected = [row for row in range(len(table))
+                    if (table.folder_path(table.pdir_fid(row)) + '/').startswith(path + '/')]
+        assert rows == expected
+
+
+def test_from_entries_matches_incremental_build(table, entries):
+    index = PathIndex.from_entries(entries)
+    assert index.rows == len(table)
+    for path in ('/', '/Season 1', '/Season 2/4K'):
+        assert index.subtree_rows(path) == table.paths.subtree_rows(path)
@@ -0,0 +1,58 @@
+"""profiling：各线程的 cProfile 汇总，以及不支持逐线程剖析时的退化"""
+
+import cProfile
+import json
+import threading
+
+import profiling
+from profiling import Profiler
+
+
+def busy():
+    json.loads(json.dumps(list(range(20000))))
+
+
+def run_in_thread():
+    thread = threading.Thread(target=busy)
+    thread.start()
+    thread.join()
+
+
+def test_profiles_worker_threads(tmp_path):
+    profiler = Profiler().start()
+    run_in_thread()
+    report = profiler.stop()
+    assert report['threads'] == 2 and report['thread_profiling'] is True
+    assert report['breakdown']['json']['seconds'] > 0
+    assert not any('⚠️' in line for line in profiler.format_lines())
+
+    report_path = profiler.write(str(tmp_path / 'run.prof'))
+    assert '"thread_profiling": true' in open(report_path, encoding='utf-8').read()
+
+
+def test_version_without_thread_profiling(monkeypatch):
+    monkeypatch.setattr(profiling, 'THREAD_PROFILING', False)
+    profiler = Profiler().start()
+    run_in_thread()
+    report = profiler.stop()
+    assert report['threads'] == 1 and report['thread_profiling'] is False
+    assert '只为主线程' in profiler.format_lines()[-1]
+
+
+def test_falls_back_when_another_profiler_is_active(monkeypatch):
+    """3.12+ 上第二个 cProfile 启用时抛出 ValueError，不应中断被剖析的线程"""
+    main = threading.main_thread()
+
+    class Exclusive(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            if threading.current_thread() is not main:
+                raise ValueError('Another profiling tool is already active')
+            super().enable(*args, **kwargs)
+
+    monkeypatch.setattr(profiling, 'THREAD_PROFILING', True)
+    monkeypatch.setattr(profiling.cProfile, 'Profile', Exclusive)
+    profiler = Profiler().start()
+    run_in_thread()
+    report = profiler.stop()
+    assert report['threads'] == 1 and report['thread_profiling'] is False
+    assert '只为主线程' in profiler.format_lines()[-1]
@@ -0,0 +1,142 @@
+"""progress：进度事件的阶段、计数、速率与预计剩余时间"""
+
+import io
+import json
+
+import pytest
+
+import progress
+from deadline import Deadline
+from progress import NOOP, Progress, ndjson_writer
+from quark_client import QuarkClient, build_selection_filter
+
+
+class Clock:
+    """可手动推进的 time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress.time, 'monotonic', clock)
+    return clock
+
+
+def test_phases_and_eta(clock):
+    events = []
+    requests = iter(range(0, 1000, 10))
+    p = Progress('crawl', events.append, lambda: next(requests), interval=1.0,
+                 fields={'pwd_id': 'x'}, folders_queued=1)
+    assert events[0]['phase'] == 'start' and events[0]['pwd_id'] == 'x'
+    # 还没有完成任何目录时无法估算
+    assert events[0]['eta'] is None
+
+    clock.now += 0.5
+    p.add(folders_done=1, folders_queued=3)
+    assert len(events) == 1  # 未到间隔，不输出 running
+
+    clock.now += 1.5
+    p.add(folders_done=1, folders_queued=-1)
+    running = events[-1]
+    assert running['phase'] == 'running'
+    assert (running['folders_done'], running['folders_queued']) == (2, 3)
+    # 2 秒完成 2 个目录，剩余 3 个约 3 秒
+    assert running['eta'] == 3.0
+    assert running['elapsed'] == 2.0
+    assert running['requests'] > 0 and running['requests_per_sec'] == running['requests'] / 2
+
+    p.finish(partial=False)
+    p.finish(error='ignored')
+    assert [e['phase'] for e in events] == ['start', 'running', 'done']
+    assert events[-1]['eta'] == 0.0 and events[-1]['partial'] is False
+    assert 'error' not in events[-1]
+
+
+def test_eta_uses_slowest_unit(clock):
+    events = []
+    p = Progress('save', events.append, units=(('folders_done', 'folders_queued'),
+                                              ('tasks_done', 'tasks_pending')), interval=0)
+    clock.now += 10
+    p.set(folders_done=5, folders_queued=5, tasks_done=1, tasks_pending=2)
+    assert events[-1]['eta'] == 20.0
+    p.set(tasks_done=0)
+    assert events[-1]['eta'] is None
+
+
+def test_context_manager_records_error():
+    events = []
+    with pytest.raises(ValueError):
+        with Progress('crawl', events.append):
+            raise ValueError('boom')
+    assert events[-1]['phase'] == 'done' and events[-1]['error'] == 'boom'
+
+    def generator():
+        with Progress('crawl', events.append):
+            yield 1
+            yield 2
+
+    events.clear()
+    items = generator()
+    next(items)
+    items.close()
+    # 提前关闭生成器不算失败
+    assert events[-1]['phase'] == 'done' and 'error' not in events[-1]
+
+
+def test_ndjson_writer_and_noop():
+    out = io.StringIO()
+    with Progress('task', ndjson_writer(out), fields={'task_id': 't'}) as p:
+        p.set(percent=50)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [e['phase'] for e in lines] == ['start', 'done']
+    assert lines[-1]['task_id'] == 't' and lines[-1]['percent'] == 50
+
+    with NOOP as p:
+        p.add(folders_done=1)
+    assert NOOP.finished
+
+
+@pytest.fixture
+def observed(server, cookies_path):
+    """(client, events, pwd_id, stoken)：客户端的进度事件记入 events"""
+    events = []
+    client = QuarkClient(cookies_path, base_url=server.base_url, on_progress=events.append)
+    pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+    stoken = client.get_stoken(pwd_id)
+    return client, events, pwd_id, stoken
+
+
+def test_crawl_events(observed):
+    client, events, pwd_id, stoken = observed
+    client.get_all_files_recursive(pwd_id, stoken)
+    start, done = events[0], events[-1]
+    assert (start['operation'], start['phase'], start['folders_queued']) == ('crawl', 'start', 1)
+    assert done['phase'] == 'done'
+    assert (done['folders_done'], done['folders_queued'], done['files_found']) == (5, 0, 9)
+    assert done['requests'] == 5 and done['eta'] == 0.0
+
+
+def test_partial_crawl_is_reported_in_done_event(observed):
+    client, events, pwd_id, stoken = observed
+    client.crawl_breadth_first(pwd_id, stoken, Deadline(0))
+    assert events[-1]['partial'] is True and events[-1]['folders_unlisted'] == 1
+
+
+def test_streaming_save_events(observed):
+    client, events, pwd_id, stoken = observed
+    client.save_files_streaming(pwd_id, stoken, build_selection_filter('*.mkv'), batch_size=2)
+    save = [e for e in events if e['operation'] == 'save']
+    tasks = [e for e in events if e['operation'] == 'task']
+    assert [e['phase'] for e in save] == ['start', 'done']
+    done = save[-1]
+    assert (done['files_found'], done['files_matched'], done['batches']) == (9, 4, 2)
+    assert (done['tasks_done'], done['tasks_pending'], done['tasks_failed']) == (2, 0, 0)
+    assert done['partial'] is False
+    task_done = [e for e in tasks if e['phase'] == 'done']
+    assert len(task_done) == 2 and all(e['percent'] == 100 for e in task_done)
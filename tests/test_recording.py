@@ -0,0 +1,82 @@
+"""recording：录制模拟服务器上的遍历，再离线回放"""
+
+import json
+
+import pytest
+import requests
+
+from quark_client import QuarkClient
+from recording import Recorder, Replayer, ReplayMiss, load, summarize
+
+
+@pytest.fixture
+def recording(server, cookies_path, tmp_path):
+    """录制一次遍历，返回 (录制文件, 文件列表, stoken)"""
+    path = str(tmp_path / 'crawl.ndjson')
+    recorder = Recorder(path, server.base_url)
+    client = QuarkClient(cookies_path, base_url=server.base_url, transport=recorder.wrap())
+    pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+    stoken = client.get_stoken(pwd_id)
+    files = client.get_all_files_recursive(pwd_id, stoken)
+    recorder.close()
+    return path, files, stoken
+
+
+def test_replay_returns_recorded_crawl(recording, server, cookies_path):
+    path, files, _ = recording
+    client = QuarkClient(cookies_path, base_url=server.base_url,
+                         transport=Replayer(path, latency='zero').request)
+    pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+    replayed = client.get_all_files_recursive(pwd_id, client.get_stoken(pwd_id))
+    assert [f['fid'] for f in replayed] == [f['fid'] for f in files]
+    assert [f['file_name'] for f in replayed] == [f['file_name'] for f in files]
+
+
+def test_secrets_are_scrubbed(recording):
+    path, files, stoken = recording
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert stoken not in text
+    assert all(f['share_fid_token'] not in text for f in files if f['share_fid_token'])
+    assert '<secret-1>' in text
+
+
+def test_matching_ignores_credentials_and_timestamps(recording, server):
+    path, _, _ = recording
+    replayer = Replayer(path, latency='zero')
+    record = next(r for r in load(path) if r['endpoint'] == '/share/sharepage/detail')
+    params = dict(record['params'], stoken='another-token', __t='123', __dt='456')
+    response = replayer.request('get', server.base_url + record['endpoint'], params=params)
+    assert response.status_code == record['status']
+    assert response.json() == record['body']
+
+
+def test_unknown_request_raises_replay_miss(recording, server):
+    replayer = Replayer(recording[0], latency='zero')
+    with pytest.raises(ReplayMiss):
+        replayer.request('get', server.base_url + '/share/sharepage/detail',
+                         params={'pdir_fid': 'no-such-folder'})
+    assert issubclass(ReplayMiss, requests.exceptions.RequestException)
+    assert replayer.misses == 1
+
+
+def test_repeated_requests_replay_in_order_then_repeat_last(tmp_path):
+    path = tmp_path / 'poll.ndjson'
+    records = [{'recording': 1, 'base_url': 'http://x'}] + [
+        {'at': i, 'elapsed': 0.01, 'method': 'GET', 'path': '/task', 'endpoint': '/task',
+         'params': {'task_id': 't'}, 'status': 200, 'headers': {}, 'bytes': 0,
+         'body': {'data': {'status': status}}} for i, status in enumerate((0, 1, 2))]
+    path.write_text(''.join(json.dumps(r) + '\n' for r in records), encoding='utf-8')
+
+    replayer = Replayer(str(path), latency='zero')
+    statuses = [replayer.request('GET', 'http://x/task', params={'task_id': 't'}).json()['data']['status']
+                for _ in range(5)]
+    assert statuses == [0, 1, 2, 2, 2]
+    assert summarize(load(str(path))).total_calls() == 3
+
+
+def test_rejects_non_recording_file(tmp_path):
+    path = tmp_path / 'other.json'
+    path.write_text('{"folders": {}}\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        Replayer(str(path))
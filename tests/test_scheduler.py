@@ -0,0 +1,121 @@
+"""scheduler：请求的优先级排队、后台线程上限与速率限制"""
+
+import threading
+import time
+
+from deadline import Deadline
+from quark_client import QuarkClient
+from scheduler import BACKGROUND, FOREGROUND, POLLING, RateLimiter, RequestScheduler, priority
+
+
+def blocked(scheduler):
+    """占住唯一的工作线程，返回放行用的 Event"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold, FOREGROUND)
+    assert started.wait(5)
+    return release
+
+
+def test_foreground_runs_before_queued_background():
+    scheduler = RequestScheduler(workers=1, rate=0, reserved=0)
+    release = blocked(scheduler)
+    order = []
+    futures = [scheduler.submit(lambda i=i: order.append(('background', i)), BACKGROUND)
+               for i in range(3)]
+    futures.append(scheduler.submit(lambda: order.append(('polling', 0)), POLLING))
+    futures.append(scheduler.submit(lambda: order.append(('foreground', 0)), FOREGROUND))
+    release.set()
+    for future in futures:
+        future.result(5)
+    scheduler.shutdown()
+
+    assert order == [('foreground', 0), ('polling', 0),
+                     ('background', 0), ('background', 1), ('background', 2)]
+    assert scheduler.completed == {FOREGROUND: 2, POLLING: 1, BACKGROUND: 3}
+
+
+def test_priority_context_sets_default_level():
+    scheduler = RequestScheduler(workers=1, rate=0, reserved=0)
+    release = blocked(scheduler)
+    order = []
+    with priority(BACKGROUND):
+        later = scheduler.submit(lambda: order.append('background'))
+    first = scheduler.submit(lambda: order.append('foreground'))
+    release.set()
+    first.result(5)
+    later.result(5)
+    scheduler.shutdown()
+    assert order == ['foreground', 'background']
+
+
+def test_reserved_workers_never_run_background():
+    scheduler = RequestScheduler(workers=3, rate=0, reserved=1)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def background():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    futures = [scheduler.submit(background, BACKGROUND) for _ in range(6)]
+    time.sleep(0.01)
+    # 后台请求占满可用线程时，前台请求仍能立即执行
+    start = time.monotonic()
+    scheduler.submit(lambda: None, FOREGROUND).result(5)
+    assert time.monotonic() - start < 0.04
+    for future in futures:
+        future.result(5)
+    scheduler.shutdown()
+    assert peak == 2
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.19
+    assert RateLimiter(rate=0).rate == 0
+
+
+def test_unlimited_by_default(monkeypatch):
+    monkeypatch.delenv('QUARK_RATE_LIMIT', raising=False)
+    assert RequestScheduler().limiter.rate == 0
+    monkeypatch.setenv('QUARK_RATE_LIMIT', '12.5')
+    assert RequestScheduler().limiter.rate == 12.5
+
+
+def test_rate_limit_covers_nested_requests(server, cookies_path, share):
+    """按层遍历时请求在工作线程内发出，同样受速率限制"""
+    acquired = []
+
+    class CountingLimiter(RateLimiter):
+        def acquire(self):
+            acquired.append(threading.current_thread().name)
+            super().acquire()
+
+    scheduler = RequestScheduler(workers=4, rate=0)
+    scheduler.limiter = CountingLimiter(rate=20, burst=1)
+    client = QuarkClient(cookies_path, base_url=server.base_url, scheduler=scheduler)
+    before = sum(server.request_counts().values())
+    start = time.monotonic()
+    entries, unlisted = client.crawl_breadth_first(*share, Deadline(30))
+    elapsed = time.monotonic() - start
+    requests = sum(server.request_counts().values()) - before
+
+    assert unlisted == [] and len(entries) == 13
+    assert requests >= 5
+    # 每个目录任务取一次配额，任务内发出的请求再各取一次
+    assert len(acquired) >= 2 * requests
+    assert elapsed >= (requests - 1) / 20 - 0.01
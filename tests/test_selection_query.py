@@ -0,0 +1,76 @@
+"""selection_query：选择条件的解析与按列求值"""
+
+import pytest
+
+from selection_query import compile_selection
+
+
+def names(files):
+    return [f['file_name'] for f in files]
+
+
+def test_glob_matches_whole_name(table):
+    assert names(compile_selection('a*').filter(table)) == ['a.txt']
+    assert names(compile_selection('第*集*').filter(table)) == ['第1集.mp4']
+    assert names(compile_selection('name:*.txt').filter(table)) == ['ba.txt', 'a.txt']
+
+
+def test_glob_is_case_insensitive(table):
+    assert names(compile_selection('*.mkv').filter(table)) == \
+        ['E01.mkv', 'E02.mkv', 'E01.MKV', 'E01.mkv']
+
+
+def test_regex_searches_anywhere(table):
+    assert names(compile_selection('re:第\\d集').filter(table)) == ['x第1集.mp4', '第1集.mp4']
+    assert names(compile_selection('re:^a').filter(table)) == ['a.txt']
+
+
+@pytest.mark.parametrize('text', ['re:[', 'video and', '(video', 'type:nothing', 'size:abc'])
+def test_invalid_selection_raises_value_error(text):
+    with pytest.raises(ValueError):
+        compile_selection(text)
+
+
+def test_size_type_and_boolean_operators(table):
+    assert names(compile_selection('>2.5G').filter(table)) == ['E01.mkv', 'E01.MKV', 'E01.mkv']
+    assert names(compile_selection('video and <=2G').filter(table)) == \
+        ['E02.mkv', 'making.mp4', 'x第1集.mp4', '第1集.mp4']
+    assert names(compile_selection('*.mkv and not >5G').filter(table)) == \
+        ['E01.mkv', 'E02.mkv', 'E01.mkv']
+    assert names(compile_selection('a.txt or ext:mp4').filter(table)) == \
+        ['making.mp4', 'a.txt', 'x第1集.mp4', '第1集.mp4']
+
+
+def test_size_comparison_allows_space_after_operator(table):
+    assert names(compile_selection('> 2.5G').filter(table)) == \
+        names(compile_selection('>2.5G').filter(table))
+    assert names(compile_selection('video and <= 2G').filter(table)) == \
+        ['E02.mkv', 'making.mp4', 'x第1集.mp4', '第1集.mp4']
+    assert names(compile_selection('size:< 25').filter(table)) == ['ba.txt', 'a.txt']
+
+
+@pytest.mark.parametrize('text', ['>', '> (', 'video and >=', '> <= 1G'])
+def test_bare_size_operator_raises_value_error(text):
+    with pytest.raises(ValueError):
+        compile_selection(text)
+
+
+def test_path_prefix(table):
+    assert names(compile_selection('"/Season 2"').filter(table)) == ['E01.MKV', 'E01.mkv']
+    assert names(compile_selection('path:"/season 1/extras"').filter(table)) == ['making.mp4']
+    assert names(compile_selection('"/Season 1" and *.mkv').filter(table)) == \
+        ['E01.mkv', 'E02.mkv']
+
+
+@pytest.mark.parametrize('text', ['all', '*.mkv', 're:e0', 'video and >1G', 'not ext:txt',
+                                  '第*集*', 'search:making'])
+def test_mask_agrees_across_containers_and_match(table, text):
+    """FileTable、字典列表按列求值的结果一致，且与逐条 match 一致"""
+    plan = compile_selection(text)
+    records = table.to_dicts()
+    assert plan.mask(table) == plan.mask(records)
+    assert [bool(b) for b in plan.mask(records)] == [plan.match(f) for f in records]
+
+
+def test_empty_list():
+    assert compile_selection('*.mkv').filter([]) == []
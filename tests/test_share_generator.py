@@ -0,0 +1,45 @@
+"""share_generator：合成分享与网盘目录的确定性和格式"""
+
+from collections import defaultdict
+
+import pytest
+
+from share_generator import ROOT, DriveGenerator, ShareGenerator
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_names_are_unique_within_each_folder(seed):
+    gen = ShareGenerator(seed=seed, depth=2, fanout=12, files=40, huge_ratio=0.05, huge_files=2000)
+    names = defaultdict(list)
+    for item in gen.walk():
+        names[item['pdir_fid']].append(item['file_name'])
+    for pdir_fid, folder in names.items():
+        assert len(folder) == len(set(folder)), pdir_fid
+
+
+def test_walk_is_deterministic_and_matches_count():
+    gen = ShareGenerator(seed=7, depth=2, fanout=4, files=10)
+    items = list(gen.walk())
+    assert items == list(ShareGenerator(seed=7, depth=2, fanout=4, files=10).walk())
+    folders = sum(1 for item in items if item['dir'])
+    assert gen.count() == (folders, len(items) - folders)
+    assert all(len(item['fid']) == 32 for item in items)
+    assert all(gen.is_folder(item['fid']) == item['dir'] for item in items)
+
+
+def test_list_page_matches_items():
+    gen = ShareGenerator(seed=3, depth=1, fanout=2, files=5, huge_ratio=1.0, huge_files=120)
+    children = list(gen.iter_children(ROOT))
+    assert gen.list_page(ROOT, page=2, size=50) == children[50:100]
+
+
+def test_drive_fids_have_online_length():
+    drive = DriveGenerator(seed=1, depth=3, fanout=5)
+    stack = [(ROOT, 0)]
+    while stack:
+        fid, depth = stack.pop()
+        children = drive.children(fid, depth)
+        assert len({item['file_name'] for item in children}) == len(children)
+        for item in children:
+            assert len(item['fid']) == 32
+            stack.append((item['fid'], depth + 1))
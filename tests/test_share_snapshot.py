@@ -0,0 +1,141 @@
+"""share_snapshot：按 updated_at 复用目录缓存，以及快照之间的比较"""
+
+import pytest
+
+from conftest import GB, SHARE_TREE
+from mock_server import MockConfig, MockQuarkServer
+from quark_client import QuarkClient
+from share_snapshot import (FolderCache, crawl_snapshot, diff_snapshots, load_snapshot,
+                            save_snapshot, snapshot_files)
+
+
+@pytest.fixture
+def changing(cookies_path):
+    """可以修改内容的分享：(server, client, pwd_id, stoken)"""
+    with MockQuarkServer(MockConfig(tree=SHARE_TREE, task_duration='0')) as server:
+        client = QuarkClient(cookies_path, base_url=server.base_url)
+        pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+        yield server, client, pwd_id, client.get_stoken(pwd_id)
+
+
+def folder_fid(server, *names):
+    fid = '0'
+    for name in names:
+        fid = next(item['fid'] for item in server.state.share[fid] if item['file_name'] == name)
+    return fid
+
+
+def touch(server, *names):
+    """模拟目录内容变化：更新目录及其上层目录条目的 updated_at"""
+    fid = '0'
+    for name in names:
+        item = next(item for item in server.state.share[fid] if item['file_name'] == name)
+        item['updated_at'] += 1000
+        fid = item['fid']
+
+
+def add_file(server, names, file_name, size):
+    pdir_fid = folder_fid(server, *names)
+    fid = server.state.new_id()
+    server.state.share[pdir_fid].append({
+        'fid': fid, 'file_name': file_name, 'dir': False, 'file_type': 1, 'size': size,
+        'obj_category': 'video', 'updated_at': 1700000000000, 'created_at': 1700000000000,
+        'share_fid_token': f'token-{fid[-8:]}'})
+    touch(server, *names)
+    return fid
+
+
+def detail_requests(server):
+    return server.request_counts().get('detail', 0)
+
+
+def test_unchanged_share_is_served_from_cache(changing):
+    server, client, pwd_id, stoken = changing
+    first = crawl_snapshot(client, pwd_id, stoken)
+    assert first['stats'] == {'listed_folders': 5, 'reused_folders': 0}
+
+    before = detail_requests(server)
+    second = crawl_snapshot(client, pwd_id, stoken, first)
+    # 根目录总是重新获取，其余四个目录整棵子树沿用上次的结果
+    assert second['stats'] == {'listed_folders': 1, 'reused_folders': 4}
+    assert detail_requests(server) - before == 1
+    assert snapshot_files(second) == snapshot_files(first)
+    assert diff_snapshots(first, second)['compared_folders'] == 0
+
+
+def test_changed_folder_is_listed_again(changing):
+    server, client, pwd_id, stoken = changing
+    first = crawl_snapshot(client, pwd_id, stoken)
+    new_fid = add_file(server, ['Season 2'], 'E02.mkv', 3 * GB)
+
+    second = crawl_snapshot(client, pwd_id, stoken, first)
+    # 根目录和 Season 2 重新获取；Season 1、extras、4K 未变化
+    assert second['stats'] == {'listed_folders': 2, 'reused_folders': 3}
+    diff = diff_snapshots(first, second)
+    assert [f['fid'] for f in diff['added']] == [new_fid]
+    assert diff['removed'] == [] and diff['changed'] == []
+    assert diff['compared_folders'] == 2
+
+
+def test_stale_updated_at_keeps_cached_items(changing):
+    """updated_at 未变化时不会发现内容变化（缓存按 updated_at 判断）"""
+    server, client, pwd_id, stoken = changing
+    first = crawl_snapshot(client, pwd_id, stoken)
+    pdir_fid = folder_fid(server, 'Season 1')
+    server.state.share[pdir_fid].pop(0)
+
+    second = crawl_snapshot(client, pwd_id, stoken, first)
+    assert diff_snapshots(first, second)['removed'] == []
+    third = crawl_snapshot(client, pwd_id, stoken)
+    assert [f['file_name'] for f in diff_snapshots(first, third)['removed']] == ['E01.mkv']
+
+
+def snapshot(folders):
+    """由 {fid: [(fid, 名称, 大小或 None 表示目录), ...]} 构造快照"""
+    cache = FolderCache()
+    names = {fid: name for items in folders.values() for fid, name, _ in items}
+    for fid, items in folders.items():
+        entry = None if fid == '0' else {'fid': fid, 'file_name': names[fid], 'updated_at': 1}
+        cache.store(fid, entry, [{'fid': f, 'file_name': name, 'dir': size is None,
+                                  'size': size or 0} for f, name, size in items])
+    return cache.snapshot('test')
+
+
+BASE = {
+    '0': [('a', 'A', None), ('b', 'B', None), ('r', 'root.txt', 1)],
+    'a': [('a1', 'a1.mkv', 10), ('a2', 'a2.mkv', 20)],
+    'b': [('b1', 'b1.mkv', 30)],
+}
+
+
+def test_diff_added_removed_changed_and_moved():
+    new = snapshot({
+        '0': [('a', 'A', None), ('b', 'B', None), ('c', 'C', None)],
+        'a': [('a1', 'a1.mkv', 11)],
+        'b': [('b1', 'b1.mkv', 30), ('a2', 'a2.mkv', 20)],
+        'c': [('c1', 'c1.mkv', 40)],
+    })
+    diff = diff_snapshots(snapshot(BASE), new)
+    assert [f['fid'] for f in diff['added']] == ['c1']
+    assert [f['fid'] for f in diff['removed']] == ['r']
+    # a2 移到 B 下不算新增 / 删除
+    assert diff['changed'] == [{'fid': 'a1', 'file_name': 'a1.mkv', 'old_size': 10, 'new_size': 11}]
+
+
+def test_diff_skips_unchanged_subtrees():
+    new = dict(BASE, b=[('b1', 'b1.mkv', 30), ('b2', 'b2.mkv', 5)])
+    diff = diff_snapshots(snapshot(BASE), snapshot(new))
+    assert [f['fid'] for f in diff['added']] == ['b2']
+    # 根目录和 B；A 的 hash 相同，不再深入
+    assert diff['compared_folders'] == 2
+    assert diff_snapshots(None, snapshot(BASE))['added'] == snapshot_files(snapshot(BASE))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'nested' / 'snapshot.json')
+    saved = snapshot(BASE)
+    save_snapshot(saved, path)
+    loaded = load_snapshot(path)
+    assert snapshot_files(loaded) == snapshot_files(saved)
+    assert loaded['folders']['0']['hash'] == saved['folders']['0']['hash']
+    assert load_snapshot(str(tmp_path / 'missing.json')) is None
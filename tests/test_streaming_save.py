@@ -0,0 +1,88 @@
+"""save_files_streaming：边遍历边转存的分批与两端背压"""
+
+import threading
+import time
+
+import pytest
+
+from mock_server import MockConfig, MockQuarkServer
+from quark_client import QuarkClient, build_selection_filter
+
+
+def test_saves_matching_files_in_batches(client, share, server):
+    batches = []
+    result = client.save_files_streaming(*share, build_selection_filter('*.mkv'), batch_size=3,
+                                         on_batch=lambda no, count, task_id: batches.append(
+                                             (no, count, task_id)))
+    assert result['file_count'] == 4
+    assert result['batch_count'] == 2
+    assert result['failed_tasks'] == [] and result['partial'] is False
+    assert [(no, count) for no, count, _ in batches] == [(1, 3), (2, 1)]
+    assert [task_id for _, _, task_id in batches] == result['task_ids']
+    assert [server.state.tasks[t]['count'] for t in result['task_ids']] == [3, 1]
+
+
+def test_no_match_creates_no_task(client, share):
+    result = client.save_files_streaming(*share, build_selection_filter('*.iso'))
+    assert result == {'task_ids': [], 'file_count': 0, 'batch_count': 0,
+                      'failed_tasks': [], 'partial': False}
+
+
+def test_index_selection_cannot_stream():
+    assert build_selection_filter('1-3') is None
+
+
+@pytest.fixture
+def flat_share(cookies_path):
+    """一个目录 40 个文件的分享（转存任务立即完成）"""
+    tree = [{'name': f'{i:02d}.mkv', 'size': 1} for i in range(40)]
+    with MockQuarkServer(MockConfig(tree=tree, task_duration='0')) as server:
+        client = QuarkClient(cookies_path, base_url=server.base_url)
+        pwd_id = client.parse_share_url(server.share_url)['pwd_id']
+        yield client, (pwd_id, client.get_stoken(pwd_id))
+
+
+def test_unfinished_tasks_capped_by_max_inflight(flat_share, monkeypatch):
+    client, share = flat_share
+    events = []
+    save_files, wait = client.save_files, client.wait_task_complete
+    monkeypatch.setattr(client, 'save_files',
+                        lambda *a, **k: events.append('save') or save_files(*a, **k))
+    monkeypatch.setattr(client, 'wait_task_complete',
+                        lambda *a, **k: wait(*a, **k) and not events.append('done'))
+
+    result = client.save_files_streaming(*share, lambda f: True, batch_size=4, max_inflight=2)
+    assert result['batch_count'] == 10 and result['failed_tasks'] == []
+
+    unfinished = peak = 0
+    for event in events:
+        unfinished += 1 if event == 'save' else -1
+        peak = max(peak, unfinished)
+    assert peak == 2
+    assert unfinished == 0
+
+
+def test_crawl_waits_for_slow_saves(flat_share, monkeypatch):
+    """转存跟不上时遍历线程在有界队列上阻塞，不会一直领先"""
+    client, share = flat_share
+    matched = []
+    lead = []
+    lock = threading.Lock()
+    save_files = client.save_files
+
+    def match(record):
+        with lock:
+            matched.append(record['fid'])
+        return True
+
+    def save(pwd_id, stoken, fids, *args, **kwargs):
+        with lock:
+            lead.append(len(matched) - len(fids) * (len(lead) + 1))
+        time.sleep(0.01)
+        return save_files(pwd_id, stoken, fids, *args, **kwargs)
+
+    monkeypatch.setattr(client, 'save_files', save)
+    result = client.save_files_streaming(*share, match, batch_size=1, max_inflight=1)
+    assert result['file_count'] == 40
+    # 队列容量 2 * batch_size，遍历线程最多再拿着一条等待放入
+    assert max(lead) <= 3
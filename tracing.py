@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+链路追踪 - 记录每个逻辑操作和 HTTP 请求的耗时区间（span）
+
+span 之间有父子关系：在某个 span 内发起的操作成为它的子 span。当前 span 保存在线程局部变量中，
+交给调度器工作线程或后台线程执行的函数用 bind() 带上提交时的 span，跨线程的父子关系不会丢失。
+
+追踪默认关闭，此时 span() 返回共享的空对象，开销可以忽略：
+
+    tracing.start()
+    with tracing.span('crawl', pwd_id=pwd_id):
+        ...
+        tracing.annotate(files=len(files))       # 给当前 span 添加属性
+    tracing.export('trace.json')
+
+导出为 Chrome trace 格式（JSON），可以用 chrome://tracing 或 https://ui.perfetto.dev 打开。
+每个线程一行，跨线程的父子关系用箭头（flow 事件）连接；span 的属性显示在 args 中。
+"""
+
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+_local = threading.local()
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_spans: List['Span'] = []
+_enabled = False
+_started = 0.0
+
+
+class Span:
+    """一个操作的耗时区间"""
+
+    __slots__ = ('name', 'span_id', 'parent', 'attributes', 'thread_id', 'thread_name',
+                 'start', 'end', '_previous')
+
+    def __init__(self, name: str, attributes: Dict):
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent: Optional[Span] = getattr(_local, 'span', None)
+        self.attributes = attributes
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.start = self.end = 0.0
+        self._previous = None
+
+    def set(self, **attributes) -> None:
+        """添加属性"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        self._previous = getattr(_local, 'span', None)
+        _local.span = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter()
+        _local.span = self._previous
+        if exc_type is not None:
+            self.attributes['error'] = f"{exc_type.__name__}: {exc}"
+        with _lock:
+            _spans.append(self)
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span"""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def enabled() -> bool:
+    """是否正在追踪"""
+    return _enabled
+
+
+def start() -> None:
+    """开始追踪（清空之前记录的 span）"""
+    global _enabled, _started
+    with _lock:
+        _spans.clear()
+        _started = time.perf_counter()
+        _enabled = True
+
+
+def stop() -> None:
+    """停止追踪（已记录的 span 仍可导出）"""
+    global _enabled
+    _enabled = False
+
+
+def span(name: str, **attributes):
+    """
+    创建 span（用作上下文管理器）
+
+    Args:
+        name: 操作名
+        **attributes: 属性（如 pwd_id、pdir_fid、page、task_id）
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def current():
+    """当前线程的 span（没有时返回空 span，可以直接调用 set）"""
+    return getattr(_local, 'span', None) or _NOOP
+
+
+def annotate(**attributes) -> None:
+    """给当前 span 添加属性"""
+    if _enabled:
+        current().set(**attributes)
+
+
+def bind(fn: Callable) -> Callable:
+    """让 fn 在其他线程中执行时以当前 span 为父 span"""
+    if not _enabled:
+        return fn
+    parent = getattr(_local, 'span', None)
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        previous = getattr(_local, 'span', None)
+        _local.span = parent
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.span = previous
+
+    return run
+
+
+def traced(name: Optional[str] = None, attributes=(), result: Optional[str] = None):
+    """
+    装饰器：每次调用记录一个 span
+
+    Args:
+        name: span 名称（默认为函数名）
+        attributes: 作为属性记录的参数名
+        result: 把返回值记录为该名称的属性（如 task_id）
+    """
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+        signature = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal signature
+            if not _enabled:
+                return fn(*args, **kwargs)
+            if signature is None:
+                # 第一次追踪时才解析签名（inspect 较重，不拖慢启动）
+                import inspect
+                signature = inspect.signature(fn)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            with Span(span_name, {key: bound.arguments[key] for key in attributes
+                                  if bound.arguments.get(key) is not None}) as span_:
+                value = fn(*args, **kwargs)
+                if result is not None:
+                    span_.set(**{result: _jsonable(value)})
+                return value
+
+        return wrapper
+
+    return decorate
+
+
+def spans() -> List[Span]:
+    """已结束的 span（按开始时间排序）"""
+    with _lock:
+        return sorted(_spans, key=lambda s: s.start)
+
+
+def to_chrome_trace() -> Dict:
+    """转换为 Chrome trace 格式"""
+    pid = os.getpid()
+    recorded = spans()
+    threads: Dict[int, int] = {}
+    events = []
+
+    def tid(span_: Span) -> int:
+        if span_.thread_id not in threads:
+            threads[span_.thread_id] = len(threads) + 1
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': threads[span_.thread_id], 'args': {'name': span_.thread_name}})
+        return threads[span_.thread_id]
+
+    def micros(t: float) -> float:
+        return round((t - _started) * 1e6, 1)
+
+    for item in recorded:
+        args = {key: _jsonable(value) for key, value in item.attributes.items()}
+        args['span_id'] = item.span_id
+        if item.parent is not None:
+            args['parent_id'] = item.parent.span_id
+        events.append({'name': item.name, 'cat': item.name.split(' ', 1)[0], 'ph': 'X',
+                       'ts': micros(item.start), 'dur': round((item.end - item.start) * 1e6, 1),
+                       'pid': pid, 'tid': tid(item), 'args': args})
+        # 跨线程的父子关系：从父 span 所在线程画箭头到子 span
+        if item.parent is not None and item.parent.thread_id != item.thread_id:
+            events.append({'name': 'spawn', 'cat': 'flow', 'ph': 's', 'id': item.span_id,
+                           'ts': micros(item.start), 'pid': pid, 'tid': tid(item.parent)})
+            events.append({'name': 'spawn', 'cat': 'flow', 'ph': 'f', 'bp': 'e', 'id': item.span_id,
+                           'ts': micros(item.start), 'pid': pid, 'tid': tid(item)})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export(path: str) -> int:
+    """
+    写出 Chrome trace 文件
+
+    Returns:
+        int: span 数
+    """
+    trace = to_chrome_trace()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False)
+    return sum(1 for event in trace['traceEvents'] if event['ph'] == 'X')
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return f"[{len(value)} 项]"
+    return str(value)